@@ -36,6 +36,10 @@ This package includes the following modules:
     This module provides necessary interfaces in order to create a simulated
     :class:`~nmrstarlib.plsimulator.PeakList` from NMR-STAR formatted files.
 
+``transcoder``
+    This module provides the :func:`~nmrstarlib.transcoder.nmrstar_to_json` function that
+    transcodes NMR-STAR formatted files into JSON directly from lexer tokens.
+
 ``translator``
     This module provides :class:`~nmrstarlib.translator.StarFileToStarFile` for
     conversion between NMR-STAR/CIF and JSONized NMR-STAR/CIF formatted files and
@@ -46,10 +50,41 @@ This package includes the following modules:
 ``fileio``
     This module provides the :func:`~nmrstarlib.fileio.read_files` generator
     to open files from different sources (single file/multiple files on a local 
-    machine, directory/archive of files, URL address of a file).
+    machine, directory/archive of files, URL address of a file) and the
+    :func:`~nmrstarlib.fileio.read_entry` function to read a single entry
+    from an indexed zip/tar archive.
+
+``aiofileio``
+    This module provides the :func:`~nmrstarlib.aiofileio.read_files` asynchronous
+    generator that fetches BMRB entries, PDB entries and URL addresses concurrently
+    using :mod:`asyncio`.
+
+``cache``
+    This module provides the :class:`~nmrstarlib.cache.DownloadCache` class that keeps
+    files downloaded from BMRB and PDB in a local directory with least recently used eviction.
+
+``manifest``
+    This module provides the :class:`~nmrstarlib.manifest.Manifest` class that records
+    processed input files and their outputs, so that unchanged files are skipped on re-run.
+
+``checkpoint``
+    This module provides the :class:`~nmrstarlib.checkpoint.Checkpoint` class that records
+    converted files while conversion is running, so that interrupted conversion can be resumed.
+
+``mirror``
+    This module provides the :class:`~nmrstarlib.mirror.MirrorIndex` class that maps
+    BMRB IDs to files in a local mirror of BMRB entries.
+
+``report``
+    This module provides the :class:`~nmrstarlib.report.Report` class that records size
+    of processed files and time spent in each stage of their processing.
+
+``errorlog``
+    This module provides the :class:`~nmrstarlib.errorlog.ErrorLog` class that records
+    input files that could not be read, so that they are skipped instead of aborting processing.
 """
 
 __version__ = "2.1.1"
 
 
-from .fileio import read_files
+from .fileio import read_files, read_entry
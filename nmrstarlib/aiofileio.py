@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nmrstarlib.aiofileio
+~~~~~~~~~~~~~~~~~~~~
+
+This module provides the :func:`~nmrstarlib.aiofileio.read_files` asynchronous
+generator, :mod:`asyncio` variant of :func:`~nmrstarlib.fileio.read_files`
+that fetches ``BMRB IDs``, ``PDB IDs`` and URL addresses concurrently
+and hands off parsing to an executor. Requires Python 3.6 or later.
+"""
+
+import asyncio
+import io
+import os
+import re
+
+from urllib.error import HTTPError
+
+from . import nmrstarlib
+from . import fileio
+
+
+async def read_files(*sources, concurrency=8, executor=None, **kwds):
+    """Construct an asynchronous generator that yields :class:`~nmrstarlib.nmrstarlib.StarFile` instances
+    in the order they are fetched and parsed.
+
+    :param sources: One or more strings representing path to file(s), URL address, BMRB ID or PDB ID.
+    :param int concurrency: Number of sources fetched and parsed at once, also the maximum number of
+                            parsed sources waiting to be consumed.
+    :param executor: Executor to parse files in, default executor of the event loop if not provided.
+    :type executor: :py:class:`concurrent.futures.Executor`
+    :param kwds: Keyword arguments passed to :meth:`~nmrstarlib.nmrstarlib.StarFile.read`, e.g. `keep_raw`.
+    :return: :class:`~nmrstarlib.nmrstarlib.StarFile` instance(s).
+    :rtype: :class:`~nmrstarlib.nmrstarlib.StarFile`
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1, got {}".format(concurrency))
+
+    sources = iter(sources)
+    results = asyncio.Queue(maxsize=concurrency)
+    workers = [asyncio.ensure_future(_worker(sources, results, executor, kwds)) for _ in range(concurrency)]
+
+    try:
+        running = len(workers)
+        while running:
+            result = await results.get()
+            if result is None:
+                running -= 1
+            elif isinstance(result, Exception):
+                raise result
+            else:
+                for starfile in result:
+                    yield starfile
+    finally:
+        for worker in workers:
+            worker.cancel()
+
+
+async def _worker(sources, results, executor, kwds):
+    """Fetch and parse sources one at a time until there are none left, put list of
+    :class:`~nmrstarlib.nmrstarlib.StarFile` instances of each source or the error raised
+    while reading it into the results queue, and None once finished.
+
+    :param sources: Iterator over sources shared by all workers.
+    :param results: Queue of results.
+    :type results: :py:class:`asyncio.Queue`
+    :param executor: Executor to parse files in.
+    :type executor: :py:class:`concurrent.futures.Executor`
+    :param dict kwds: Keyword arguments passed to :meth:`~nmrstarlib.nmrstarlib.StarFile.read`.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    for source in sources:
+        try:
+            starfiles = await _read_source(source, executor, kwds)
+        except Exception as exc:
+            await results.put(exc)
+            return
+        await results.put(starfiles)
+    await results.put(None)
+
+
+async def _read_source(source, executor, kwds):
+    """Fetch and parse a single source.
+
+    :param str source: String representing path to file(s), URL address, BMRB ID or PDB ID.
+    :param executor: Executor to parse files in.
+    :type executor: :py:class:`concurrent.futures.Executor`
+    :param dict kwds: Keyword arguments passed to :meth:`~nmrstarlib.nmrstarlib.StarFile.read`.
+    :return: List of :class:`~nmrstarlib.nmrstarlib.StarFile` instances.
+    :rtype: :py:class:`list`
+    """
+    loop = asyncio.get_event_loop()
+
+    if source.isdigit() and nmrstarlib.BMRB_MIRROR:
+        path = await loop.run_in_executor(None, fileio._mirror_path, source)
+        if path is not None:
+            return await loop.run_in_executor(executor, _read_local, path, kwds)
+
+    if os.path.exists(source):
+        return await loop.run_in_executor(executor, _read_local, source, kwds)
+
+    url, data = await _fetch(source)
+
+    if nmrstarlib.VERBOSE:
+        print("Processing file: {}".format(url))
+
+    compression_type = fileio.GenericFilePath.is_compressed(url)
+    if compression_type:
+        contents = await loop.run_in_executor(None, _decompress, url, data, compression_type)
+    else:
+        contents = [(data, url)]
+
+    parsed = [loop.run_in_executor(executor, fileio._parse, content, member, kwds) for content, member in contents]
+    return await asyncio.gather(*parsed)
+
+
+async def _fetch(source):
+    """Resolve source into URL address and download it. For numeric IDs BMRB is tried first
+    and PDB is used only if BMRB entry does not exist (404), so each file is transferred once.
+    Resolved URL addresses are shared with :func:`~nmrstarlib.fileio.read_files`.
+
+    :param str source: URL address, BMRB ID or PDB ID.
+    :return: URL address and downloaded content.
+    :rtype: :py:class:`tuple`
+    """
+    loop = asyncio.get_event_loop()
+
+    if fileio.GenericFilePath.is_url(source):
+        url = source
+    elif source.isdigit():
+        bmrb_url = nmrstarlib.BMRB_REST + source
+        pdb_url = nmrstarlib.PDB_REST + source + ".cif"
+        url = fileio._resolved_ids.get((bmrb_url, pdb_url))
+        if url is None:
+            try:
+                data = await loop.run_in_executor(None, _download, bmrb_url)
+                url = bmrb_url
+            except HTTPError as exc:
+                # only missing BMRB entry falls back to PDB, other errors are raised and not remembered
+                if exc.code != 404:
+                    raise
+                url = pdb_url
+                data = await loop.run_in_executor(None, _download, pdb_url)
+            fileio._resolved_ids[(bmrb_url, pdb_url)] = url
+            return url, data
+    elif re.match(r"[\w\d]{4}", source):
+        url = nmrstarlib.PDB_REST + source + ".cif"
+    else:
+        raise TypeError("Unknown file source.")
+
+    return url, await loop.run_in_executor(None, _download, url)
+
+
+def _download(url):
+    """Download file content.
+
+    :param str url: URL address of file.
+    :return: File content.
+    :rtype: :py:class:`bytes`
+    """
+    response = fileio._urlopen(url)
+    try:
+        return response.read()
+    finally:
+        response.close()
+
+
+def _decompress(url, data, compression_type):
+    """Decompress downloaded archive into its members.
+
+    :param str url: URL address of file.
+    :param bytes data: Compressed file content.
+    :param str compression_type: Compression type returned by :meth:`~nmrstarlib.fileio.GenericFilePath.is_compressed`.
+    :return: List of member contents and their sources.
+    :rtype: :py:class:`list`
+    """
+    path = fileio.GenericFilePath(url)
+    return [(fh.read(), source) for fh, source in path._open_compressed(io.BytesIO(data), compression_type)]
+
+
+def _read_local(source, kwds):
+    """Read files from a local source.
+
+    :param str source: Path to file(s).
+    :param dict kwds: Keyword arguments passed to :func:`~nmrstarlib.fileio.read_files`.
+    :return: List of :class:`~nmrstarlib.nmrstarlib.StarFile` instances.
+    :rtype: :py:class:`list`
+    """
+    return list(fileio.read_files(source, **kwds))
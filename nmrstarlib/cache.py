@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nmrstarlib.cache
+~~~~~~~~~~~~~~~~
+
+This module provides the :class:`~nmrstarlib.cache.DownloadCache` class
+that keeps files downloaded from ``BMRB`` and ``PDB`` in a local directory,
+so repeated runs over the same entries do not access the network.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import hashlib
+import tempfile
+
+if sys.version_info.major == 3:
+    from urllib.request import urlopen, Request
+    from urllib.error import HTTPError
+else:
+    from urllib2 import urlopen, Request
+    from urllib2 import HTTPError
+
+
+_total_sizes = {}
+
+
+class DownloadCache(object):
+    """Directory of downloaded files with least recently used eviction.
+
+    Each entry is stored as a pair of files named by hash of its URL address:
+    file content and ``.json`` metadata (URL address, `ETag`, `Last-Modified`
+    and time of the last validation).
+    """
+
+    size_units = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+    def __init__(self, directory, max_size=None, max_age=None):
+        """Download cache initializer.
+
+        :param str directory: Path to cache directory, created if it does not exist.
+        :param int max_size: Maximum total size of cached files in bytes, unlimited if not provided.
+        :param float max_age: Number of seconds cached file is used without revalidation,
+                              cached files never expire if not provided.
+        """
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.directory = directory
+        self.max_size = self.parse_size(max_size)
+        self.max_age = max_age
+
+    @classmethod
+    def parse_size(cls, size):
+        """Convert size with an optional `K`, `M` or `G` suffix into number of bytes.
+
+        :param size: Size in bytes, e.g. `1048576` or `1M`.
+        :type size: :py:class:`int` or :py:class:`str`
+        :return: Number of bytes.
+        :rtype: :py:class:`int`
+        """
+        if size is None or isinstance(size, int):
+            return size
+
+        size = size.strip().upper().rstrip("B")
+        unit = size[-1:] if size[-1:] in cls.size_units else ""
+        try:
+            return int(float(size[:len(size) - len(unit)]) * cls.size_units[unit])
+        except ValueError:
+            raise ValueError('Invalid cache size: "{}"'.format(size))
+
+    def _paths(self, url):
+        """Paths to content and metadata files of cache entry.
+
+        :param str url: URL address of file.
+        :return: Path to content file and path to metadata file.
+        :rtype: :py:class:`tuple`
+        """
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        path = os.path.join(self.directory, key)
+        return path, path + ".json"
+
+    def is_cached(self, url):
+        """Test if file is in cache.
+
+        :param str url: URL address of file.
+        :return: True if file is cached, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        path, metadata_path = self._paths(url)
+        return os.path.isfile(path) and os.path.isfile(metadata_path)
+
+    def open(self, url, response=None):
+        """Open file from cache, downloading or revalidating it first if necessary.
+
+        :param str url: URL address of file.
+        :param response: Response of GET request already sent for the file, stored into cache
+                         instead of downloading the file again.
+        :type response: :py:class:`http.client.HTTPResponse`
+        :return: Filehandle of cached file.
+        :rtype: :py:class:`io.BufferedReader`
+        """
+        path, metadata_path = self._paths(url)
+        if response is not None:
+            self._download(url, Request(url), path, metadata_path, response)
+            return io.open(path, "rb")
+
+        try:
+            with io.open(metadata_path, "r", encoding="utf-8") as infile:
+                metadata = json.load(infile)
+        except (IOError, ValueError):
+            metadata = None
+
+        if metadata is None or not os.path.isfile(path):
+            self._download(url, Request(url), path, metadata_path)
+        elif self.max_age is not None and time.time() - metadata["validated"] >= self.max_age:
+            self._revalidate(url, metadata, path, metadata_path)
+        else:
+            os.utime(path, None)
+
+        return io.open(path, "rb")
+
+    def _revalidate(self, url, metadata, path, metadata_path):
+        """Send conditional request and download file only if it was modified.
+
+        :param str url: URL address of file.
+        :param dict metadata: Metadata of cache entry.
+        :param str path: Path to content file.
+        :param str metadata_path: Path to metadata file.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        request = Request(url)
+        if metadata.get("etag"):
+            request.add_header("If-None-Match", metadata["etag"])
+        if metadata.get("last_modified"):
+            request.add_header("If-Modified-Since", metadata["last_modified"])
+
+        try:
+            self._download(url, request, path, metadata_path)
+        except HTTPError as exc:
+            if exc.code != 304:
+                raise
+            metadata["validated"] = time.time()
+            self._write_metadata(metadata, metadata_path)
+            os.utime(path, None)
+
+    def _download(self, url, request, path, metadata_path, response=None):
+        """Download file into cache and evict least recently used entries if cache is full.
+
+        :param str url: URL address of file.
+        :param request: Request to send.
+        :type request: :py:class:`urllib.request.Request`
+        :param str path: Path to content file.
+        :param str metadata_path: Path to metadata file.
+        :param response: Response of request that was already sent, `request` is not sent if provided.
+        :type response: :py:class:`http.client.HTTPResponse`
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if response is None:
+            response = urlopen(request)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as outfile:
+                for chunk in iter(lambda: response.read(io.DEFAULT_BUFFER_SIZE * 16), b""):
+                    outfile.write(chunk)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        finally:
+            response.close()
+
+        metadata = {"url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                    "validated": time.time()}
+
+        added = os.path.getsize(tmp_path)
+        if os.path.exists(path):
+            added -= os.path.getsize(path)
+            os.remove(path)
+        os.rename(tmp_path, path)
+        self._write_metadata(metadata, metadata_path)
+        self.evict(keep=path, added=added)
+
+    @staticmethod
+    def _write_metadata(metadata, metadata_path):
+        """Write metadata of cache entry.
+
+        :param dict metadata: Metadata of cache entry.
+        :param str metadata_path: Path to metadata file.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with io.open(metadata_path, "w", encoding="utf-8") as outfile:
+            outfile.write(u"{}".format(json.dumps(metadata)))
+
+    def evict(self, keep=None, added=0):
+        """Remove least recently used files until total size of cache is within `max_size`.
+        Total size is kept between calls, so cache directory is scanned only the first time
+        and when the cache may have grown over `max_size`.
+
+        :param str keep: Path to content file that must not be removed.
+        :param int added: Number of bytes added to cache since the last call.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if self.max_size is None:
+            return
+
+        key = os.path.abspath(self.directory)
+        if key in _total_sizes:
+            _total_sizes[key] += added
+            if _total_sizes[key] <= self.max_size:
+                return
+
+        entries = []
+        for fname in os.listdir(self.directory):
+            path = os.path.join(self.directory, fname)
+            if fname.endswith((".json", ".tmp")) or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            os.remove(path)
+            if os.path.exists(path + ".json"):
+                os.remove(path + ".json")
+            total_size -= size
+        _total_sizes[key] = total_size
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nmrstarlib.checkpoint
+~~~~~~~~~~~~~~~~~~~~~
+
+This module provides the :class:`~nmrstarlib.checkpoint.Checkpoint` class
+that records converted input files while conversion is running, so
+interrupted conversion can be resumed instead of restarted.
+"""
+
+import os
+import io
+import json
+
+
+class Checkpoint(object):
+    """Append-only log of converted input files.
+
+    Each line of checkpoint file is a ``JSON`` record of input files whose output was
+    committed together with the size of output archive at that point. Incomplete last
+    line, e.g. left by interrupted write, is ignored.
+    """
+
+    def __init__(self, path):
+        """Checkpoint initializer, existing checkpoint file is loaded.
+
+        :param str path: Path to checkpoint file.
+        """
+        self.path = path
+        self.completed = set()
+        self.size = None
+
+        if os.path.isfile(path):
+            with io.open(path, "r", encoding="utf-8") as infile:
+                for line in infile:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self.completed.update(record["completed"])
+                    self.size = record["size"]
+
+    def resume(self, archive_path=None):
+        """Prepare output for resumed conversion. Archive is truncated to its size at
+        the last commit, discarding members written after it. If archive is missing or
+        shorter than recorded, checkpoint is cleared and conversion starts from scratch.
+
+        :param str archive_path: Path to output archive, None for directory output.
+        :return: True if conversion is resumed, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        if not self.completed:
+            return False
+
+        if archive_path is not None:
+            if self.size is None or not os.path.isfile(archive_path) or os.path.getsize(archive_path) < self.size:
+                self.completed.clear()
+                self.size = None
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return False
+
+            with io.open(archive_path, "r+b") as outfile:
+                outfile.truncate(self.size)
+        return True
+
+    def add(self, sources, size=None):
+        """Record input files whose output was committed.
+
+        :param list sources: Sources of converted input files.
+        :param int size: Size of output archive after commit, None for directory output.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        self.completed.update(sources)
+        self.size = size
+        with io.open(self.path, "a", encoding="utf-8") as outfile:
+            outfile.write(u"{}\n".format(json.dumps({"completed": list(sources), "size": size})))
+
+    def remove(self):
+        """Remove checkpoint file once conversion is finished.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -7,9 +7,9 @@ nmrstarlib command-line interface
 Usage:
     nmrstarlib -h | --help
     nmrstarlib --version
-    nmrstarlib convert (<from-path> <to-path>) [--from-format=<format>] [--to-format=<format>] [--bmrb-url=<url> | --pdb-url=<url>] [--nmrstar-version=<version>] [--verbose]
-    nmrstarlib csview <starfile-path> [--aa=<aa>] [--at=<at>] [--aa-at=<aa-at>] [--csview-outfile=<path>] [--csview-format=<format>] [--bmrb-url=<url> | --pdb-url=<url>] [--nmrstar-version=<version>] [--verbose] [--show]
-    nmrstarlib plsimulate (<from-path> <to-path> <spectrum>) [--from-format=<format>] [--to-format=<format>] [--plsplit=<%>] [--distribution=<func>] [--seed=<value>] [--H=<value>] [--C=<value>] [--N=<value>] [--bmrb-url=<url> | --pdb-url=<url>] [--nmrstar-version=<version>] [--spectrum-descriptions=<path>] [--verbose]
+    nmrstarlib convert (<from-path> <to-path>) [--from-format=<format>] [--to-format=<format>] [--json-layout=<layout>] [--manifest=<path>] [--checkpoint=<path>] [--xz-preset=<preset>] [--compression-level=<level>] [--zip-method=<method>] [--shard-members=<n>] [--shard-size=<size>] [--threads=<n>] [--jobs=<n>] [--dedup] [--report=<path>] [--on-error=<mode>] [--error-log=<path>] [--bmrb-url=<url> | --pdb-url=<url>] [--nmrstar-version=<version>] [--verbose] [--cache-dir=<path>] [--cache-max-size=<size>] [--cache-max-age=<seconds>] [--bmrb-mirror=<path>]
+    nmrstarlib csview <starfile-path> [--aa=<aa>] [--at=<at>] [--aa-at=<aa-at>] [--csview-outfile=<path>] [--csview-format=<format>] [--report=<path>] [--bmrb-url=<url> | --pdb-url=<url>] [--nmrstar-version=<version>] [--verbose] [--show] [--cache-dir=<path>] [--cache-max-size=<size>] [--cache-max-age=<seconds>] [--bmrb-mirror=<path>]
+    nmrstarlib plsimulate (<from-path> <to-path> <spectrum>) [--from-format=<format>] [--to-format=<format>] [--plsplit=<%>] [--distribution=<func>] [--seed=<value>] [--H=<value>] [--C=<value>] [--N=<value>] [--manifest=<path>] [--checkpoint=<path>] [--xz-preset=<preset>] [--compression-level=<level>] [--zip-method=<method>] [--shard-members=<n>] [--shard-size=<size>] [--threads=<n>] [--report=<path>] [--on-error=<mode>] [--error-log=<path>] [--bmrb-url=<url> | --pdb-url=<url>] [--nmrstar-version=<version>] [--spectrum-descriptions=<path>] [--verbose] [--cache-dir=<path>] [--cache-max-size=<size>] [--cache-max-age=<seconds>] [--bmrb-mirror=<path>]
 
 Options:
     -h, --help                      Show this screen.
@@ -17,10 +17,28 @@ Options:
     --verbose                       Print what files are processing.
     --show                          Display chemical shifts image generated by 'csview' command by default image viewer.
     --from-format=<format>          Input file format, available formats: nmrstar, json [default: nmrstar].
-    --to-format=<format>            Output file format, available formats: nmrstar, json [default: json].
+    --to-format=<format>            Output file format or comma-separated list of formats written from a single parse, available formats: nmrstar, json [default: json].
+    --json-layout=<layout>          Layout of loops in JSON output, available layouts: rows, columns [default: rows].
+    --manifest=<path>               Manifest file of processed files, unchanged files recorded in manifest are skipped.
+    --checkpoint=<path>             Checkpoint file of converted files, interrupted conversion is resumed from it.
+    --xz-preset=<preset>            Compression preset for xz and tar.xz output, from 0 (fastest) to 9 (smallest).
+    --compression-level=<level>     Compression level for gz, bz2, zip and tar output, from 1 (fastest) to 9 (smallest).
+    --zip-method=<method>           Compression method of zip output, available methods: stored, deflated, bzip2, lzma.
+    --shard-members=<n>             Split zip and tar output into numbered archives of at most n members.
+    --shard-size=<size>             Split zip and tar output into numbered archives of at most given size before tar compression, exceeded by at most one member (e.g. --shard-size=1G).
+    --threads=<n>                   Number of threads to compress gz and tar.gz output with.
+    --jobs=<n>                      Number of processes to parse and serialize files of directories and archives in.
+    --dedup                         Convert files of directories and archives with the same content only once, duplicates are written as links.
+    --report=<path>                 Write JSON report of bytes and time spent reading, lexing, building, serializing and writing each file, with files/s and MB/s.
+    --on-error=<mode>               What to do with files that cannot be read, available modes: raise, skip (record in error log and continue) [default: raise].
+    --error-log=<path>              Error log of files skipped with --on-error=skip [default: nmrstarlib-errors.jsonl].
     --nmrstar-version=<version>     Version of NMR-STAR format to use, available: 2, 3 [default: 3].
     --bmrb-url=<url>                URL to BMRB interface [default: http://rest.bmrb.wisc.edu/bmrb/NMR-STAR3/].
     --pdb-url=<url>                 URL to PDB interface [default: https://files.rcsb.org/view/].
+    --cache-dir=<path>              Directory to cache files downloaded from BMRB and PDB.
+    --cache-max-size=<size>         Maximum size of cache directory, least recently used files are removed (e.g. --cache-max-size=500M).
+    --cache-max-age=<seconds>       Number of seconds cached files are used before they are revalidated with BMRB and PDB (ETag, Last-Modified).
+    --bmrb-mirror=<path>            Local mirror of BMRB entries, BMRB IDs found in mirror are read from disk.
     --aa=<aa>                       Comma-separated amino acid three-letter codes (e.g. --aa=ALA,SER).
     --at=<at>                       Comma-separated BMRB atom codes (e.g. --at=CA,CB).
     --aa-at=<aa-at>                 Amino acid three-letter codes (keys) and corresponding atoms (values) (e.g. --aa-at=ALA-CA,CB:LYS-CB,CG,CD).
@@ -49,16 +67,34 @@ def cli(cmdargs):
     nmrstarlib.BMRB_REST = cmdargs["--bmrb-url"]
     nmrstarlib.VERBOSE = cmdargs["--verbose"]
     nmrstarlib.NMRSTAR_VERSION = cmdargs["--nmrstar-version"]
+    nmrstarlib.CACHE_DIR = cmdargs["--cache-dir"]
+    nmrstarlib.CACHE_MAX_SIZE = cmdargs["--cache-max-size"]
+    nmrstarlib.CACHE_MAX_AGE = float(cmdargs["--cache-max-age"]) if cmdargs["--cache-max-age"] else None
+    nmrstarlib.BMRB_MIRROR = cmdargs["--bmrb-mirror"]
+    xz_preset = int(cmdargs["--xz-preset"]) if cmdargs["--xz-preset"] else None
+    compression_level = int(cmdargs["--compression-level"]) if cmdargs["--compression-level"] else None
+    shard_members = int(cmdargs["--shard-members"]) if cmdargs["--shard-members"] else None
+    threads = int(cmdargs["--threads"]) if cmdargs["--threads"] else None
+    jobs = int(cmdargs["--jobs"]) if cmdargs["--jobs"] else None
+
+    if cmdargs["--on-error"] not in (None, "raise", "skip"):
+        raise ValueError('Unknown error mode: "{}"'.format(cmdargs["--on-error"]))
+    error_log = cmdargs["--error-log"] if cmdargs["--on-error"] == "skip" else None
 
     if cmdargs["convert"]:
+        nmrstarlib.JSON_LAYOUT = cmdargs["--json-layout"]
 
         nmrstar_file_translator = translator.StarFileToStarFile(from_path=cmdargs["<from-path>"],
                                                                 to_path=cmdargs["<to-path>"],
                                                                 from_format=cmdargs["--from-format"],
                                                                 to_format=cmdargs["--to-format"])
 
-        nmrstar_converter = converter.Converter(file_generator=nmrstar_file_translator)
-        nmrstar_converter.convert()
+        nmrstar_converter = converter.Converter(file_generator=nmrstar_file_translator, xz_preset=xz_preset, threads=threads,
+                                                workers=jobs, compression_level=compression_level,
+                                                zip_method=cmdargs["--zip-method"], shard_members=shard_members,
+                                                shard_size=cmdargs["--shard-size"], dedup=cmdargs["--dedup"])
+        nmrstar_converter.convert(manifest=cmdargs["--manifest"], checkpoint=cmdargs["--checkpoint"],
+                                  report=cmdargs["--report"], error_log=error_log)
 
     elif cmdargs["csview"]:
         amino_acids = cmdargs["--aa"].split(",") if cmdargs["--aa"] else None
@@ -78,7 +114,7 @@ def cli(cmdargs):
                                              filename=cmdargs["--csview-outfile"],
                                              csview_format=cmdargs["--csview-format"],
                                              nmrstar_version=cmdargs["--nmrstar-version"])
-        chemshift_viewer.csview(view=cmdargs["--show"])
+        chemshift_viewer.csview(view=cmdargs["--show"], report=cmdargs["--report"])
 
     elif cmdargs["plsimulate"]:
         if cmdargs["--spectrum-descriptions"]:
@@ -125,5 +161,8 @@ def cli(cmdargs):
                                                                  noise_generator=noise_generator,
                                                                  nmrstar_version=cmdargs["--nmrstar-version"])
 
-        nmrstar_to_peaklist_converter = converter.Converter(file_generator=peaklist_file_translator)
-        nmrstar_to_peaklist_converter.convert()
+        nmrstar_to_peaklist_converter = converter.Converter(file_generator=peaklist_file_translator, xz_preset=xz_preset, threads=threads,
+                                                            compression_level=compression_level, zip_method=cmdargs["--zip-method"],
+                                                            shard_members=shard_members, shard_size=cmdargs["--shard-size"])
+        nmrstar_to_peaklist_converter.convert(manifest=cmdargs["--manifest"], checkpoint=cmdargs["--checkpoint"],
+                                              report=cmdargs["--report"], error_log=error_log)
@@ -99,52 +99,587 @@ URL files:
          * tarfileurl.tar.bz2 - to - tarfile.tar.gz
          * tarfileurl.tar.bz2 - to - tarfile.tar.bz2
          * tarfileurl.tar.bz2 - to - directory.gz / directory.bz2 (TypeError: Many-to-one conversion)
+
+xz-compressed files (textfile.xz, tarfile.tar.xz) can be used wherever bz2-compressed
+files are listed above, compression preset is set by the `xz_preset` parameter of
+:class:`~nmrstarlib.converter.Converter`. Compression level of other outputs is set by
+the `compression_level` parameter and compression method of zip archive members by
+the `zip_method` parameter. Many-to-many conversions can parse and serialize
+files in worker processes with the `workers` parameter, output is still written in the order
+of input files. zip and tar output can be split into numbered archives with the `shard_members`
+and `shard_size` parameters. Input files with the same content can be converted only once with the
+`dedup` parameter. Size of each file and time spent in each stage of its conversion can be recorded
+with the `report` parameter of :meth:`~nmrstarlib.converter.Converter.convert`, files that cannot be
+read can be skipped and recorded with the `error_log` parameter.
 """
 
 import os
 import io
+import sys
 import zipfile
 import tarfile
+import tempfile
 import bz2
 import gzip
+import zlib
+import json
+import shutil
+import hashlib
+import itertools
+import collections
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
 
+if sys.version_info.major == 3:
+    from concurrent import futures
+else:
+    try:
+        from concurrent import futures
+    except ImportError:
+        futures = None
+
+from . import nmrstarlib
+from . import cache
 from . import fileio
+from . import translator
+from . import transcoder
+from .manifest import Manifest
+from .checkpoint import Checkpoint
+from .report import Report, stage
+from .errorlog import ErrorLog
+
+
+SPOOL_MAX_SIZE = 1024 * 1024
+GZIP_BLOCK_SIZE = 1024 * 1024
+CHECKPOINT_INTERVAL = 100
+ZIP_METHODS = dict((name, getattr(zipfile, constant)) for name, constant in (("stored", "ZIP_STORED"),
+                                                                          ("deflated", "ZIP_DEFLATED"),
+                                                                          ("bzip2", "ZIP_BZIP2"),
+                                                                          ("lzma", "ZIP_LZMA"))
+                   if hasattr(zipfile, constant))
+
+
+class MemberWriter(io.BufferedIOBase):
+    """Writable binary stream of a single archive member. Data written into member is spooled
+    in memory up to `max_size` bytes and in a temporary file afterwards, member is added into archive on close.
+    Used for tar archives that need member size before member data can be added."""
+
+    def __init__(self, archive, name, max_size=SPOOL_MAX_SIZE):
+        """MemberWriter initializer.
+
+        :param archive: Archive to add member to.
+        :type archive: :py:class:`tarfile.TarFile` or :py:class:`zipfile.ZipFile`
+        :param str name: Name of archive member.
+        :param int max_size: Maximum number of bytes to keep in memory.
+        """
+        super(MemberWriter, self).__init__()
+        self.archive = archive
+        self.name = name
+        self._spool = tempfile.SpooledTemporaryFile(max_size=max_size)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._spool.write(data)
+        return len(data)
+
+    def close(self):
+        """Add spooled member data into archive.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if self.closed:
+            return
+        try:
+            size = self._spool.tell()
+            self._spool.seek(0)
+            if isinstance(self.archive, tarfile.TarFile):
+                info = tarfile.TarInfo(self.name)
+                info.size = size
+                self.archive.addfile(tarinfo=info, fileobj=self._spool)
+            else:
+                self.archive.writestr(self.name, self._spool.read())
+        finally:
+            self._spool.close()
+            super(MemberWriter, self).close()
+
+
+class SharedWriter(io.BufferedIOBase):
+    """Writable binary stream that passes data into already opened output file
+    and leaves it open on close, so that several members can be written one after another."""
+
+    def __init__(self, fileobj):
+        """SharedWriter initializer.
+
+        :param fileobj: Writable binary file-like object.
+        """
+        super(SharedWriter, self).__init__()
+        self.fileobj = fileobj
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.fileobj.write(data)
+        return len(data)
+
+
+class TextWriter(io.TextIOWrapper):
+    """UTF-8 text stream over writable binary stream that also accepts byte strings,
+    e.g. those written by :py:func:`json.dump` on Python 2, and decodes them first."""
+
+    def __init__(self, fileobj):
+        """TextWriter initializer.
+
+        :param fileobj: Writable binary file-like object.
+        """
+        super(TextWriter, self).__init__(fileobj, encoding="utf-8", newline="\n")
+
+    def write(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return super(TextWriter, self).write(data)
+
+
+class ParallelGzipWriter(io.BufferedIOBase):
+    """Writable binary stream that compresses data in independent blocks on a pool of threads
+    (:py:mod:`zlib` releases the GIL while compressing) and writes each block as a separate
+    gzip member, the output is a standard multi-member gzip file readable by any gzip reader."""
+
+    def __init__(self, fileobj, threads, block_size=GZIP_BLOCK_SIZE, compresslevel=9):
+        """ParallelGzipWriter initializer.
+
+        :param fileobj: Writable binary file-like object, closed when the writer is closed.
+        :param int threads: Number of compression threads.
+        :param int block_size: Number of uncompressed bytes per gzip member.
+        :param int compresslevel: Compression level from 1 (fastest) to 9 (smallest).
+        """
+        super(ParallelGzipWriter, self).__init__()
+        self.fileobj = fileobj
+        self.threads = threads
+        self.block_size = block_size
+        self.compresslevel = compresslevel
+        self._buffer = []
+        self._buffered = 0
+        self._pending = collections.deque()
+        self._blocks = 0
+        self._executor = futures.ThreadPoolExecutor(max_workers=threads)
+
+    @staticmethod
+    def compress_block(data, compresslevel):
+        """Compress data into a single gzip member.
+
+        :param bytes data: Uncompressed data.
+        :param int compresslevel: Compression level.
+        :return: gzip member.
+        :rtype: :py:class:`bytes`
+        """
+        compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer.append(bytes(data))
+        self._buffered += len(data)
+        if self._buffered >= self.block_size:
+            self._submit()
+        return len(data)
+
+    def _submit(self):
+        """Submit buffered data for compression and write out compressed blocks
+        that are ready, so at most two blocks per thread are kept in memory.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        data = b"".join(self._buffer)
+        self._buffer, self._buffered = [], 0
+        self._pending.append(self._executor.submit(self.compress_block, data, self.compresslevel))
+        self._blocks += 1
+
+        while len(self._pending) > 2 * self.threads or (self._pending and self._pending[0].done()):
+            self.fileobj.write(self._pending.popleft().result())
+
+    def close(self):
+        """Compress remaining data, write all blocks in order and close underlying file.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if self.closed:
+            return
+        try:
+            if self._buffered or not self._blocks:
+                self._submit()
+            while self._pending:
+                self.fileobj.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown()
+            self.fileobj.close()
+            super(ParallelGzipWriter, self).close()
+
+
+class SerializedFile(object):
+    """File parsed and serialized by a worker process, written into output as is."""
+
+    def __init__(self, source, data, record=None):
+        """SerializedFile initializer.
+
+        :param str source: String indicating where file is coming from (path, url).
+        :param dict data: File serialized into each output format, UTF-8 encoded.
+        :param dict record: Report record of the file made by worker process.
+        """
+        self.source = source
+        self.data = data
+        self.record = record
+
+    def write(self, filehandle, file_format):
+        """Write serialized data into file.
+
+        :param filehandle: Text file-like object with underlying binary buffer.
+        :type filehandle: :py:class:`io.TextIOWrapper`
+        :param str file_format: Output format, data is already serialized into it.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        filehandle.flush()
+        filehandle.buffer.write(self.data[file_format])
+        filehandle.close()
+
+
+class TranscodedFile(object):
+    """NMR-STAR file that is transcoded into JSON directly from lexer tokens when written,
+    see :func:`~nmrstarlib.transcoder.nmrstar_to_json`."""
+
+    def __init__(self, source, content):
+        """TranscodedFile initializer.
+
+        :param str source: String indicating where file is coming from (path, url).
+        :param content: NMR-STAR formatted file content.
+        :type content: :py:class:`str` or :py:class:`bytes`
+        """
+        self.source = source
+        self.content = content
+
+    def write(self, filehandle, file_format):
+        """Transcode file content into JSON.
+
+        :param filehandle: Writable text file-like object.
+        :type filehandle: :py:class:`io.TextIOWrapper`
+        :param str file_format: Output format, must be `json`.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if file_format != "json":
+            raise TypeError("Unknown file format.")
+        transcoder.nmrstar_to_json(self.content, filehandle)
+        filehandle.close()
+
+
+class DuplicateFile(object):
+    """Input file with the same content as an earlier input file, written as a reference
+    to output of the earlier file instead of being converted again."""
+
+    def __init__(self, source, original):
+        """DuplicateFile initializer.
+
+        :param str source: String indicating where file is coming from (path, url).
+        :param str original: Source of the earlier input file with the same content.
+        """
+        self.source = source
+        self.original = original
+
+
+def _load(content, source, to_formats, transcode, report=None):
+    """Prepare file content for writing: NMR-STAR to JSON conversion is transcoded
+    if `transcode` is set, other files are parsed.
+
+    :param content: File content.
+    :type content: :py:class:`str` or :py:class:`bytes`
+    :param str source: String indicating where file is coming from (path, url).
+    :param list to_formats: Output formats.
+    :param transcode: Transcode NMR-STAR files into JSON without parsing them.
+    :type transcode: :py:obj:`True` or :py:obj:`False`
+    :param report: Report to record time spent parsing file in.
+    :type report: :class:`~nmrstarlib.report.Report`
+    :return: File to write.
+    :rtype: :class:`~nmrstarlib.converter.TranscodedFile` or :class:`~nmrstarlib.nmrstarlib.StarFile`
+    """
+    if transcode and to_formats == ["json"] and nmrstarlib.StarFile._is_nmrstar(content):
+        if report is not None:
+            report.set_input(source, len(content))
+        return TranscodedFile(source, content)
+    return fileio._parse(content, source, {"report": report})
+
+
+def _serialize(content, source, to_formats, settings, transcode=False, report=False, skip_errors=False):
+    """Parse file content and serialize it into output formats, used by worker processes.
+
+    :param content: File content.
+    :type content: :py:class:`str` or :py:class:`bytes`
+    :param str source: String indicating where file is coming from (path, url).
+    :param list to_formats: Output formats.
+    :param dict settings: Module-level settings of :mod:`~nmrstarlib.nmrstarlib` to use in worker process.
+    :param transcode: Transcode NMR-STAR files into JSON without parsing them.
+    :type transcode: :py:obj:`True` or :py:obj:`False`
+    :param report: Record size of file and time spent parsing and serializing it.
+    :type report: :py:obj:`True` or :py:obj:`False`
+    :param skip_errors: Return error record instead of raising exception if file cannot be parsed or serialized.
+    :type skip_errors: :py:obj:`True` or :py:obj:`False`
+    :return: Serialized file or error record, see :meth:`~nmrstarlib.errorlog.ErrorLog.describe`.
+    :rtype: :class:`~nmrstarlib.converter.SerializedFile` or :py:class:`dict`
+    """
+    for name, value in settings.items():
+        setattr(nmrstarlib, name, value)
+
+    file_report = Report(None) if report else None
+    try:
+        f = _load(content, source, to_formats, transcode, file_report)
+        data = {}
+        for to_format in to_formats:
+            outfile = io.BytesIO()
+            with stage(file_report, source, "serialize"):
+                Converter._write_member(f, SharedWriter(outfile), to_format)
+            data[to_format] = outfile.getvalue()
+    except Exception as exc:
+        if not skip_errors:
+            raise
+        return ErrorLog.describe(source, exc, content)
+    return SerializedFile(source, data, file_report.record(source) if report else None)
+
+
+class Shard(object):
+    """Part of translator output written into a single numbered archive. Delegates attributes
+    to the translator except output path and stops iteration once the shard is full."""
+
+    def __init__(self, file_generator, entries, to_path, max_members=None, max_size=None):
+        """Shard initializer.
+
+        :param file_generator: Translator the shard is part of.
+        :type file_generator: :class:`~nmrstarlib.translator.Translator`
+        :param entries: Iterator over files to write shared by all shards, peeked file first.
+        :param str to_path: Path to shard archive.
+        :param int max_members: Maximum number of members in shard.
+        :param int max_size: Number of bytes written into shard archive, before compression of tar archive,
+                             after which shard is closed.
+        """
+        self.file_generator = file_generator
+        self.entries = entries
+        self.to_path = to_path
+        self.max_members = max_members
+        self.max_size = max_size
+        self.sources = []
+        self.size = 0
+
+    def __getattr__(self, name):
+        return getattr(self.file_generator, name)
+
+    def __iter__(self):
+        """Iterator that yields files until the shard is full. Size of shard is the number of bytes
+        written into archive, counted before compression of tar archive (compressors buffer their
+        output, so size of the file on disk lags behind), and is checked after each member is written.
+        Shard can exceed `max_size` by at most one member and compressed tar shard is smaller than that.
+
+        :return: File to write.
+        """
+        for f in self.entries:
+            self.sources.append(f.source)
+            yield f
+            if self.max_members is not None and len(self.sources) >= self.max_members:
+                return
+            if self.max_size is not None and self.size >= self.max_size:
+                return
+
+
+def archive_size(archive):
+    """Number of bytes written into archive so far, before compression of tar archive.
+
+    :param archive: Archive members are added to.
+    :type archive: :py:class:`tarfile.TarFile` or :py:class:`zipfile.ZipFile`
+    :return: Size of archive in bytes.
+    :rtype: :py:class:`int`
+    """
+    if isinstance(archive, zipfile.ZipFile):
+        return archive.fp.tell()
+    return archive.offset
+
+
+def open_member(archive, name):
+    """Open archive member for writing.
+
+    :param archive: Archive to add member to.
+    :type archive: :py:class:`tarfile.TarFile` or :py:class:`zipfile.ZipFile`
+    :param str name: Name of archive member.
+    :return: Writable binary stream, member is added into archive when stream is closed.
+    """
+    if isinstance(archive, zipfile.ZipFile) and sys.version_info >= (3, 6):
+        return archive.open(name, mode="w")
+    return MemberWriter(archive, name)
+
 
 class Converter(object):
     """Converter class to convert NMR-STAR/CIF files from NMR-STAR/CIF to JSON or from JSON to NMR-STAR/CIF format."""
 
-    def __init__(self, file_generator):
+    def __init__(self, file_generator, xz_preset=None, threads=None, workers=None, compression_level=None, zip_method=None,
+                 shard_members=None, shard_size=None, transcode=True, dedup=False):
         """Converter initializer.
 
         :param file_generator:
         :type file_generator: :class:`nmrstarlib.converter.Translator`
+        :param int xz_preset: Compression preset (0-9) for xz and tar.xz output, :py:mod:`lzma` default (6) if not provided.
+        :param int threads: Number of threads to compress gz and tar.gz output with, single-threaded if not provided.
+        :param int workers: Number of worker processes to parse and serialize files in when converting
+                            directories and archives with :class:`~nmrstarlib.translator.StarFileToStarFile`,
+                            output is written by the current process in the order of input files.
+        :param int compression_level: Compression level of gz, bz2, zip, tar.gz and tar.bz2 output from 1 (fastest)
+                                      to 9 (smallest), also used as xz preset if `xz_preset` is not provided,
+                                      default level of each format if not provided. Compression level of zip
+                                      output requires Python 3.7 or later.
+        :param str zip_method: Compression method of zip archive members: `stored`, `deflated`, `bzip2` or `lzma`
+                               (`bzip2` and `lzma` require Python 3), `deflated` if not provided.
+        :param int shard_members: Maximum number of members per archive, zip and tar output is split into numbered
+                                  archives (e.g. `out-0001.tar.gz`) with a `.catalog.json` file of their members.
+        :param shard_size: Maximum size of archive in bytes or with an optional `K`, `M` or `G` suffix, output is
+                           split into numbered archives as with `shard_members`. Size of tar archive is counted
+                           before compression, so compressed tar archives are smaller, and archive can exceed
+                           it by at most one member.
+        :type shard_size: :py:class:`int` or :py:class:`str`
+        :param transcode: Convert NMR-STAR files into JSON with :func:`~nmrstarlib.transcoder.nmrstar_to_json`
+                          directly from lexer tokens instead of building :class:`~nmrstarlib.nmrstarlib.NMRStarFile`
+                          first, used with :class:`~nmrstarlib.translator.StarFileToStarFile` (not its subclasses).
+        :type transcode: :py:obj:`True` or :py:obj:`False`
+        :param dedup: Convert input files with the same content only once when converting directories and archives
+                      with :class:`~nmrstarlib.translator.StarFileToStarFile`. Duplicates are written as hard links
+                      into directory and tar output and as references in `.catalog.json` file of zip and
+                      sharded output.
+        :type dedup: :py:obj:`True` or :py:obj:`False`
         """
+        if zip_method is not None and zip_method not in ZIP_METHODS:
+            raise ValueError('Unknown or unsupported zip compression method: "{}"'.format(zip_method))
         self.file_generator = file_generator
+        self.xz_preset = xz_preset
+        self.threads = threads
+        self.workers = workers
+        self.compression_level = compression_level
+        self.zip_method = zip_method
+        self.shard_members = shard_members
+        self.shard_size = cache.DownloadCache.parse_size(shard_size)
+        self.transcode = transcode
+        self.dedup = dedup
+        self.duplicates = collections.OrderedDict()
+        self.manifest = None
+        self.checkpoint = None
+        self.report = None
+        self.error_log = None
+        self.failed = {}
 
-    def convert(self):
+    def convert(self, manifest=None, checkpoint=None, report=None, error_log=None):
         """Convert file(s) from NMR-STAR/CIF format to JSON format or from JSON format to NMR-STAR/CIF format.
 
+        :param manifest: Path to manifest file or manifest instance, local input files recorded in manifest
+                         are converted only if they changed, their outputs are missing or they were converted
+                         into another output path or format, converted files are recorded with their outputs.
+                         Cannot be used with zip/tar output, because archives are rewritten on every run.
+        :type manifest: :py:class:`str` or :class:`~nmrstarlib.manifest.Manifest`
+        :param checkpoint: Path to checkpoint file or checkpoint instance of many-to-many conversion. Converted
+                           files are recorded while conversion is running, interrupted conversion is resumed
+                           by skipping them and appending to existing directory, zip or tar output. Cannot be
+                           used with compressed tar output, because compressed tar archives cannot be appended to.
+                           Checkpoint file is removed once conversion is finished.
+        :type checkpoint: :py:class:`str` or :class:`~nmrstarlib.checkpoint.Checkpoint`
+        :param report: Path to report file or report instance, size of each file and time spent reading, lexing,
+                       building, serializing and writing it are recorded. NMR-STAR files transcoded into JSON
+                       are lexed while they are serialized, so both are recorded as serializing. Report file is
+                       written once conversion is finished, also if it fails.
+        :type report: :py:class:`str` or :class:`~nmrstarlib.report.Report`
+        :param error_log: Path to error log file or error log instance, input files that cannot be read or
+                          parsed are recorded in error log and skipped, conversion continues with the remaining
+                          files. NMR-STAR files transcoded into JSON are transcoded into memory first, so no
+                          partial output is written for them.
+        :type error_log: :py:class:`str` or :class:`~nmrstarlib.errorlog.ErrorLog`
         :return: None
         :rtype: :py:obj:`None`
         """
+        if len(self.file_generator.to_formats) > 1 and self.file_generator.to_path_compression in ("gz", "bz2", "xz"):
+            raise ValueError('Several output formats cannot be written into a single compressed file: "{}"'.format(
+                self.file_generator.to_path))
+
+        if self.file_generator.to_path_compression == "zip" and self.compression_level is not None \
+                and self.zip_method != "stored" and sys.version_info < (3, 7):
+            raise ValueError("Compression level of zip archive members requires Python 3.7 or later.")
+
+        if self.shard_members or self.shard_size:
+            if self.file_generator.to_path_compression not in ("zip", "tar", "tar.gz", "tar.bz2", "tar.xz"):
+                raise ValueError('Sharding requires zip or tar output: "{}"'.format(self.file_generator.to_path))
+            if checkpoint is not None:
+                raise ValueError("Checkpoint cannot be used with sharded output.")
+
+        if checkpoint is not None:
+            if self.file_generator.to_path_compression in ("tar.gz", "tar.bz2", "tar.xz"):
+                raise ValueError('Checkpoint cannot be used with compressed tar output: "{}"'.format(self.file_generator.to_path))
+            if self.dedup and self.file_generator.to_path_compression == "zip":
+                raise ValueError('Checkpoint cannot be used with deduplicated zip output: "{}"'.format(self.file_generator.to_path))
+            if not isinstance(checkpoint, Checkpoint):
+                checkpoint = Checkpoint(checkpoint)
+            self.file_generator.skip = checkpoint.completed
+        self.checkpoint = checkpoint
+
+        if manifest is not None:
+            if self.file_generator.to_path_compression in ("zip", "tar", "tar.gz", "tar.bz2", "tar.xz"):
+                raise ValueError('Manifest cannot be used with archive output: "{}"'.format(self.file_generator.to_path))
+            if not isinstance(manifest, Manifest):
+                manifest = Manifest(manifest)
+            manifest.target = {"path": os.path.abspath(self.file_generator.to_path),
+                               "formats": list(self.file_generator.to_formats)}
+        self.manifest = manifest
+        self.file_generator.manifest = manifest
+        self.duplicates.clear()
+
+        if report is not None and not isinstance(report, Report):
+            report = Report(report)
+        self.report = report
+        self.file_generator.report = report
+
+        if error_log is not None and not isinstance(error_log, ErrorLog):
+            error_log = ErrorLog(error_log)
+        self.error_log = error_log
+        self.file_generator.error_log = error_log
+        self.failed.clear()
+
         if not os.path.exists(os.path.dirname(self.file_generator.to_path)):
             dirname = os.path.dirname(self.file_generator.to_path)
             if dirname:
                 os.makedirs(dirname)
 
-        if os.path.isdir(self.file_generator.from_path):
-            self._many_to_many()
-        elif os.path.isfile(self.file_generator.from_path) or fileio.GenericFilePath.is_url(self.file_generator.from_path):
-            if self.file_generator.from_path_compression in ("zip", "tar", "tar.gz", "tar.bz2"):
+        try:
+            if os.path.isdir(self.file_generator.from_path):
                 self._many_to_many()
-            elif self.file_generator.from_path_compression in ("gz", "bz2"):
-                self._one_to_one()
-            elif not self.file_generator.from_path_compression:
+            elif os.path.isfile(self.file_generator.from_path) or fileio.GenericFilePath.is_url(self.file_generator.from_path):
+                if self.file_generator.from_path_compression in ("zip", "tar", "tar.gz", "tar.bz2", "tar.xz"):
+                    self._many_to_many()
+                elif self.file_generator.from_path_compression in ("gz", "bz2", "xz"):
+                    self._one_to_one()
+                elif not self.file_generator.from_path_compression:
+                    self._one_to_one()
+            elif self.file_generator.from_path.isdigit():
                 self._one_to_one()
-        elif self.file_generator.from_path.isdigit():
-            self._one_to_one()
-        else:
-            raise TypeError('Unknown input file format: "{}"'.format(self.file_generator.from_path))
+            else:
+                raise TypeError('Unknown input file format: "{}"'.format(self.file_generator.from_path))
+        finally:
+            if self.manifest is not None:
+                self.manifest.save()
+            if self.report is not None:
+                self.report.save()
+
+        if self.checkpoint is not None:
+            self.checkpoint.remove()
 
     def _many_to_many(self):
         """Perform many-to-many files conversion.
@@ -154,11 +689,15 @@ class Converter(object):
         """
         if not self.file_generator.to_path_compression:
             self._to_dir(self.file_generator)
+        elif self.shard_members or self.shard_size:
+            self._to_shards(self.file_generator)
         elif self.file_generator.to_path_compression == "zip":
             self._to_zipfile(self.file_generator)
-        elif self.file_generator.to_path_compression in ("tar", "tar.gz", "tar.bz2"):
+            if self.duplicates:
+                self._write_catalog(self.file_generator, {"duplicates": list(self.duplicates.values())})
+        elif self.file_generator.to_path_compression in ("tar", "tar.gz", "tar.bz2", "tar.xz"):
             self._to_tarfile(self.file_generator)
-        elif self.file_generator.to_path_compression in ("gz", "bz2"):
+        elif self.file_generator.to_path_compression in ("gz", "bz2", "xz"):
             raise TypeError('Many-to-one conversion, cannot convert "{}" into "{}"'.format(self.file_generator.from_path,
                                                                                            self.file_generator.to_path))
         else:
@@ -170,13 +709,19 @@ class Converter(object):
         :return: None
         :rtype: :py:obj:`None`
         """
+        if self.manifest is not None and os.path.isfile(self.file_generator.from_path) \
+                and not self.manifest.is_changed(self.file_generator.from_path):
+            return
+
         if not self.file_generator.to_path_compression:
             self._to_textfile(self.file_generator)
         elif self.file_generator.to_path_compression == "gz":
             self._to_gzipfile(self.file_generator)
         elif self.file_generator.to_path_compression == "bz2":
             self._to_bz2file(self.file_generator)
-        elif self.file_generator.to_path_compression in ("tar", "tar.gz", "tar.bz2", "zip"):
+        elif self.file_generator.to_path_compression == "xz":
+            self._to_xzfile(self.file_generator)
+        elif self.file_generator.to_path_compression in ("tar", "tar.gz", "tar.bz2", "tar.xz", "zip"):
             raise TypeError('One-to-many conversion, cannot convert "{}" into "{}"'.format(self.file_generator.from_path,
                                                                                            self.file_generator.to_path))
         else:
@@ -188,14 +733,24 @@ class Converter(object):
         :return: None
         :rtype: :py:obj:`None`
         """
-        for f in file_generator:
-            outpath = self._output_path(f.source, file_generator.to_format)
+        if self.checkpoint is not None:
+            self.checkpoint.resume()
+
+        for f in self._entries(file_generator):
+            for to_format in file_generator.to_formats:
+                outpath = self._output_path(f.source, to_format)
 
-            if not os.path.exists(os.path.dirname(outpath)):
-                os.makedirs(os.path.dirname(outpath))
+                if not os.path.exists(os.path.dirname(outpath)):
+                    os.makedirs(os.path.dirname(outpath))
 
-            with open(outpath, mode="w") as outfile:
-                f.write(outfile, file_generator.to_format)
+                if isinstance(f, DuplicateFile):
+                    with stage(self.report, f.source, "write"):
+                        self._link(self._output_path(f.original, to_format), outpath)
+                else:
+                    self._write_member(f, io.open(outpath, mode="wb"), to_format, self.report)
+                self._add_output(f, outpath)
+            if self.checkpoint is not None:
+                self.checkpoint.add([getattr(f, "starfile_source", f.source)])
 
     def _to_zipfile(self, file_generator):
         """Convert files to zip archive.
@@ -203,10 +758,12 @@ class Converter(object):
         :return: None
         :rtype: :py:obj:`None`
         """
-        with zipfile.ZipFile(file_generator.to_path, mode="w", compression=zipfile.ZIP_DEFLATED) as outfile:
-            for f in file_generator:
-                outpath = self._output_path(f.source, file_generator.to_format, archive=True)
-                outfile.writestr(outpath, f.writestr(file_generator.to_format))
+        compression = ZIP_METHODS[self.zip_method or "deflated"]
+        options = {"compresslevel": self.compression_level} \
+            if self.compression_level is not None and compression != zipfile.ZIP_STORED else {}
+
+        self._to_archive(file_generator, lambda mode: zipfile.ZipFile(file_generator.to_path, mode=mode,
+                                                                      compression=compression, **options))
 
     def _to_tarfile(self, file_generator):
         """Convert files to tar archive.
@@ -220,16 +777,361 @@ class Converter(object):
             tar_mode = "w:gz"
         elif file_generator.to_path_compression == 'tar.bz2':
             tar_mode = "w:bz2"
+        elif file_generator.to_path_compression == "tar.xz":
+            tar_mode = "w:xz"
         else:
             tar_mode = "w"
 
-        with tarfile.open(file_generator.to_path, mode=tar_mode) as outfile:
-            for f in file_generator:
-                outpath = self._output_path(f.source, file_generator.to_format, archive=True)
+        if tar_mode == "w:xz":
+            options = {"preset": self._xz_preset()} if self._xz_preset() is not None else {}
+        elif tar_mode in ("w:gz", "w:bz2"):
+            options = {"compresslevel": self._compresslevel()}
+        else:
+            options = {}
+
+        if self.checkpoint is not None:
+            self._to_archive(file_generator, lambda mode: tarfile.open(file_generator.to_path, mode=mode))
+            return
+
+        if tar_mode == "w:gz" and self.threads:
+            gzipfile = ParallelGzipWriter(io.open(file_generator.to_path, "wb"), self.threads,
+                                          compresslevel=self._compresslevel())
+            tararchive = tarfile.open(fileobj=gzipfile, mode="w|")
+        else:
+            gzipfile = None
+            tararchive = tarfile.open(file_generator.to_path, mode=tar_mode, **options)
+
+        try:
+            with tararchive as outfile:
+                for f in self._entries(file_generator):
+                    self._write_archive_entry(f, outfile, file_generator)
+        finally:
+            if gzipfile is not None:
+                gzipfile.close()
+
+    def _to_shards(self, file_generator):
+        """Convert files to numbered zip or tar archives and write catalog of their members.
+
+        :param file_generator: Translator that yields files.
+        :type file_generator: :class:`~nmrstarlib.translator.Translator`
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        compression = file_generator.to_path_compression
+        basepath = file_generator.to_path[:-len(compression) - 1]
+        entries = self._entries(file_generator)
+        shards = []
+
+        for f in entries:
+            shard_path = "{}-{:04d}.{}".format(basepath, len(shards) + 1, compression)
+            shard = Shard(file_generator, itertools.chain([f], entries), shard_path,
+                          max_members=self.shard_members, max_size=self.shard_size)
+            if compression == "zip":
+                self._to_zipfile(shard)
+            else:
+                self._to_tarfile(shard)
+
+            members = []
+            for source in shard.sources:
+                for to_format in file_generator.to_formats:
+                    name = self._output_path(source, to_format, archive=True)
+                    members.append(self.duplicates.get(name, {"name": name, "source": source}))
+            shards.append({"path": os.path.basename(shard_path), "members": members})
+
+        self._write_catalog(file_generator, {"shards": shards})
+
+    @staticmethod
+    def _write_catalog(file_generator, catalog):
+        """Write catalog of archive output next to the archive, e.g. `out.catalog.json` for `out.tar.gz`.
+
+        :param file_generator: Translator that provides output path.
+        :type file_generator: :class:`~nmrstarlib.translator.Translator`
+        :param dict catalog: Catalog to write.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        basepath = file_generator.to_path[:-len(file_generator.to_path_compression) - 1]
+        with io.open(basepath + ".catalog.json", "w", encoding="utf-8") as outfile:
+            outfile.write(u"{}".format(json.dumps(catalog, indent=4)))
+
+    def _write_archive_entry(self, f, archive, file_generator):
+        """Write file into archive in every output format. Duplicate file is added into tar archive
+        as hard link member, duplicates in zip archives and shards are recorded for the catalog.
+
+        :param f: File to write.
+        :param archive: Archive to add members to.
+        :type archive: :py:class:`tarfile.TarFile` or :py:class:`zipfile.ZipFile`
+        :param file_generator: Translator or shard that yields files.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        for to_format in file_generator.to_formats:
+            outpath = self._output_path(f.source, to_format, archive=True)
+            if not isinstance(f, DuplicateFile):
+                self._write_member(f, open_member(archive, outpath), to_format, self.report)
+                continue
+
+            target = self._output_path(f.original, to_format, archive=True)
+            if isinstance(archive, tarfile.TarFile) and not isinstance(file_generator, Shard):
                 info = tarfile.TarInfo(outpath)
-                data = f.writestr(file_generator.to_format).encode()
-                info.size = len(data)
-                outfile.addfile(tarinfo=info, fileobj=io.BytesIO(data))
+                info.type = tarfile.LNKTYPE
+                info.linkname = target
+                archive.addfile(info)
+            else:
+                self.duplicates[outpath] = {"name": outpath, "source": f.source, "duplicate_of": target}
+
+        if isinstance(file_generator, Shard):
+            file_generator.size = archive_size(archive)
+
+    @staticmethod
+    def _link(target, path):
+        """Create hard link to output file, file is copied if hard link cannot be created.
+
+        :param str target: Path to existing output file.
+        :param str path: Path to link.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if os.path.lexists(path):
+            os.remove(path)
+        try:
+            os.link(target, path)
+        except (OSError, AttributeError):
+            shutil.copyfile(target, path)
+
+    def _to_archive(self, file_generator, open_archive):
+        """Convert files to zip or uncompressed tar archive. With checkpoint, converted files are recorded
+        together with archive size every `CHECKPOINT_INTERVAL` members, so that interrupted conversion resumes
+        from the last commit. Tar archive stays open, its members end at the current offset. Zip archive has to
+        be closed and reopened for appending, which rewrites its central directory, so the interval grows with
+        the number of written members.
+
+        :param file_generator: Translator that yields files.
+        :type file_generator: :class:`~nmrstarlib.translator.Translator`
+        :param open_archive: Callable that opens output archive in the given mode (`w` or `a`).
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        mode = "a" if self.checkpoint is not None and self.checkpoint.resume(file_generator.to_path) else "w"
+        if mode == "a" and file_generator.to_path_compression == "tar":
+            # tar archive is committed without end-of-archive blocks, appending to it expects them
+            with io.open(file_generator.to_path, "ab") as outfile:
+                outfile.write(tarfile.NUL * tarfile.BLOCKSIZE * 2)
+
+        entries = self._entries(file_generator)
+        written = 0
+
+        while True:
+            converted = []
+            interval = max(CHECKPOINT_INTERVAL, written // 4)
+            with open_archive(mode) as outfile:
+                for f in entries:
+                    self._write_archive_entry(f, outfile, file_generator)
+                    converted.append(getattr(f, "starfile_source", f.source))
+                    if self.checkpoint is None or len(converted) < interval:
+                        continue
+                    elif not isinstance(outfile, tarfile.TarFile):
+                        break
+                    outfile.fileobj.flush()
+                    self.checkpoint.add(converted, outfile.offset)
+                    converted = []
+
+            if self.checkpoint is None:
+                return
+            self.checkpoint.add(converted, os.path.getsize(file_generator.to_path))
+            if len(converted) < interval:
+                return
+            written += len(converted)
+            mode = "a"
+
+    def _entries(self, file_generator):
+        """Iterate over files to write, parsed and serialized by worker processes if `workers` is set,
+        transcoded from NMR-STAR into JSON if `transcode` is set and deduplicated if `dedup` is set.
+
+        :param file_generator: Translator that yields files.
+        :type file_generator: :class:`~nmrstarlib.translator.Translator`
+        :return: Iterator over files to write.
+        """
+        # subclasses may override iteration over files, so they are iterated as any other translator
+        if type(file_generator) is translator.StarFileToStarFile:
+            if self.workers:
+                return self._recorded(self._parallel_entries(file_generator))
+            elif self.dedup or (self.transcode and file_generator.to_formats == ["json"]):
+                return self._recorded(self._loaded_entries(file_generator))
+        return iter(file_generator)
+
+    def _recorded(self, entries):
+        """Mark sources of files in manifest as done once they were written, i.e. once the next file
+        is requested, so input files are recorded in manifest only after their outputs were written.
+
+        :param entries: Iterator over files to write.
+        :return: Iterator over files to write.
+        """
+        for f in entries:
+            yield f
+            if self.manifest is not None:
+                self.manifest.done(f.source)
+
+        if self.manifest is not None:
+            self.manifest.done_all()
+
+    def _contents(self, file_generator):
+        """Read contents of input files, sources read from local input files are added to manifest.
+
+        :param file_generator: Translator that provides input path.
+        :type file_generator: :class:`~nmrstarlib.translator.StarFileToStarFile`
+        :return: File content and source.
+        :rtype: :py:class:`tuple`
+        """
+        filenames = fileio._generate_filenames([file_generator.from_path])
+        for fh, source in fileio._generate_handles(filenames, self.manifest, file_generator.skip, self.error_log):
+            try:
+                with stage(self.report, source, "read"):
+                    content = fh.read()
+            except Exception as exc:
+                if self.error_log is None:
+                    raise
+                self.error_log.add(source, exc)
+                continue
+            yield content, source
+
+    def _unique_contents(self, file_generator):
+        """Read contents of input files and find files with the same content as an earlier file,
+        if `dedup` is set. Content is compared by its SHA-1 hash.
+
+        :param file_generator: Translator that provides input path.
+        :type file_generator: :class:`~nmrstarlib.translator.StarFileToStarFile`
+        :return: File content, source and source of the earlier file with the same content or None.
+        :rtype: :py:class:`tuple`
+        """
+        originals = {}
+        contents = self._contents(file_generator)
+        try:
+            for content, source in contents:
+                if not self.dedup:
+                    yield content, source, None
+                    continue
+
+                digest = hashlib.sha1(content if isinstance(content, bytes) else content.encode("utf-8")).hexdigest()
+                original = originals.setdefault(digest, source)
+                yield content, source, original if original != source else None
+        finally:
+            contents.close()
+
+    def _loaded_entries(self, file_generator):
+        """Read files, transcode NMR-STAR files into JSON without parsing them if `transcode` is set
+        and skip files with the same content as an earlier file if `dedup` is set.
+
+        :param file_generator: Translator that provides input path and output format.
+        :type file_generator: :class:`~nmrstarlib.translator.StarFileToStarFile`
+        :return: File to write.
+        :rtype: :class:`~nmrstarlib.converter.TranscodedFile`, :class:`~nmrstarlib.converter.DuplicateFile`
+                or :class:`~nmrstarlib.nmrstarlib.StarFile`
+        """
+        for content, source, original in self._unique_contents(file_generator):
+            if original is not None:
+                duplicate = self._duplicate(source, original)
+                if duplicate is not None:
+                    yield duplicate
+                continue
+
+            try:
+                f = _load(content, source, file_generator.to_formats, self.transcode, self.report)
+                if self.error_log is not None and isinstance(f, TranscodedFile):
+                    outfile = io.BytesIO()
+                    with stage(self.report, source, "serialize"):
+                        self._write_member(f, SharedWriter(outfile), "json")
+                    f = SerializedFile(source, {"json": outfile.getvalue()})
+            except Exception as exc:
+                if self.error_log is None:
+                    raise
+                self._fail(ErrorLog.describe(source, exc, content))
+                continue
+            yield f
+
+    def _parallel_entries(self, file_generator):
+        """Read files in the current process, parse and serialize them in a pool of worker processes.
+        Files are yielded in the order they are read and at most twice the number of workers
+        files are in flight at once.
+
+        :param file_generator: Translator that provides input path and output format.
+        :type file_generator: :class:`~nmrstarlib.translator.StarFileToStarFile`
+        :return: Serialized file.
+        :rtype: :class:`~nmrstarlib.converter.SerializedFile` or :class:`~nmrstarlib.converter.DuplicateFile`
+        """
+        settings = {"JSON_LAYOUT": nmrstarlib.JSON_LAYOUT,
+                    "NMRSTAR_VERSION": nmrstarlib.NMRSTAR_VERSION}
+        contents = self._unique_contents(file_generator)
+
+        pending = collections.deque()
+        with futures.ProcessPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for content, source, original in contents:
+                    if original is not None:
+                        duplicate = futures.Future()
+                        duplicate.set_result(DuplicateFile(source, original))
+                        pending.append(duplicate)
+                        continue
+
+                    pending.append(executor.submit(_serialize, content, source, file_generator.to_formats, settings,
+                                                   self.transcode, self.report is not None, self.error_log is not None))
+                    while len(pending) >= 2 * self.workers:
+                        f = self._result(pending.popleft())
+                        if f is not None:
+                            yield f
+
+                while pending:
+                    f = self._result(pending.popleft())
+                    if f is not None:
+                        yield f
+            finally:
+                for future in pending:
+                    future.cancel()
+                contents.close()
+
+    def _result(self, future):
+        """Result of worker process, its report record is merged into report and its error record,
+        if file could not be converted, is written into error log.
+
+        :param future: Future of serialized file.
+        :type future: :py:class:`concurrent.futures.Future`
+        :return: Serialized file or None if file could not be converted.
+        :rtype: :class:`~nmrstarlib.converter.SerializedFile`, :class:`~nmrstarlib.converter.DuplicateFile`
+                or :py:obj:`None`
+        """
+        f = future.result()
+        if isinstance(f, dict):
+            self._fail(f)
+            return None
+        if isinstance(f, DuplicateFile):
+            return self._duplicate(f.source, f.original)
+        if self.report is not None and getattr(f, "record", None) is not None:
+            self.report.merge(f.record)
+        return f
+
+    def _fail(self, record):
+        """Write error record of input file into error log and remember it, so that
+        duplicates of the file are skipped as well.
+
+        :param dict record: Error record, see :meth:`~nmrstarlib.errorlog.ErrorLog.describe`.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        self.failed[record["source"]] = record
+        self.error_log.append(record)
+
+    def _duplicate(self, source, original):
+        """Duplicate of earlier input file, skipped if the earlier file could not be converted.
+
+        :param str source: String indicating where file is coming from (path, url).
+        :param str original: Source of the earlier input file with the same content.
+        :return: Duplicate file or None if the earlier file could not be converted.
+        :rtype: :class:`~nmrstarlib.converter.DuplicateFile` or :py:obj:`None`
+        """
+        if original in self.failed:
+            self._fail(dict(self.failed[original], source=source))
+            return None
+        return DuplicateFile(source, original)
 
     def _to_bz2file(self, file_generator):
         """Convert file to bz2-compressed file.
@@ -237,9 +1139,21 @@ class Converter(object):
         :return: None
         :rtype: :py:obj:`None`
         """
-        with bz2.BZ2File(file_generator.to_path, mode="wb") as outfile:
-            for f in file_generator:
-                outfile.write(f.writestr(file_generator.to_format).encode())
+        with bz2.BZ2File(file_generator.to_path, mode="wb", compresslevel=self._compresslevel()) as outfile:
+            for f in self._entries(file_generator):
+                self._write_member(f, SharedWriter(outfile), file_generator.to_format, self.report)
+                self._add_output(f, file_generator.to_path)
+
+    def _to_xzfile(self, file_generator):
+        """Convert file to xz-compressed file.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with lzma.LZMAFile(file_generator.to_path, mode="wb", preset=self._xz_preset()) as outfile:
+            for f in self._entries(file_generator):
+                self._write_member(f, SharedWriter(outfile), file_generator.to_format, self.report)
+                self._add_output(f, file_generator.to_path)
 
     def _to_gzipfile(self, file_generator):
         """Convert file to gzip-compressed file.
@@ -247,9 +1161,16 @@ class Converter(object):
         :return: None
         :rtype: :py:obj:`None`
         """
-        with gzip.GzipFile(file_generator.to_path, mode="wb") as outfile:
-            for f in file_generator:
-                outfile.write(f.writestr(file_generator.to_format).encode())
+        if self.threads:
+            outfile = ParallelGzipWriter(io.open(file_generator.to_path, "wb"), self.threads,
+                                         compresslevel=self._compresslevel())
+        else:
+            outfile = gzip.GzipFile(file_generator.to_path, mode="wb", compresslevel=self._compresslevel())
+
+        with outfile:
+            for f in self._entries(file_generator):
+                self._write_member(f, SharedWriter(outfile), file_generator.to_format, self.report)
+                self._add_output(f, file_generator.to_path)
 
     def _to_textfile(self, file_generator):
         """Convert file to regular text file.
@@ -257,13 +1178,81 @@ class Converter(object):
         :return: None
         :rtype: :py:obj:`None`
         """
-        to_path = file_generator.to_path \
-            if file_generator.to_path.endswith(file_generator.file_extension[file_generator.to_format]) \
-            else file_generator.to_path + file_generator.file_extension[file_generator.to_format]
+        outfiles = collections.OrderedDict()
+        try:
+            for to_format in file_generator.to_formats:
+                extension = file_generator.file_extension[to_format]
+                to_path = file_generator.to_path if file_generator.to_path.endswith(extension) \
+                    else file_generator.to_path + extension
+                outfiles[to_format] = (to_path, open(to_path, mode="wb"))
+
+            for f in self._entries(file_generator):
+                for to_format, (to_path, outfile) in outfiles.items():
+                    self._write_member(f, SharedWriter(outfile), to_format, self.report)
+                    self._add_output(f, to_path)
+        finally:
+            for to_path, outfile in outfiles.values():
+                outfile.close()
+
+    def _compresslevel(self):
+        """Compression level of gz and bz2 output.
+
+        :return: Compression level, 9 if not provided.
+        :rtype: :py:class:`int`
+        """
+        return 9 if self.compression_level is None else self.compression_level
+
+    def _xz_preset(self):
+        """Compression preset of xz output.
+
+        :return: Compression preset or None to use :py:mod:`lzma` default.
+        :rtype: :py:class:`int` or :py:obj:`None`
+        """
+        return self.xz_preset if self.xz_preset is not None else self.compression_level
+
+    def _add_output(self, f, outpath):
+        """Record output file in manifest, if conversion uses one.
+
+        :param f: Instance that was written.
+        :type f: :class:`~nmrstarlib.nmrstarlib.StarFile` or :class:`~nmrstarlib.plsimulator.PeakList`
+        :param str outpath: Path to output file.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if self.manifest is not None:
+            self.manifest.add_output(getattr(f, "starfile_source", f.source), outpath)
+
+    @staticmethod
+    def _write_member(f, member, to_format, report=None):
+        """Write file into writable binary stream incrementally. If report is provided, file is
+        serialized into memory first, so time spent serializing is recorded apart from time spent writing.
+
+        :param f: Instance to be written.
+        :type f: :class:`~nmrstarlib.nmrstarlib.StarFile` or :class:`~nmrstarlib.plsimulator.PeakList`
+        :param member: Writable binary stream, closed after writing.
+        :param str to_format: Output format.
+        :param report: Report to record time spent serializing and writing file in.
+        :type report: :class:`~nmrstarlib.report.Report`
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if report is None:
+            f.write(TextWriter(member), to_format)
+            return
+
+        source = getattr(f, "starfile_source", f.source)
+        if isinstance(f, SerializedFile):
+            data = f.data[to_format]
+        else:
+            outfile = io.BytesIO()
+            with stage(report, source, "serialize"):
+                f.write(TextWriter(SharedWriter(outfile)), to_format)
+            data = outfile.getvalue()
 
-        with open(to_path, mode="w") as outfile:
-            for f in file_generator:
-                outfile.write(f.writestr(file_generator.to_format))
+        with stage(report, source, "write"):
+            member.write(data)
+            member.close()
+        report.add_output(source, len(data))
 
     def _output_path(self, inputpath, to_format, archive=False):
         """Construct an output path string from an input path string.
@@ -9,8 +9,11 @@ This module provides the :class:`~nmrstarlib.csviewer.CSViewer` class - Chemical
 that visualizes chemical shifts values.
 """
 
+import os
+
 from graphviz import Source
 from . import fileio
+from .report import Report, stage
 
 class CSViewer(object):
     """Chemical Shifts Viewer uses :meth:`~nmrstarlib.nmrstarlib.NMRStarFile.chem_shifts_by_residue`
@@ -67,19 +70,42 @@ class CSViewer(object):
         self.csview_format = csview_format
         self.nmrstar_version = nmrstar_version
 
-    def csview(self, view=False):
+    def csview(self, view=False, report=None):
         """View chemical shift values organized by amino acid residue.
 
         :param view: Open in default image viewer or save file in current working directory quietly.
         :type view: :py:obj:`True` or :py:obj:`False`
+        :param report: Path to report file or report instance, size of each file and time spent reading,
+                       lexing, building and rendering it are recorded.
+        :type report: :py:class:`str` or :class:`~nmrstarlib.report.Report`
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if report is not None and not isinstance(report, Report):
+            report = Report(report)
+
+        try:
+            self._csview(view, report)
+        finally:
+            if report is not None:
+                report.save()
+
+    def _csview(self, view, report):
+        """Render chemical shift values of each file.
+
+        :param view: Open in default image viewer or save file in current working directory quietly.
+        :type view: :py:obj:`True` or :py:obj:`False`
+        :param report: Report to record files in.
+        :type report: :class:`~nmrstarlib.report.Report`
         :return: None
         :rtype: :py:obj:`None`
         """
-        for starfile in fileio.read_files(self.from_path):
-            chains = starfile.chem_shifts_by_residue(amino_acids=self.amino_acids,
-                                                     atoms=self.atoms,
-                                                     amino_acids_and_atoms=self.amino_acids_and_atoms,
-                                                     nmrstar_version=self.nmrstar_version)
+        for starfile in fileio.read_files(self.from_path, report=report):
+            with stage(report, starfile.source, "build"):
+                chains = starfile.chem_shifts_by_residue(amino_acids=self.amino_acids,
+                                                         atoms=self.atoms,
+                                                         amino_acids_and_atoms=self.amino_acids_and_atoms,
+                                                         nmrstar_version=self.nmrstar_version)
 
             for idx, chemshifts_dict in enumerate(chains):
                 nodes = []
@@ -119,4 +145,7 @@ class CSViewer(object):
                     filename = "{}_{}".format(self.filename, idx)
 
                 src = Source(self.dot_template.format("\n".join(nodes), "\n".join(edges)), format=self.csview_format)
-                src.render(filename=filename, view=view)
+                with stage(report, starfile.source, "write"):
+                    outpath = src.render(filename=filename, view=view)
+                if report is not None:
+                    report.add_output(starfile.source, os.path.getsize(outpath))
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nmrstarlib.errorlog
+~~~~~~~~~~~~~~~~~~~
+
+This module provides the :class:`~nmrstarlib.errorlog.ErrorLog` class
+that records input files that could not be read, so batch processing
+can skip malformed files instead of being aborted by them.
+"""
+
+import io
+import json
+import threading
+import collections
+
+from . import nmrstarlib
+
+
+class _TokenCounter(object):
+    """Iterator over tokens that remembers the last two tokens and the number of tokens consumed."""
+
+    def __init__(self, lexer):
+        """Token counter initializer.
+
+        :param lexer: instance of the lexical analyzer.
+        :type lexer: :func:`~nmrstarlib.bmrblex.bmrblex`
+        """
+        self.lexer = lexer
+        self.count = 0
+        self.tokens = collections.deque(maxlen=2)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = next(self.lexer)
+        self.tokens.append(token)
+        self.count += 1
+        return token
+
+    next = __next__
+
+
+def locate(content, source):
+    """Find token at which building :class:`~nmrstarlib.nmrstarlib.StarFile` from file content fails.
+    File content is parsed again while counting tokens, so it is only used once parsing has failed.
+
+    :param content: File content.
+    :type content: :py:class:`str` or :py:class:`bytes`
+    :param str source: String indicating where file is coming from (path, url).
+    :return: Failing token and its index from the beginning of file or None if content is not
+             NMR-STAR or CIF formatted or parsing does not fail.
+    :rtype: :py:class:`dict` or :py:obj:`None`
+    """
+    try:
+        nmrstar_str = nmrstarlib.StarFile._is_nmrstar(content)
+        cif_str = nmrstarlib.StarFile._is_cif(content) if not nmrstar_str else None
+    except Exception:
+        return None
+
+    if nmrstar_str:
+        starfile, text = nmrstarlib.NMRStarFile(source), nmrstar_str
+    elif cif_str:
+        starfile, text = nmrstarlib.CIFFile(source), cif_str
+    else:
+        return None
+
+    tokens = _TokenCounter(nmrstarlib.bmrblex(text))
+    starfile._lexer = lambda text, report=None: tokens
+    try:
+        starfile._build_file(text)
+    except StopIteration:
+        return {"token": tokens.tokens[-1], "token_index": tokens.count - 1} if tokens.count else None
+    except Exception:
+        # the builder reads the next token on its way out of the failing token
+        if len(tokens.tokens) < 2:
+            return None
+        return {"token": tokens.tokens[0], "token_index": tokens.count - 2}
+    return None
+
+
+class ErrorLog(object):
+    """Append-only log of input files that could not be read.
+
+    Each line of error log file is a ``JSON`` record with the source of file, type and message
+    of exception and, for ``NMR-STAR`` and ``CIF`` files, the token at which parsing failed
+    together with its index from the beginning of file.
+    """
+
+    def __init__(self, path):
+        """Error log initializer, records are appended to existing error log file.
+
+        :param str path: Path to error log file.
+        """
+        self.path = path
+        self.records = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def describe(source, exc, content=None):
+        """Describe error of input file.
+
+        :param str source: String indicating where file is coming from (path, url).
+        :param exc: Exception raised while file was read.
+        :type exc: :py:class:`Exception`
+        :param content: File content, used to find the failing token.
+        :type content: :py:class:`str` or :py:class:`bytes`
+        :return: Error record.
+        :rtype: :py:class:`dict`
+        """
+        record = {"source": source,
+                  "exception": type(exc).__name__,
+                  "message": str(exc),
+                  "token": None,
+                  "token_index": None}
+        if content is not None:
+            record.update(locate(content, source) or {})
+        return record
+
+    def add(self, source, exc, content=None):
+        """Record input file that could not be read.
+
+        :param str source: String indicating where file is coming from (path, url).
+        :param exc: Exception raised while file was read.
+        :type exc: :py:class:`Exception`
+        :param content: File content, used to find the failing token.
+        :type content: :py:class:`str` or :py:class:`bytes`
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        self.append(self.describe(source, exc, content))
+
+    def append(self, record):
+        """Write error record, e.g. made by :meth:`~nmrstarlib.errorlog.ErrorLog.describe` in a worker process.
+
+        :param dict record: Error record.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if nmrstarlib.VERBOSE:
+            print("Skipping file that cannot be read: {} ({}: {})".format(record["source"], record["exception"],
+                                                                           record["message"]))
+        with self._lock:
+            self.records.append(record)
+            with io.open(self.path, "a", encoding="utf-8") as outfile:
+                outfile.write(u"{}\n".format(json.dumps(record)))
@@ -22,24 +22,65 @@ import zipfile
 import tarfile
 import bz2
 import gzip
+import zlib
+import shutil
+import tempfile
 import re
+import json
+import fnmatch
+import hashlib
+import collections
+import threading
+import weakref
 
 from . import nmrstarlib
+from . import cache
+from . import mirror
+from .manifest import Manifest
+from .errorlog import ErrorLog
 
 if sys.version_info.major == 3:
-    from urllib.request import urlopen
+    from urllib.request import urlopen, Request
     from urllib.parse import urlparse
     from urllib.error import HTTPError
+    from concurrent import futures
+    from queue import Queue, Full
 else:
-    from urllib2 import urlopen
+    from urllib2 import urlopen, Request
     from urlparse import urlparse
     from urllib2 import HTTPError
+    from Queue import Queue, Full
+    try:
+        from concurrent import futures
+    except ImportError:
+        futures = None
 
+try:
+    import lzma
+except ImportError:
+    lzma = None
 
-def _generate_filenames(sources):
+try:
+    from os import scandir as _scandir
+except ImportError:
+    from scandir import scandir as _scandir
+
+
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+PARSED_SIZE_FACTOR = 10
+
+
+def _generate_filenames(sources, include=None, exclude=None, extensions=None, largest_first=False):
     """Generate filenames.
 
     :param tuple sources: Sequence of strings representing path to file(s).
+    :param list include: Glob patterns, files in directories are skipped unless their name
+                         or path relative to the directory matches one of the patterns.
+    :param list exclude: Glob patterns, files in directories whose name or path relative to
+                         the directory matches one of the patterns are skipped.
+    :param list extensions: File extensions, files in directories with other extensions are skipped.
+    :param largest_first: Yield files in directories in order of decreasing size.
+    :type largest_first: :py:obj:`True` or :py:obj:`False`
     :return: Path to file(s).
     :rtype: :py:class:`str`
     """
@@ -47,16 +88,11 @@ def _generate_filenames(sources):
     for source in sources:
 
         if os.path.isdir(source):
-            for path, dirlist, filelist in os.walk(source):
-                for fname in filelist:
-                    if nmrstarlib.VERBOSE:
-                        print("Processing file: {}".format(os.path.abspath(fname)))
-                    if GenericFilePath.is_compressed(fname):
-                        if nmrstarlib.VERBOSE:
-                            print("Skipping compressed file: {}".format(os.path.abspath(fname)))
-                        continue
-                    else:
-                        yield os.path.join(path, fname)
+            filenames = _scan_directory(source, include, exclude, extensions)
+            if largest_first:
+                filenames = sorted(filenames, key=os.path.getsize, reverse=True)
+            for fname in filenames:
+                yield fname
 
         elif os.path.isfile(source):
             yield source
@@ -65,12 +101,7 @@ def _generate_filenames(sources):
             yield source
 
         elif source.isdigit():
-            try:
-                urlopen(nmrstarlib.BMRB_REST + source)
-                yield nmrstarlib.BMRB_REST + source
-            except HTTPError:
-                urlopen(nmrstarlib.PDB_REST + source + ".cif")
-                yield nmrstarlib.PDB_REST + source + ".cif"
+            yield _mirror_path(source) or _resolve_id(source)
 
         elif re.match("[\w\d]{4}", source):
             yield nmrstarlib.PDB_REST + source + ".cif"
@@ -79,34 +110,813 @@ def _generate_filenames(sources):
             raise TypeError("Unknown file source.")
 
 
-def _generate_handles(filenames):
+def _scan_directory(directory, include=None, exclude=None, extensions=None):
+    """Recursively scan directory with :func:`os.scandir` and yield files that pass the filters.
+    Compressed files are skipped.
+
+    :param str directory: Path to directory.
+    :param list include: Glob patterns of files to include.
+    :param list exclude: Glob patterns of files to exclude.
+    :param list extensions: File extensions to include.
+    :return: Path to file.
+    :rtype: :py:class:`str`
+    """
+    directories = collections.deque([directory])
+
+    while directories:
+        for entry in _scandir(directories.popleft()):
+            # symbolic links to directories are not followed, the same as by os.walk
+            if entry.is_dir(follow_symlinks=False):
+                directories.append(entry.path)
+                continue
+            elif not entry.is_file():
+                continue
+
+            names = (entry.name, os.path.relpath(entry.path, directory).replace(os.sep, "/"))
+            if GenericFilePath.is_compressed(entry.name):
+                if nmrstarlib.VERBOSE:
+                    print("Skipping compressed file: {}".format(os.path.abspath(entry.path)))
+            elif extensions and not entry.name.lower().endswith(tuple(ext.lower() for ext in extensions)):
+                continue
+            elif include and not any(fnmatch.fnmatch(name, pattern) for name in names for pattern in include):
+                continue
+            elif exclude and any(fnmatch.fnmatch(name, pattern) for name in names for pattern in exclude):
+                continue
+            else:
+                yield entry.path
+
+
+_mirror_indexes = {}
+
+
+def _mirror_path(source):
+    """Find BMRB entry in local mirror set in :data:`~nmrstarlib.nmrstarlib.BMRB_MIRROR`.
+
+    :param str source: BMRB ID.
+    :return: Path to file or None if mirror is not set or entry is not in mirror.
+    :rtype: :py:class:`str` or :py:obj:`None`
+    """
+    root = nmrstarlib.BMRB_MIRROR
+    if not root:
+        return None
+
+    if root not in _mirror_indexes:
+        _mirror_indexes[root] = mirror.MirrorIndex(root)
+    return _mirror_indexes[root].path(source)
+
+
+_resolved_ids = {}
+_probe_responses = {}
+
+
+def _resolve_id(source):
+    """Resolve numeric ID into URL address of BMRB entry or, if BMRB entry does not exist,
+    PDB entry. Existence of BMRB entry is checked with HEAD request, so the file is downloaded
+    only once, and resolved URL addresses are remembered between calls. If server does not
+    allow HEAD requests, GET request is used instead and its response is kept to be opened
+    by :func:`~nmrstarlib.fileio._urlopen`, so the file is still transferred once.
+
+    :param str source: BMRB ID or numeric PDB ID.
+    :return: URL address of file.
+    :rtype: :py:class:`str`
+    """
+    bmrb_url = nmrstarlib.BMRB_REST + source
+    pdb_url = nmrstarlib.PDB_REST + source + ".cif"
+
+    if (bmrb_url, pdb_url) not in _resolved_ids:
+        if nmrstarlib.CACHE_DIR and cache.DownloadCache(nmrstarlib.CACHE_DIR).is_cached(bmrb_url):
+            url = bmrb_url
+        elif nmrstarlib.CACHE_DIR and cache.DownloadCache(nmrstarlib.CACHE_DIR).is_cached(pdb_url):
+            url = pdb_url
+        else:
+            request = Request(bmrb_url)
+            request.get_method = lambda: "HEAD"
+            try:
+                try:
+                    urlopen(request).close()
+                except HTTPError as exc:
+                    # server does not allow HEAD requests
+                    if exc.code not in (405, 501):
+                        raise
+                    _probe_responses[bmrb_url] = urlopen(bmrb_url)
+                url = bmrb_url
+            except HTTPError as exc:
+                # only missing BMRB entry falls back to PDB, other errors are raised and not remembered
+                if exc.code != 404:
+                    raise
+                url = pdb_url
+        _resolved_ids[(bmrb_url, pdb_url)] = url
+
+    return _resolved_ids[(bmrb_url, pdb_url)]
+
+
+def _urlopen(url):
+    """Open URL address through :class:`~nmrstarlib.cache.DownloadCache` if cache directory
+    is set in :data:`~nmrstarlib.nmrstarlib.CACHE_DIR`, otherwise open it directly.
+    Response of GET request sent by :func:`~nmrstarlib.fileio._resolve_id` is used if there is one.
+
+    :param str url: URL address of file.
+    :return: Filehandle of file content.
+    """
+    response = _probe_responses.pop(url, None)
+    if nmrstarlib.CACHE_DIR:
+        download_cache = cache.DownloadCache(directory=nmrstarlib.CACHE_DIR,
+                                             max_size=nmrstarlib.CACHE_MAX_SIZE,
+                                             max_age=nmrstarlib.CACHE_MAX_AGE)
+        return download_cache.open(url, response=response)
+    return response if response is not None else urlopen(url)
+
+
+def _generate_handles(filenames, manifest=None, skip=None, error_log=None):
     """Open a sequence of filenames one at time producing file objects.
     The file is closed immediately when proceeding to the next iteration.
 
     :param generator filenames: Generator object that yields the path to each file, one at a time.
+    :param manifest: Manifest of processed files, unchanged local files are skipped and sources
+                     read from local files are added to manifest, see :meth:`~nmrstarlib.manifest.Manifest.done`.
+    :type manifest: :class:`~nmrstarlib.manifest.Manifest`
+    :param skip: Sources (paths to files or archive members) to skip without reading them.
+    :type skip: :py:class:`set`
+    :param error_log: Error log to record files that cannot be opened in, e.g. corrupt archives or
+                      missing URL addresses, exception is raised if not provided.
+    :type error_log: :class:`~nmrstarlib.errorlog.ErrorLog`
     :return: Filehandle to be processed into a :class:`~nmrstarlib.nmrstarlib.StarFile` instance.
     """
     for fname in filenames:
+        if skip and fname in skip:
+            continue
+
+        is_local = manifest is not None and os.path.isfile(fname)
+        if is_local and not manifest.is_changed(fname):
+            if nmrstarlib.VERBOSE:
+                print("Skipping unchanged file: {}".format(os.path.abspath(fname)))
+            continue
+
         if nmrstarlib.VERBOSE:
             print("Processing file: {}".format(os.path.abspath(fname)))
-        path = GenericFilePath(fname)
-        for filehandle, source in path.open():
-            yield filehandle, source
+
+        # content of local file is hashed while it is read, zip archives need random access instead
+        reader = _HashingReader(fname) if is_local and GenericFilePath.is_compressed(fname) != "zip" else None
+        filehandles = GenericFilePath(fname).open(reader)
+        while True:
+            try:
+                filehandle, source = next(filehandles)
+            except StopIteration:
+                break
+            except Exception as exc:
+                if error_log is None:
+                    raise
+                error_log.add(fname, exc)
+                is_local = False
+                break
+
+            if not (skip and source in skip):
+                if is_local:
+                    manifest.add_source(fname, source)
+                yield filehandle, source
             filehandle.close()
 
+        if reader is not None:
+            reader.close()
+        if is_local:
+            manifest.end_input(fname, reader.digest if reader is not None else None)
+
 
-def read_files(*sources):
+def read_files(*sources, **kwds):
     """Construct a generator that yields :class:`~nmrstarlib.nmrstarlib.StarFile` instances.
 
     :param sources: One or more strings representing path to file(s).
+    :param int workers: Number of worker processes to parse files in (at least 1), files are parsed
+                        in the current process if not provided.
+    :param ordered: Yield instances in the order of sources (True) or as soon as
+                    they are parsed by worker processes (False).
+    :type ordered: :py:obj:`True` or :py:obj:`False`
+    :param int max_inflight: Maximum number of files submitted to worker processes
+                             at once (at least 1), twice the number of workers by default.
+    :param int prefetch: Number of files to read and decompress on a background thread
+                         ahead of parsing, files are read on demand if not provided.
+    :param max_memory: Approximate memory budget of parsed instances alive at once in bytes or with
+                       an optional `K`, `M` or `G` suffix, e.g. `2G`. Reading ahead (`prefetch`) and
+                       submitting files to worker processes (`workers`) pause while the budget is
+                       exceeded, but a single file is always allowed in flight.
+    :type max_memory: :py:class:`int` or :py:class:`str`
+    :param list include: Glob patterns of files in directories to read, e.g. `["bmr*"]`.
+    :param list exclude: Glob patterns of files in directories to skip, e.g. `["*.json"]`.
+    :param list extensions: Extensions of files in directories to read, e.g. `[".str", ".cif"]`.
+    :param largest_first: Read files in directories in order of decreasing size, so the largest
+                          files do not end up last when parsed by worker processes.
+    :type largest_first: :py:obj:`True` or :py:obj:`False`
+    :param manifest: Path to manifest file or manifest instance, local files recorded in manifest
+                     are skipped unless they changed, new and changed files are recorded once all instances
+                     read from them were consumed.
+    :type manifest: :py:class:`str` or :class:`~nmrstarlib.manifest.Manifest`
+    :param skip: Sources (paths to files or archive members) to skip without parsing them,
+                 e.g. files already converted by interrupted conversion.
+    :type skip: :py:class:`set`
+    :param error_log: Path to error log file or error log instance, files that cannot be read are
+                      recorded in error log and skipped instead of raising exception.
+    :type error_log: :py:class:`str` or :class:`~nmrstarlib.errorlog.ErrorLog`
+    :param kwds: Keyword arguments passed to :meth:`~nmrstarlib.nmrstarlib.StarFile.read`, e.g. `keep_raw`.
+    :return: :class:`~nmrstarlib.nmrstarlib.StarFile` instance(s).
+    :rtype: :class:`~nmrstarlib.nmrstarlib.StarFile`
+    """
+    manifest = kwds.pop("manifest", None)
+    include = kwds.pop("include", None)
+    exclude = kwds.pop("exclude", None)
+    extensions = kwds.pop("extensions", None)
+    largest_first = kwds.pop("largest_first", False)
+    workers = kwds.pop("workers", None)
+    ordered = kwds.pop("ordered", False)
+    max_inflight = kwds.pop("max_inflight", None)
+    prefetch = kwds.pop("prefetch", None)
+    max_memory = kwds.pop("max_memory", None)
+    skip = kwds.pop("skip", None)
+    error_log = kwds.pop("error_log", None)
+
+    if workers is not None and workers < 1:
+        raise ValueError("Number of workers must be at least 1: {}".format(workers))
+    if max_inflight is not None and max_inflight < 1:
+        raise ValueError("Maximum number of files submitted to workers must be at least 1: {}".format(max_inflight))
+
+    if error_log is not None and not isinstance(error_log, ErrorLog):
+        error_log = ErrorLog(error_log)
+
+    budget = _MemoryBudget(max_memory) if max_memory is not None else None
+
+    if manifest is not None and not isinstance(manifest, Manifest):
+        manifest = Manifest(manifest)
+
+    filenames = _generate_filenames(sources, include, exclude, extensions, largest_first)
+    filehandles = _generate_handles(filenames, manifest, skip, error_log)
+
+    if prefetch:
+        filehandles = _prefetch(filehandles, prefetch, None if workers else budget, error_log)
+
+    try:
+        if workers:
+            for starfile in _parallel_read(filehandles, workers, ordered, max_inflight, kwds, budget, error_log):
+                yield starfile
+                if manifest is not None:
+                    manifest.done(starfile.source)
+        elif prefetch and budget is not None:
+            for fh, source, size in filehandles:
+                try:
+                    starfile = _read(fh, source, kwds, error_log)
+                except Exception:
+                    budget.release(size)
+                    raise
+                if starfile is None:
+                    budget.release(size)
+                    continue
+                budget.delivered(starfile, size)
+                yield starfile
+                if manifest is not None:
+                    manifest.done(source)
+        elif error_log is not None:
+            for fh, source in filehandles:
+                starfile = _read(fh, source, kwds, error_log)
+                if starfile is not None:
+                    yield starfile
+                    if manifest is not None:
+                        manifest.done(source)
+        else:
+            for fh, source in filehandles:
+                starfile = nmrstarlib.StarFile.read(fh, source, **kwds)
+                yield starfile
+                if manifest is not None:
+                    manifest.done(source)
+
+        if manifest is not None:
+            manifest.done_all()
+    finally:
+        if prefetch:
+            filehandles.close()
+        if manifest is not None:
+            manifest.save()
+
+
+def build_index(archive, index_path=None):
+    """Build sidecar index of zip or tar archive that maps entry ids to archive members,
+    so a single entry can be read with :func:`~nmrstarlib.fileio.read_entry` without
+    scanning the whole archive.
+
+    :param str archive: Path to zip or tar archive.
+    :param str index_path: Path to index file, `archive` path with ``.index.json`` suffix by default.
+    :return: Archive index.
+    :rtype: :py:class:`dict`
+    """
+    compression_type = GenericFilePath.is_compressed(archive)
+    members = []
+
+    if compression_type == "zip":
+        with zipfile.ZipFile(archive, "r") as ziparchive:
+            for info in ziparchive.infolist():
+                if not info.filename.endswith("/"):
+                    with ziparchive.open(info) as filehandle:
+                        entry_id = _entry_id(filehandle)
+                    members.append({"name": info.filename, "id": entry_id,
+                                    "offset": info.header_offset, "size": info.file_size})
+
+    elif compression_type in ("tar", "tar.gz", "tar.bz2", "tar.xz"):
+        with tarfile.open(archive) as tararchive:
+            for info in tararchive:
+                if info.isfile():
+                    entry_id = _entry_id(tararchive.extractfile(info))
+                    members.append({"name": info.name, "id": entry_id,
+                                    "offset": info.offset_data, "size": info.size})
+
+    else:
+        raise TypeError("Only zip and tar archives can be indexed.")
+
+    stat = os.stat(archive)
+    index = {"compression": compression_type,
+             "archive_size": stat.st_size,
+             "archive_mtime": stat.st_mtime,
+             "members": members}
+
+    with io.open(index_path or archive + ".index.json", "w", encoding="utf-8") as outfile:
+        outfile.write(u"{}".format(json.dumps(index, indent=4)))
+
+    return index
+
+
+def read_entry(archive, entry_id, index_path=None, **kwds):
+    """Read a single entry from zip or tar archive using sidecar index built by
+    :func:`~nmrstarlib.fileio.build_index`, the index is (re)built if it is missing
+    or outdated. Members of zip and uncompressed tar archives are read directly from
+    their offset, members of compressed tar archives are located without parsing
+    the preceding tar headers, but the data before them still has to be decompressed.
+
+    :param str archive: Path to zip or tar archive.
+    :param str entry_id: Entry id (e.g. BMRB ID or PDB ID) or member name.
+    :param str index_path: Path to index file, `archive` path with ``.index.json`` suffix by default.
+    :param kwds: Keyword arguments passed to :meth:`~nmrstarlib.nmrstarlib.StarFile.read`.
+    :return: :class:`~nmrstarlib.nmrstarlib.StarFile` instance.
+    :rtype: :class:`~nmrstarlib.nmrstarlib.StarFile`
+    """
+    index_path = index_path or archive + ".index.json"
+    stat = os.stat(archive)
+
+    try:
+        with io.open(index_path, "r", encoding="utf-8") as infile:
+            index = json.load(infile)
+        if (index["archive_size"], index["archive_mtime"]) != (stat.st_size, stat.st_mtime):
+            index = build_index(archive, index_path)
+    except (IOError, ValueError, KeyError):
+        index = build_index(archive, index_path)
+
+    for member in index["members"]:
+        if entry_id in (member["id"], member["name"]):
+            break
+    else:
+        raise KeyError('Entry "{}" not found in archive: {}'.format(entry_id, archive))
+
+    source = archive + "/" + member["name"]
+
+    if index["compression"] == "zip":
+        with zipfile.ZipFile(archive, "r") as ziparchive:
+            with ziparchive.open(member["name"]) as filehandle:
+                content = filehandle.read()
+    else:
+        if index["compression"] == "tar.gz":
+            infile = gzip.open(archive, "rb")
+        elif index["compression"] == "tar.bz2":
+            infile = bz2.BZ2File(archive, "rb")
+        elif index["compression"] == "tar.xz":
+            infile = lzma.open(archive, "rb")
+        else:
+            infile = io.open(archive, "rb")
+        with infile:
+            infile.seek(member["offset"])
+            content = infile.read(member["size"])
+
+    return nmrstarlib.StarFile.read(io.BytesIO(content), source, **kwds)
+
+
+def _entry_id(filehandle, header_size=64 * 1024):
+    """Find entry id in the beginning of NMR-STAR, CIF or JSONized file.
+
+    :param filehandle: Filehandle of archive member.
+    :param int header_size: Number of bytes to search for ``data_`` block or ``"data"`` key.
+    :return: Entry id or :py:obj:`None` if not found.
+    :rtype: :py:class:`str`
+    """
+    header = filehandle.read(header_size).decode("utf-8", "replace")
+    match = re.search(r'^\s*data_(\S+)|"data":\s*"([^"]*)"', header, re.MULTILINE)
+    if match:
+        return match.group(1) or match.group(2)
+    return None
+
+
+def _prefetch(filehandles, prefetch, budget=None, error_log=None):
+    """Read and decompress files on a background thread while the consumer is busy parsing.
+    Decompression in :py:mod:`zlib` and :py:mod:`bz2` releases the GIL, so it runs
+    concurrently with parsing.
+
+    :param generator filehandles: Generator object that yields filehandles and their sources.
+    :param int prefetch: Maximum number of files read ahead of the consumer.
+    :param budget: Memory budget, reading ahead pauses while it is exceeded.
+    :type budget: :class:`~nmrstarlib.fileio._MemoryBudget`
+    :param error_log: Error log to record files that cannot be read in, exception is raised if not provided.
+    :type error_log: :class:`~nmrstarlib.errorlog.ErrorLog`
+    :return: In-memory filehandle and source, and reserved size if `budget` is provided.
+    """
+    queue = Queue(maxsize=prefetch)
+    stop = threading.Event()
+    end = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def read_ahead():
+        try:
+            for fh, source in filehandles:
+                try:
+                    content = fh.read()
+                except Exception as exc:
+                    if error_log is None:
+                        raise
+                    error_log.add(source, exc)
+                    continue
+                size = None
+                if budget is not None:
+                    size = budget.estimate(content)
+                    if not budget.reserve(size, stop):
+                        return
+                if not put((content, source, size)):
+                    return
+        except Exception as exc:
+            put(exc)
+        put(end)
+
+    thread = threading.Thread(target=read_ahead)
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            item = queue.get()
+            if item is end:
+                break
+            elif isinstance(item, Exception):
+                raise item
+
+            content, source, size = item
+            if budget is None:
+                yield _in_memory(content), source
+            else:
+                yield _in_memory(content), source, size
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _read(filehandle, source, kwds, error_log=None):
+    """Read file into :class:`~nmrstarlib.nmrstarlib.StarFile` instance, recording it in error log
+    instead of raising exception if it cannot be read.
+
+    :param filehandle: file-like object.
+    :param str source: String indicating where file is coming from (path, url).
+    :param dict kwds: Keyword arguments passed to :meth:`~nmrstarlib.nmrstarlib.StarFile.read`.
+    :param error_log: Error log to record file in, exception is raised if not provided.
+    :type error_log: :class:`~nmrstarlib.errorlog.ErrorLog`
+    :return: :class:`~nmrstarlib.nmrstarlib.StarFile` instance or None if file cannot be read.
+    :rtype: :class:`~nmrstarlib.nmrstarlib.StarFile` or :py:obj:`None`
+    """
+    if error_log is None:
+        return nmrstarlib.StarFile.read(filehandle, source, **kwds)
+
+    content = None
+    try:
+        content = filehandle.read()
+        return _parse(content, source, kwds)
+    except Exception as exc:
+        error_log.add(source, exc, content)
+        return None
+
+
+def _parse(content, source, kwds, skip_errors=False):
+    """Parse file content into :class:`~nmrstarlib.nmrstarlib.StarFile` instance, used by worker processes.
+
+    :param content: File content.
+    :type content: :py:class:`str` or :py:class:`bytes`
+    :param str source: String indicating where file is coming from (path, url).
+    :param dict kwds: Keyword arguments passed to :meth:`~nmrstarlib.nmrstarlib.StarFile.read`.
+    :param skip_errors: Return error record instead of raising exception if file cannot be parsed.
+    :type skip_errors: :py:obj:`True` or :py:obj:`False`
+    :return: :class:`~nmrstarlib.nmrstarlib.StarFile` instance or error record,
+             see :meth:`~nmrstarlib.errorlog.ErrorLog.describe`.
+    :rtype: :class:`~nmrstarlib.nmrstarlib.StarFile` or :py:class:`dict`
+    """
+    try:
+        return nmrstarlib.StarFile.read(_in_memory(content), source, **kwds)
+    except Exception as exc:
+        if not skip_errors:
+            raise
+        return ErrorLog.describe(source, exc, content)
+
+
+def _in_memory(content):
+    """Wrap file content into in-memory filehandle.
+
+    :param content: File content.
+    :type content: :py:class:`str` or :py:class:`bytes`
+    :return: In-memory filehandle.
+    :rtype: :py:class:`io.BytesIO` or :py:class:`io.StringIO`
+    """
+    return io.BytesIO(content) if isinstance(content, bytes) else io.StringIO(content)
+
+
+def _parallel_read(filehandles, workers, ordered, max_inflight, kwds, budget=None, error_log=None):
+    """Read files in the current process and parse them in a pool of worker processes.
+    At most `max_inflight` files are read ahead of the consumer and no more files are
+    submitted while the memory budget is exceeded.
+
+    :param generator filehandles: Generator object that yields filehandles and their sources.
+    :param int workers: Number of worker processes.
+    :param ordered: Keep the order of sources or not.
+    :type ordered: :py:obj:`True` or :py:obj:`False`
+    :param int max_inflight: Maximum number of files submitted to worker processes at once.
+    :param dict kwds: Keyword arguments passed to :meth:`~nmrstarlib.nmrstarlib.StarFile.read`.
+    :param budget: Memory budget of parsed instances.
+    :type budget: :class:`~nmrstarlib.fileio._MemoryBudget`
+    :param error_log: Error log to record files that cannot be parsed in, exception is raised if not provided.
+    :type error_log: :class:`~nmrstarlib.errorlog.ErrorLog`
     :return: :class:`~nmrstarlib.nmrstarlib.StarFile` instance(s).
     :rtype: :class:`~nmrstarlib.nmrstarlib.StarFile`
     """
-    filenames = _generate_filenames(sources)
-    filehandles = _generate_handles(filenames)
-    for fh, source in filehandles:
-        starfile = nmrstarlib.StarFile.read(fh, source)
-        yield starfile
+    if max_inflight is None:
+        max_inflight = 2 * workers
+
+    pending = collections.deque()
+    sizes = {}
+
+    def results(completed):
+        for future in completed:
+            size = sizes.pop(future, None)
+            try:
+                starfile = future.result()
+            except Exception:
+                if budget is not None:
+                    budget.release(size)
+                raise
+
+            if not isinstance(starfile, nmrstarlib.StarFile):
+                if budget is not None:
+                    budget.release(size)
+                error_log.append(starfile)
+                continue
+            if budget is not None:
+                budget.delivered(starfile, size)
+            yield starfile
+
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        try:
+            for fh, source in filehandles:
+                try:
+                    content = fh.read()
+                except Exception as exc:
+                    if error_log is None:
+                        raise
+                    error_log.add(source, exc)
+                    continue
+
+                if budget is not None:
+                    size = budget.estimate(content)
+                    while pending and budget.is_exceeded(size):
+                        for starfile in results(_completed(pending, ordered)):
+                            yield starfile
+                    budget.reserve(size)
+
+                future = executor.submit(_parse, content, source, kwds, error_log is not None)
+                pending.append(future)
+                if budget is not None:
+                    sizes[future] = size
+
+                while len(pending) >= max_inflight:
+                    for starfile in results(_completed(pending, ordered)):
+                        yield starfile
+
+            while pending:
+                for starfile in results(_completed(pending, ordered)):
+                    yield starfile
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _completed(pending, ordered):
+    """Remove futures that are ready to be yielded from the queue of pending futures.
+
+    :param pending: Futures in the order they were submitted.
+    :type pending: :py:class:`collections.deque`
+    :param ordered: Keep the order of submission, i.e. wait for the oldest future.
+    :type ordered: :py:obj:`True` or :py:obj:`False`
+    :return: List of futures.
+    :rtype: :py:class:`list`
+    """
+    if ordered:
+        return [pending.popleft()]
+
+    done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+    ready = [future for future in pending if future in done]
+    for future in ready:
+        pending.remove(future)
+    return ready
+
+
+class _MemoryBudget(object):
+    """Approximate memory budget of parsed :class:`~nmrstarlib.nmrstarlib.StarFile` instances.
+
+    Size of parsed instance is estimated from the size of file content multiplied by
+    `PARSED_SIZE_FACTOR`. Size is reserved when file is read and released once the
+    instance delivered to the consumer is garbage collected.
+    """
+
+    def __init__(self, max_memory):
+        """Memory budget initializer.
+
+        :param max_memory: Memory budget in bytes or with an optional `K`, `M` or `G` suffix.
+        :type max_memory: :py:class:`int` or :py:class:`str`
+        """
+        self.max_memory = cache.DownloadCache.parse_size(max_memory)
+        self.used = 0
+        self.inflight = 0
+        self._condition = threading.Condition()
+        self._refs = {}
+
+    @staticmethod
+    def estimate(content):
+        """Estimate size of parsed instance from file content.
+
+        :param content: File content.
+        :type content: :py:class:`str` or :py:class:`bytes`
+        :return: Approximate size in bytes.
+        :rtype: :py:class:`int`
+        """
+        return len(content) * PARSED_SIZE_FACTOR
+
+    def is_exceeded(self, size):
+        """Test if reserving `size` bytes would exceed the budget.
+
+        :param int size: Size in bytes.
+        :return: True if budget would be exceeded, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        with self._condition:
+            return self.used + size > self.max_memory
+
+    def reserve(self, size, stop=None):
+        """Reserve `size` bytes, wait while the budget is exceeded and other files are in flight.
+        Files already delivered to the consumer do not block, so the consumer that keeps all
+        instances alive still makes progress one file at a time.
+
+        :param int size: Size in bytes.
+        :param stop: Event that cancels waiting.
+        :type stop: :py:class:`threading.Event`
+        :return: True if size was reserved, False if waiting was cancelled.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        with self._condition:
+            while self.inflight and self.used + size > self.max_memory:
+                if stop is not None and stop.is_set():
+                    return False
+                self._condition.wait(0.1)
+            self.used += size
+            self.inflight += 1
+            return True
+
+    def release(self, size):
+        """Release reserved size of file that was not delivered, e.g. because it failed to parse.
+
+        :param int size: Size in bytes.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with self._condition:
+            self.used -= size
+            self.inflight -= 1
+            self._condition.notify_all()
+
+    def delivered(self, starfile, size):
+        """Mark file as delivered to the consumer, reserved size is released once instance is garbage collected.
+
+        :param starfile: Parsed instance.
+        :type starfile: :class:`~nmrstarlib.nmrstarlib.StarFile`
+        :param int size: Size in bytes.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        def collected(ref):
+            self._refs.pop(id(ref), None)
+            with self._condition:
+                self.used -= size
+                self._condition.notify_all()
+
+        with self._condition:
+            self.inflight -= 1
+            ref = weakref.ref(starfile, collected)
+            self._refs[id(ref)] = ref
+            self._condition.notify_all()
+
+
+class _HashingReader(object):
+    """Binary file-like object over local file that computes SHA-1 hash of its content
+    while it is read, so manifest does not have to read the file again to record it."""
+
+    def __init__(self, path, chunk_size=1024 * 1024):
+        """Hashing reader initializer.
+
+        :param str path: Path to local file.
+        :param int chunk_size: Number of bytes read at once while hashing the rest of file on close.
+        """
+        self.fileobj = io.open(path, "rb")
+        self.chunk_size = chunk_size
+        self.sha1 = hashlib.sha1()
+        self.digest = None
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.sha1.update(data)
+        return data
+
+    def close(self):
+        """Hash the rest of file that was not read, e.g. padding after the end of tar archive, and close it.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        if self.digest is None:
+            for chunk in iter(lambda: self.fileobj.read(self.chunk_size), b""):
+                self.sha1.update(chunk)
+            self.digest = self.sha1.hexdigest()
+            self.fileobj.close()
+
+
+class _DecompressedStream(io.RawIOBase):
+    """Read-only stream that incrementally decompresses gz, bz2 or xz data as it is read
+    from the underlying file-like object, so only a single chunk is kept in memory."""
+
+    def __init__(self, fileobj, compression_type, chunk_size=64 * 1024):
+        """Decompressed stream initializer.
+
+        :param fileobj: File-like object with compressed data, e.g. HTTP response.
+        :param str compression_type: Compression type: `gz`, `bz2` or `xz`.
+        :param int chunk_size: Number of compressed bytes read at once.
+        """
+        super(_DecompressedStream, self).__init__()
+        self.fileobj = fileobj
+        self.compression_type = compression_type
+        self.chunk_size = chunk_size
+        self.decompressor = self._decompressor()
+        self.buffer = b""
+        self.offset = 0
+
+    def _decompressor(self):
+        """Create decompressor object, one per gz member or bz2/xz stream.
+
+        :return: Decompressor object.
+        """
+        if self.compression_type == "gz":
+            return zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.compression_type == "xz":
+            return lzma.LZMADecompressor()
+        return bz2.BZ2Decompressor()
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        """Read decompressed data into a pre-allocated buffer.
+
+        :param b: Writable buffer.
+        :return: Number of bytes read, 0 at the end of stream.
+        :rtype: :py:class:`int`
+        """
+        while self.offset >= len(self.buffer):
+            data = self.decompressor.unused_data
+            if data or getattr(self.decompressor, "eof", False):
+                self.decompressor = self._decompressor()
+            if not data:
+                data = self.fileobj.read(self.chunk_size)
+                if not data:
+                    return 0
+            self.buffer = self.decompressor.decompress(data)
+            self.offset = 0
+
+        size = min(len(b), len(self.buffer) - self.offset)
+        b[:size] = self.buffer[self.offset:self.offset + size]
+        self.offset += size
+        return size
 
 
 class GenericFilePath(object):
@@ -119,19 +929,23 @@ class GenericFilePath(object):
         """
         self.path = path
 
-    def open(self):
+    def open(self, fileobj=None):
         """Generator that opens and yields filehandles using appropriate facilities:
         test if path represents a local file or file over URL, if file is compressed
         or not.
 
+        :param fileobj: Binary file-like object already opened for path to read from sequentially
+                        instead of opening path, e.g. :class:`~nmrstarlib.fileio._HashingReader`.
         :return: Filehandle to be processed into a :class:`~nmrstarlib.nmrstarlib.StarFile` instance.
         """
         is_url = self.is_url(self.path)
         compression_type = self.is_compressed(self.path)
 
         if not compression_type:
-            if is_url:
-                filehandle = urlopen(self.path)
+            if fileobj is not None:
+                filehandle = fileobj
+            elif is_url:
+                filehandle = _urlopen(self.path)
             else:
                 filehandle = open(self.path, "r")
             source = self.path
@@ -139,42 +953,78 @@ class GenericFilePath(object):
             filehandle.close()
 
         elif compression_type:
-            if is_url:
-                response = urlopen(self.path)
-                path = response.read()
-                response.close()
-            else:
-                path = self.path
-
-            if compression_type == "zip":
-                ziparchive = zipfile.ZipFile(io.BytesIO(path), "r") if is_url else zipfile.ZipFile(path)
-                for name in ziparchive.infolist():
-                    if not name.filename.endswith("/"):
-                        filehandle = ziparchive.open(name)
-                        source = self.path + "/" + name.filename
-                        yield filehandle, source
-                        filehandle.close()
-
-            elif compression_type in ("tar", "tar.bz2", "tar.gz"):
-                tararchive = tarfile.open(fileobj=io.BytesIO(path)) if is_url else tarfile.open(path)
-                for name in tararchive:
-                    if name.isfile():
-                        filehandle = tararchive.extractfile(name)
-                        source = self.path + "/" + name.name
+            if is_url or fileobj is not None:
+                response = fileobj if fileobj is not None else _urlopen(self.path)
+                try:
+                    for filehandle, source in self._open_compressed(response, compression_type):
                         yield filehandle, source
-                        filehandle.close()
+                finally:
+                    response.close()
+            else:
+                for filehandle, source in self._open_compressed(self.path, compression_type):
+                    yield filehandle, source
 
-            elif compression_type == "bz2":
-                filehandle = bz2.BZ2File(io.BytesIO(path)) if is_url else bz2.BZ2File(path)
-                source = self.path
-                yield filehandle, source
-                filehandle.close()
+    def _open_compressed(self, fileobj, compression_type):
+        """Generator that opens compressed file and yields filehandles of its members.
 
-            elif compression_type == "gz":
-                filehandle = gzip.open(io.BytesIO(path)) if is_url else gzip.open(path)
-                source = self.path
-                yield filehandle, source
-                filehandle.close()
+        File-like objects, e.g. HTTP responses, are read sequentially: tar archives are read
+        in streaming mode and gz/bz2/xz files are decompressed incrementally, zip archives need
+        random access and are spooled into temporary file first.
+
+        :param fileobj: Path to local compressed file or file-like object with compressed data.
+        :type fileobj: :py:class:`str` or file-like object
+        :param str compression_type: Compression type returned by :meth:`~nmrstarlib.fileio.GenericFilePath.is_compressed`.
+        :return: Filehandle to be processed into a :class:`~nmrstarlib.nmrstarlib.StarFile` instance.
+        """
+        is_fileobj = hasattr(fileobj, "read")
+
+        if compression_type == "zip":
+            if is_fileobj and not getattr(fileobj, "seekable", lambda: False)():
+                spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+                shutil.copyfileobj(fileobj, spooled)
+                spooled.seek(0)
+                fileobj = spooled
+
+            ziparchive = zipfile.ZipFile(fileobj, "r")
+            for name in ziparchive.infolist():
+                if not name.filename.endswith("/"):
+                    filehandle = ziparchive.open(name)
+                    source = self.path + "/" + name.filename
+                    yield filehandle, source
+                    filehandle.close()
+
+        elif compression_type in ("tar", "tar.bz2", "tar.gz", "tar.xz"):
+            tararchive = tarfile.open(fileobj=fileobj, mode="r|*") if is_fileobj else tarfile.open(fileobj)
+            for name in tararchive:
+                if name.isfile():
+                    filehandle = tararchive.extractfile(name)
+                    source = self.path + "/" + name.name
+                    yield filehandle, source
+                    filehandle.close()
+
+        elif compression_type in ("bz2", "gz", "xz") and is_fileobj:
+            filehandle = io.BufferedReader(_DecompressedStream(fileobj, compression_type))
+            source = self.path
+            yield filehandle, source
+            filehandle.close()
+
+        elif compression_type == "bz2":
+            filehandle = bz2.BZ2File(fileobj)
+            source = self.path
+            yield filehandle, source
+            filehandle.close()
+
+        elif compression_type == "gz":
+            filehandle = gzip.open(fileobj)
+            source = self.path
+            yield filehandle, source
+            filehandle.close()
+
+        elif compression_type == "xz":
+            filehandle = lzma.open(fileobj)
+            source = self.path
+            yield filehandle, source
+            filehandle.close()
 
     @staticmethod
     def is_compressed(path):
@@ -190,10 +1040,14 @@ class GenericFilePath(object):
             return "tar.gz"
         elif path.endswith(".tar.bz2"):
             return "tar.bz2"
+        elif path.endswith(".tar.xz"):
+            return "tar.xz"
         elif path.endswith(".gz"):
             return "gz"
         elif path.endswith(".bz2"):
             return "bz2"
+        elif path.endswith(".xz"):
+            return "xz"
         elif path.endswith(".tar"):
             return "tar"
         return ""
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nmrstarlib.manifest
+~~~~~~~~~~~~~~~~~~~
+
+This module provides the :class:`~nmrstarlib.manifest.Manifest` class
+that records processed input files (path, size, modification time and
+content hash) together with output files produced from them, so repeated
+runs over mostly unchanged directories process only new or changed files.
+"""
+
+import os
+import io
+import json
+import hashlib
+import threading
+import collections
+
+
+class Manifest(object):
+    """JSON manifest of processed input files.
+
+    Input file is recorded only once all sources read from it (the file itself or its archive
+    members) are done, i.e. their outputs were written, so files read ahead of an interrupted
+    run are processed again by the next run.
+    """
+
+    def __init__(self, path, target=None):
+        """Manifest initializer, existing manifest file is loaded.
+
+        :param str path: Path to manifest file.
+        :param dict target: Output target of processing, e.g. output path and formats, input files
+                            recorded for another target are processed again.
+        """
+        self.path = path
+        self.target = target
+        self.inputs = {}
+        self._outputs = collections.defaultdict(list)
+        self._updated = set()
+        self._pending = {}
+        self._sources = {}
+        self._hashes = {}
+        self._lock = threading.RLock()
+
+        if os.path.isfile(path):
+            with io.open(path, "r", encoding="utf-8") as infile:
+                self.inputs = json.load(infile)["inputs"]
+
+    @staticmethod
+    def content_hash(path):
+        """Calculate SHA-1 hash of file content.
+
+        :param str path: Path to file.
+        :return: Hexadecimal digest.
+        :rtype: :py:class:`str`
+        """
+        sha1 = hashlib.sha1()
+        with io.open(path, "rb") as infile:
+            for chunk in iter(lambda: infile.read(1024 * 1024), b""):
+                sha1.update(chunk)
+        return sha1.hexdigest()
+
+    def is_changed(self, path):
+        """Test if input file is new or changed since it was recorded. Input file is also processed
+        if it was recorded for another target or any of its recorded outputs is missing. Content hash
+        is compared only if file size is the same and modification time is not.
+
+        :param str path: Path to input file.
+        :return: True if file has to be processed, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        record = self.inputs.get(os.path.abspath(path))
+        if record is None or record.get("target") != self.target:
+            return True
+        elif not all(os.path.exists(output) for output in record["outputs"]):
+            return True
+
+        stat = os.stat(path)
+        if stat.st_size != record["size"]:
+            return True
+        elif stat.st_mtime == record["mtime"]:
+            return False
+        elif self.content_hash(path) == record["sha1"]:
+            record["mtime"] = stat.st_mtime
+            return False
+        return True
+
+    def update(self, path, sha1=None):
+        """Record input file as processed together with outputs added by :meth:`~nmrstarlib.manifest.Manifest.add_output`.
+
+        :param str path: Path to input file.
+        :param str sha1: SHA-1 hash of file content computed while it was read, file is read again to hash it if not provided.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            sha1 = sha1 or self._hashes.pop(path, None) or self.content_hash(path)
+            self.inputs[key] = {"size": stat.st_size,
+                                "mtime": stat.st_mtime,
+                                "sha1": sha1,
+                                "target": self.target,
+                                "outputs": self._outputs.pop(key, [])}
+            self._updated.add(key)
+
+    def add_source(self, path, source):
+        """Add source read from input file, e.g. archive member, that has to be done before
+        input file is recorded.
+
+        :param str path: Path to input file.
+        :param str source: Source read from input file.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with self._lock:
+            self._pending.setdefault(path, [set(), False])[0].add(source)
+            self._sources[source] = path
+
+    def end_input(self, path, sha1=None):
+        """Mark input file as completely read, it is recorded once all its sources are done.
+
+        :param str path: Path to input file.
+        :param str sha1: SHA-1 hash of file content computed while it was read.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with self._lock:
+            if sha1 is not None:
+                self._hashes[path] = sha1
+            pending = self._pending.setdefault(path, [set(), False])
+            pending[1] = True
+            if not pending[0]:
+                del self._pending[path]
+                self.update(path)
+
+    def done(self, source):
+        """Mark source as done, its input file is recorded if it is completely read and all its sources are done.
+
+        :param str source: Source read from input file.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with self._lock:
+            path = self._sources.pop(source, None)
+            if path is None:
+                return
+            sources, read = self._pending[path]
+            sources.discard(source)
+            if read and not sources:
+                del self._pending[path]
+                self.update(path)
+
+    def done_all(self):
+        """Record all completely read input files, e.g. once all sources were processed
+        including those that failed and were skipped.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with self._lock:
+            for path, (sources, read) in list(self._pending.items()):
+                if read:
+                    for source in sources:
+                        self._sources.pop(source, None)
+                    del self._pending[path]
+                    self.update(path)
+
+    def add_output(self, source, output):
+        """Add output file produced from input source.
+
+        :param str source: Input source, e.g. path to file or path to archive member.
+        :param str output: Path to output file.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        path = source
+        while path and not os.path.isfile(path):
+            path = os.path.dirname(path)
+        if path:
+            key = os.path.abspath(path)
+            with self._lock:
+                outputs = self.inputs[key]["outputs"] if key in self._updated else self._outputs[key]
+                if output not in outputs:
+                    outputs.append(output)
+
+    def save(self):
+        """Write manifest file.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        tmp_path = self.path + ".tmp"
+        with self._lock:
+            data = json.dumps({"inputs": self.inputs}, sort_keys=True, indent=4)
+        with io.open(tmp_path, "w", encoding="utf-8") as outfile:
+            outfile.write(u"{}".format(data))
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        os.rename(tmp_path, self.path)
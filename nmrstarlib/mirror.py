@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nmrstarlib.mirror
+~~~~~~~~~~~~~~~~~
+
+This module provides the :class:`~nmrstarlib.mirror.MirrorIndex` class
+that maps ``BMRB IDs`` to files in a local mirror of ``BMRB`` entries,
+so entries are read from disk instead of being downloaded.
+"""
+
+import os
+import io
+import re
+import json
+import time
+
+from . import nmrstarlib
+
+
+class MirrorIndex(object):
+    """Index of ``NMR-STAR`` files in a local mirror directory.
+
+    Files are recognized by name anywhere under the mirror root, e.g. ``bmr15000_3.str``,
+    ``bmr15000.str``, ``15000.str`` or their ``.gz``, ``.bz2`` and ``.xz`` compressed variants.
+    The index is stored as ``JSON`` file, built on first use and rebuilt when an indexed
+    file no longer exists or an entry is not in the index and the mirror was updated
+    after the index was built, see :meth:`~nmrstarlib.mirror.MirrorIndex.is_outdated`.
+    """
+
+    filename_pattern = re.compile(r"^(?:bmr)?(\d+)(?:_(\d+))?\.(?:str|nmrstr)(\.gz|\.bz2|\.xz)?$")
+    index_name = ".nmrstarlib-index.json"
+
+    def __init__(self, root, index_path=None):
+        """Mirror index initializer, existing index file is loaded.
+
+        :param str root: Path to mirror root directory.
+        :param str index_path: Path to index file, `.nmrstarlib-index.json` in mirror root by default.
+        """
+        self.root = root
+        self.index_path = index_path if index_path is not None else os.path.join(root, self.index_name)
+        self.entries = None
+        self.built = None
+
+        if os.path.isfile(self.index_path):
+            with io.open(self.index_path, "r", encoding="utf-8") as infile:
+                index = json.load(infile)
+            self.entries = index["entries"]
+            self.built = index.get("built", os.path.getmtime(self.index_path))
+
+    def build(self):
+        """Scan mirror directory and write index file. If index file cannot be written,
+        e.g. mirror is read-only, index is kept in memory.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        built = time.time()
+        entries = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for fname in filenames:
+                match = self.filename_pattern.match(fname)
+                if match:
+                    relpath = os.path.relpath(os.path.join(dirpath, fname), self.root).replace(os.sep, "/")
+                    entries.setdefault(match.group(1), []).append(relpath)
+
+        self.entries = entries
+        self.built = built
+        try:
+            with io.open(self.index_path, "w", encoding="utf-8") as outfile:
+                outfile.write(u"{}".format(json.dumps({"entries": entries, "built": built}, sort_keys=True)))
+        except (IOError, OSError):
+            if nmrstarlib.VERBOSE:
+                print("Could not write mirror index: {}".format(self.index_path))
+
+    def is_outdated(self):
+        """Test if mirror was updated after index was built: mirror root directory or any directory
+        directly in it, e.g. ``entry_directories``, was modified later, as adding new entry files
+        or directories, e.g. by rsync, modifies their parent directory.
+
+        :return: True if index has to be rebuilt, False otherwise.
+        :rtype: :py:obj:`True` or :py:obj:`False`
+        """
+        if self.built is None:
+            return True
+
+        paths = [self.root] + [os.path.join(self.root, name) for name in os.listdir(self.root)]
+        return any(os.path.isdir(path) and os.path.getmtime(path) > self.built for path in paths)
+
+    @classmethod
+    def _rank(cls, relpath):
+        """Sort key of files of the same entry: files in version of NMR-STAR format set in
+        :data:`~nmrstarlib.nmrstarlib.NMRSTAR_VERSION` first, then files without version
+        suffix, uncompressed files before compressed files.
+
+        :param str relpath: Path to file relative to mirror root.
+        :return: Sort key.
+        :rtype: :py:class:`tuple`
+        """
+        _, version, compression = cls.filename_pattern.match(relpath.rsplit("/", 1)[-1]).groups()
+        if version is None:
+            version_rank = 1
+        elif version.startswith(nmrstarlib.NMRSTAR_VERSION):
+            version_rank = 0
+        else:
+            version_rank = 2
+        return version_rank, compression is not None, relpath
+
+    def path(self, entry_id):
+        """Find path to file of BMRB entry. Index is rebuilt if indexed file no longer exists
+        or entry is not in index and mirror was updated after index was built.
+
+        :param str entry_id: BMRB ID.
+        :return: Path to file or None if entry is not in mirror.
+        :rtype: :py:class:`str` or :py:obj:`None`
+        """
+        if self.entries is None:
+            self.build()
+
+        for rebuild in (True, False):
+            relpaths = self.entries.get(entry_id)
+            if not relpaths:
+                if rebuild and self.is_outdated():
+                    self.build()
+                    continue
+                return None
+
+            relpath = sorted(relpaths, key=self._rank)[0]
+            path = os.path.join(self.root, *relpath.split("/"))
+            if os.path.isfile(path):
+                return path
+            elif rebuild:
+                self.build()
+        return None
@@ -41,11 +41,18 @@ try:
 except ImportError:
     from .bmrblex import bmrblex
 
+from .report import stage, timed
+
 
 BMRB_REST = "http://rest.bmrb.wisc.edu/bmrb/NMR-STAR3/"
 PDB_REST = "https://files.rcsb.org/view/"
 VERBOSE = False
 NMRSTAR_VERSION = "3"
+JSON_LAYOUT = "rows"
+CACHE_DIR = None
+CACHE_MAX_SIZE = None
+CACHE_MAX_AGE = None
+BMRB_MIRROR = None
 NMRSTAR_CONSTANTS = {}
 RESONANCE_CLASSES = {}
 SPECTRUM_DESCRIPTIONS = {}
@@ -114,57 +121,81 @@ class StarFile(OrderedDict):
         super(StarFile, self).__init__(*args, **kwds)
 
     @staticmethod
-    def read(filehandle, source):
+    def read(filehandle, source, keep_raw=False, report=None):
         """Read data into a :class:`~nmrstarlib.nmrstarlib.StarFile` instance.
 
         :param filehandle: file-like object.
         :type filehandle: :py:class:`io.TextIOWrapper`, :py:class:`gzip.GzipFile`,
                           :py:class:`bz2.BZ2File`, :py:class:`zipfile.ZipFile`
         :param str source: String indicating where file is coming from (path, url).
+        :param keep_raw: Keep original text of NMR-STAR saveframes in order to write
+                         unmodified saveframes back as is.
+        :type keep_raw: :py:obj:`True` or :py:obj:`False`
+        :param report: Report to record size of file and time spent reading, lexing and building it in.
+        :type report: :class:`~nmrstarlib.report.Report`
         :return: subclass of :class:`~nmrstarlib.nmrstarlib.StarFile`.
         :rtype: :class:`~nmrstarlib.nmrstarlib.NMRStarFile` or :class:`~nmrstarlib.nmrstarlib.CIFFile`
         """
-        input_str = filehandle.read()
-        nmrstar_str = StarFile._is_nmrstar(input_str)
-        cif_str = StarFile._is_cif(input_str)
-        json_str = StarFile._is_json(input_str)
-
-        if not input_str:
-            pass
+        with stage(report, source, "read"):
+            input_str = filehandle.read()
+        if report is not None:
+            report.set_input(source, len(input_str))
 
-        elif nmrstar_str:
-            starfile = NMRStarFile(source)
-            starfile._build_file(nmrstar_str)
-            filehandle.close()
-            return starfile
+        with stage(report, source, "build"):
+            nmrstar_str = StarFile._is_nmrstar(input_str)
+            cif_str = StarFile._is_cif(input_str)
+            json_str = StarFile._is_json(input_str)
 
-        elif cif_str:
-            starfile = CIFFile(source)
-            starfile._build_file(cif_str)
-            filehandle.close()
-            return starfile
+            if not input_str:
+                pass
 
-        elif json_str:
-            if u"save_" in json_str:
+            elif nmrstar_str:
                 starfile = NMRStarFile(source)
-                starfile.update(json.loads(json_str, object_pairs_hook=OrderedDict))
-                starfile.id = starfile[u"data"]
+                starfile._build_file(nmrstar_str, keep_raw=keep_raw, report=report)
                 filehandle.close()
                 return starfile
 
-            elif u"entry.id" in json_str:
+            elif cif_str:
                 starfile = CIFFile(source)
-                starfile.update(json.loads(json_str, object_pairs_hook=OrderedDict))
+                starfile._build_file(cif_str, report=report)
+                filehandle.close()
+                return starfile
+
+            elif json_str:
+                if u"save_" in json_str:
+                    starfile = NMRStarFile(source)
+                elif u"entry.id" in json_str:
+                    starfile = CIFFile(source)
+                else:
+                    raise TypeError("Unknown file format")
+
+                try:
+                    starfile.update(json.loads(json_str, object_pairs_hook=OrderedDict))
+                except ValueError:
+                    raise TypeError("Unknown file format")
+                if u'"columns"' in json_str:
+                    starfile._columns_to_loops(starfile)
                 starfile.id = starfile[u"data"]
                 filehandle.close()
                 return starfile
             else:
                 raise TypeError("Unknown file format")
-        else:
-            raise TypeError("Unknown file format")
+
+    def _lexer(self, text, report=None):
+        """Create lexical analyzer of file content. If report is provided, time spent lexing
+        each token is recorded apart from time spent building.
+
+        :param text: File content.
+        :type text: :py:class:`str` or :py:class:`bytes`
+        :param report: Report to record time spent lexing in.
+        :type report: :class:`~nmrstarlib.report.Report`
+        :return: Iterator over tokens.
+        """
+        return timed(report, self.source, "lex", bmrblex(text))
 
     def write(self, filehandle, file_format):
         """Write :class:`~nmrstarlib.nmrstarlib.StarFile` data into file.
+        Data is written into file incrementally, without building the whole string in memory first.
 
         :param filehandle: file-like object.
         :type filehandle: :py:class:`io.TextIOWrapper`
@@ -174,14 +205,11 @@ class StarFile(OrderedDict):
         """
         try:
             if file_format == "json":
-                json_str = self._to_json()
-                filehandle.write(json_str)
+                json.dump(self._json_object(), filehandle, sort_keys=False, indent=4)
             elif file_format == "nmrstar" and isinstance(self, NMRStarFile):
-                nmrstar_str = self._to_star()
-                filehandle.write(nmrstar_str)
+                self.print_file(filehandle, file_format)
             elif file_format == "cif" and isinstance(self, CIFFile):
-                cif_str = self._to_star()
-                filehandle.write(cif_str)
+                self.print_file(filehandle, file_format)
             else:
                 raise TypeError("Unknown file format.")
         except IOError:
@@ -227,7 +255,60 @@ class StarFile(OrderedDict):
         :return: JSON string.
         :rtype: :py:class:`str`
         """
-        return json.dumps(self, sort_keys=False, indent=4)
+        return json.dumps(self._json_object(), sort_keys=False, indent=4)
+
+    def _json_object(self):
+        """Object to be serialized into JSON according to :data:`JSON_LAYOUT` - either `rows`,
+        where each loop is a list of fields and a list of per-row dictionaries, or `columns`,
+        where each loop is a dictionary of fields and a list of per-field columns.
+
+        :return: Object to be serialized into JSON.
+        :rtype: :class:`~nmrstarlib.nmrstarlib.StarFile` or :py:class:`collections.OrderedDict`
+        """
+        if JSON_LAYOUT == "rows":
+            return self
+        elif JSON_LAYOUT == "columns":
+            return self._loops_to_columns(self)
+        else:
+            raise ValueError('Unknown JSON layout: "{}"'.format(JSON_LAYOUT))
+
+    @staticmethod
+    def _loops_to_columns(odict):
+        """Convert loops into columnar layout.
+
+        :param odict: :class:`~nmrstarlib.nmrstarlib.StarFile` or saveframe dictionary.
+        :type odict: :py:class:`collections.OrderedDict`
+        :return: Copy of dictionary with loops in columnar layout.
+        :rtype: :py:class:`collections.OrderedDict`
+        """
+        columnar = OrderedDict()
+        for key, value in odict.items():
+            if key.startswith(u"loop_"):
+                fields, values = value
+                columns = [[row[field] for row in values] for field in fields]
+                columnar[key] = OrderedDict([(u"fields", fields), (u"columns", columns)])
+            elif isinstance(value, dict):
+                columnar[key] = StarFile._loops_to_columns(value)
+            else:
+                columnar[key] = value
+        return columnar
+
+    @staticmethod
+    def _columns_to_loops(odict):
+        """Convert loops from columnar layout back into fields and rows, in place.
+
+        :param odict: :class:`~nmrstarlib.nmrstarlib.StarFile` or saveframe dictionary.
+        :type odict: :py:class:`collections.OrderedDict`
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        for key, value in odict.items():
+            if key.startswith(u"loop_") and isinstance(value, dict):
+                fields = value[u"fields"]
+                values = [OrderedDict(zip(fields, row)) for row in zip(*value[u"columns"])]
+                odict[key] = (fields, values)
+            elif isinstance(value, dict):
+                StarFile._columns_to_loops(value)
 
     def _to_star(self):
         """Save :class:`~nmrstarlib.nmrstarlib.StarFile` into NMR-STAR or CIF formatted string.
@@ -267,25 +348,156 @@ class StarFile(OrderedDict):
 
     @staticmethod
     def _is_json(string):
-        """Test if input string is in JSON format.
+        """Test if input string is in JSON format, i.e. it looks like a JSON object.
+        The string is not parsed here in order to avoid parsing JSON string twice.
 
         :param string: Input string.
         :type string: :py:class:`str` or :py:class:`bytes`
         :return: Input string if in JSON format or False otherwise.
         :rtype: :py:class:`str` or :py:obj:`False`
         """
-        try:
-            if isinstance(string, bytes):
-                string = string.decode("utf-8")
-                json.loads(string)
-            elif isinstance(string, str):
-                json.loads(string)
-            else:
-                raise TypeError("Expecting <class 'str'> or <class 'bytes'>, but {} was passed".format(type(string)))
+        if isinstance(string, bytes):
+            string = string.decode("utf-8")
+        elif not isinstance(string, str):
+            raise TypeError("Expecting <class 'str'> or <class 'bytes'>, but {} was passed".format(type(string)))
+
+        if string.lstrip()[0:1] == u"{":
             return string
+        return False
+
+
+class _Changes(object):
+    """Modification flag shared by all containers of a single saveframe read with `keep_raw`."""
+
+    def __init__(self):
+        """`_Changes` initializer."""
+        self.modified = False
+
+
+class _TrackedDict(OrderedDict):
+    """Saveframe or loop row :py:class:`~collections.OrderedDict` that marks its saveframe as modified
+    when it is changed, so that unmodified saveframes can be written from their original text."""
+
+    def __init__(self, changes=None, *args, **kwds):
+        """`_TrackedDict` initializer.
+
+        :param changes: Modification flag of the saveframe.
+        :type changes: :class:`~nmrstarlib.nmrstarlib._Changes`
+        """
+        self._changes = None
+        super(_TrackedDict, self).__init__(*args, **kwds)
+        self._changes = changes
+
+    def _modified(self):
+        changes = getattr(self, "_changes", None)
+        if changes is not None:
+            changes.modified = True
 
-        except ValueError:
-            return False
+    def __setitem__(self, *args, **kwds):
+        self._modified()
+        return super(_TrackedDict, self).__setitem__(*args, **kwds)
+
+    def __delitem__(self, *args, **kwds):
+        self._modified()
+        return super(_TrackedDict, self).__delitem__(*args, **kwds)
+
+    def pop(self, *args):
+        self._modified()
+        return super(_TrackedDict, self).pop(*args)
+
+    def popitem(self, *args, **kwds):
+        self._modified()
+        return super(_TrackedDict, self).popitem(*args, **kwds)
+
+    def setdefault(self, *args):
+        self._modified()
+        return super(_TrackedDict, self).setdefault(*args)
+
+    def update(self, *args, **kwds):
+        self._modified()
+        return super(_TrackedDict, self).update(*args, **kwds)
+
+    def clear(self):
+        self._modified()
+        return super(_TrackedDict, self).clear()
+
+    def move_to_end(self, *args, **kwds):
+        self._modified()
+        return super(_TrackedDict, self).move_to_end(*args, **kwds)
+
+
+class _TrackedList(list):
+    """Loop fields or rows :py:class:`list` that marks its saveframe as modified when it is changed."""
+
+    def __init__(self, changes=None, *args):
+        """`_TrackedList` initializer.
+
+        :param changes: Modification flag of the saveframe.
+        :type changes: :class:`~nmrstarlib.nmrstarlib._Changes`
+        """
+        super(_TrackedList, self).__init__(*args)
+        self._changes = changes
+
+    def _modified(self):
+        changes = getattr(self, "_changes", None)
+        if changes is not None:
+            changes.modified = True
+
+    def __setitem__(self, *args):
+        self._modified()
+        return super(_TrackedList, self).__setitem__(*args)
+
+    def __delitem__(self, *args):
+        self._modified()
+        return super(_TrackedList, self).__delitem__(*args)
+
+    def __setslice__(self, *args):
+        self._modified()
+        return super(_TrackedList, self).__setslice__(*args)
+
+    def __delslice__(self, *args):
+        self._modified()
+        return super(_TrackedList, self).__delslice__(*args)
+
+    def __iadd__(self, *args):
+        self._modified()
+        return super(_TrackedList, self).__iadd__(*args)
+
+    def __imul__(self, *args):
+        self._modified()
+        return super(_TrackedList, self).__imul__(*args)
+
+    def append(self, *args):
+        self._modified()
+        return super(_TrackedList, self).append(*args)
+
+    def extend(self, *args):
+        self._modified()
+        return super(_TrackedList, self).extend(*args)
+
+    def insert(self, *args):
+        self._modified()
+        return super(_TrackedList, self).insert(*args)
+
+    def pop(self, *args):
+        self._modified()
+        return super(_TrackedList, self).pop(*args)
+
+    def remove(self, *args):
+        self._modified()
+        return super(_TrackedList, self).remove(*args)
+
+    def reverse(self):
+        self._modified()
+        return super(_TrackedList, self).reverse()
+
+    def sort(self, *args, **kwds):
+        self._modified()
+        return super(_TrackedList, self).sort(*args, **kwds)
+
+    def clear(self):
+        self._modified()
+        del self[:]
 
 
 class NMRStarFile(StarFile):
@@ -302,26 +514,31 @@ class NMRStarFile(StarFile):
         super(NMRStarFile, self).__init__(*args, **kwds)
         self.source = source
         self._frame_categories = frame_categories
+        self._raw_saveframes = {}
         self.id = ""
 
-    def _build_file(self, nmrstar_str):
+    def _build_file(self, nmrstar_str, keep_raw=False, report=None):
         """Build :class:`~nmrstarlib.nmrstarlib.NMRStarFile` object.
 
         :param nmrstar_str: NMR-STAR-formatted string.
         :type nmrstar_str: :py:class:`str` or :py:class:`bytes`
+        :param keep_raw: Keep original text of saveframes.
+        :type keep_raw: :py:obj:`True` or :py:obj:`False`
+        :param report: Report to record time spent lexing in.
+        :type report: :class:`~nmrstarlib.report.Report`
         :return: instance of :class:`~nmrstarlib.nmrstarlib.NMRStarFile`.
         :rtype: :class:`~nmrstarlib.nmrstarlib.NMRStarFile`
         """
         odict = self
         comment_count = 0
-        lexer = bmrblex(nmrstar_str)
+        lexer = self._lexer(nmrstar_str, report)
         token = next(lexer)
 
         while token != u"":
             try:
                 if token[0:5] == u"save_":
                     name = token
-                    frame = self._build_saveframe(lexer)
+                    frame = self._build_saveframe(lexer, _Changes() if keep_raw else None)
                     if frame:
                         odict[name] = frame
 
@@ -345,17 +562,25 @@ class NMRStarFile(StarFile):
 
             finally:
                 token = next(lexer)
+
+        if keep_raw:
+            for name, raw_saveframe in self._split_saveframes(nmrstar_str).items():
+                if name in self:
+                    self[name]._changes.modified = False
+                    self._raw_saveframes[name] = (self[name], raw_saveframe)
         return self
 
-    def _build_saveframe(self, lexer):
+    def _build_saveframe(self, lexer, changes=None):
         """Build NMR-STAR file saveframe.
 
         :param lexer: instance of the lexical analyzer.
         :type lexer: :func:`~nmrstarlib.bmrblex.bmrblex`
+        :param changes: Modification flag to track changes of saveframe with, or None to not track them.
+        :type changes: :class:`~nmrstarlib.nmrstarlib._Changes`
         :return: Saveframe dictionary.
         :rtype: :py:class:`collections.OrderedDict`
         """
-        odict = OrderedDict()
+        odict = OrderedDict() if changes is None else _TrackedDict(changes)
         loop_count = 0
         token = next(lexer)
 
@@ -371,7 +596,7 @@ class NMRStarFile(StarFile):
                             raise SkipSaveFrame()
 
                 elif token == u"loop_":
-                    odict[u"loop_{}".format(loop_count)] = self._build_loop(lexer)
+                    odict[u"loop_{}".format(loop_count)] = self._build_loop(lexer, changes)
                     loop_count += 1
 
                 elif token.lstrip().startswith(u"#"):
@@ -396,11 +621,13 @@ class NMRStarFile(StarFile):
                     token = next(lexer)
         return odict
 
-    def _build_loop(self, lexer):
+    def _build_loop(self, lexer, changes=None):
         """Build saveframe loop.
 
         :param lexer: instance of lexical analyzer.
         :type lexer: :func:`~nmrstarlib.bmrblex.bmrblex`
+        :param changes: Modification flag to track changes of loop with, or None to not track them.
+        :type changes: :class:`~nmrstarlib.nmrstarlib._Changes`
         :return: Fields and values of the loop.
         :rtype: :py:class:`tuple`
         """
@@ -419,8 +646,13 @@ class NMRStarFile(StarFile):
         assert float(len(values) / len(fields)).is_integer(), \
             "Error in loop construction: number of fields must be equal to number of values."
 
-        values = [OrderedDict(zip(fields, values[i:i + len(fields)])) for i in range(0, len(values), len(fields))]
-        return fields, values
+        if changes is None:
+            values = [OrderedDict(zip(fields, values[i:i + len(fields)])) for i in range(0, len(values), len(fields))]
+            return fields, values
+
+        values = [_TrackedDict(changes, zip(fields, values[i:i + len(fields)]))
+                  for i in range(0, len(values), len(fields))]
+        return _TrackedList(changes, fields), _TrackedList(changes, values)
 
     def _skip_saveframe(self, lexer):
         """Skip entire saveframe - keep emitting tokens until the end of saveframe.
@@ -434,6 +666,57 @@ class NMRStarFile(StarFile):
         while token != u"save_":
             token = next(lexer)
 
+    @staticmethod
+    def _split_saveframes(nmrstar_str):
+        """Split NMR-STAR-formatted string into original text of each saveframe.
+        Lines inside of multiline strings are ignored while looking for saveframe boundaries.
+
+        :param nmrstar_str: NMR-STAR-formatted string.
+        :type nmrstar_str: :py:class:`str` or :py:class:`bytes`
+        :return: Saveframe name and saveframe text key-value pairs.
+        :rtype: :py:class:`dict`
+        """
+        if isinstance(nmrstar_str, bytes):
+            nmrstar_str = nmrstar_str.decode("utf-8")
+
+        raw_saveframes = {}
+        name = None
+        start = 0
+        offset = 0
+        multiline = False
+
+        for line in nmrstar_str.split(u"\n"):
+            if line.startswith(u";"):
+                multiline = not multiline
+
+            elif not multiline:
+                words = line.split(None, 1)
+                if words and words[0] == u"save_":
+                    if name is not None:
+                        raw_saveframes[name] = nmrstar_str[start:offset + len(line)]
+                        name = None
+                elif words and words[0].startswith(u"save_"):
+                    name = words[0]
+                    start = offset
+
+            offset += len(line) + 1
+        return raw_saveframes
+
+    def _raw_saveframe(self, sf):
+        """Original text of saveframe if saveframe was not modified since it was read.
+
+        :param str sf: Saveframe name.
+        :return: Original saveframe text or None if not available or saveframe was modified.
+        :rtype: :py:class:`str` or :py:obj:`None`
+        """
+        if sf not in self._raw_saveframes:
+            return None
+
+        saveframe, raw_saveframe = self._raw_saveframes[sf]
+        if self.get(sf) is saveframe and not saveframe._changes.modified:
+            return raw_saveframe
+        return None
+
     def print_file(self, f=sys.stdout, file_format="nmrstar", tw=3):
         """Print :class:`~nmrstarlib.nmrstarlib.NMRStarFile` into a file or stdout.
 
@@ -450,9 +733,14 @@ class NMRStarFile(StarFile):
                 elif saveframe.startswith(u"comment"):
                     print(u"{}".format(self[saveframe]), file=f)
                 else:
-                    print(u"{}".format(saveframe), file=f)
-                    self.print_saveframe(saveframe, f, file_format, tw)
-                    print(u"\nsave_\n\n", file=f)
+                    raw_saveframe = self._raw_saveframe(saveframe)
+                    if raw_saveframe is not None:
+                        # saveframe was not modified since it was read, write its original text as is
+                        print(u"{}\n\n".format(raw_saveframe), file=f)
+                    else:
+                        print(u"{}".format(saveframe), file=f)
+                        self.print_saveframe(saveframe, f, file_format, tw)
+                        print(u"\nsave_\n\n", file=f)
 
         elif file_format == "json":
             print(self._to_json(), file=f)
@@ -597,18 +885,20 @@ class CIFFile(StarFile):
         self.source = source
         self.id = ""
 
-    def _build_file(self, cif_str):
+    def _build_file(self, cif_str, report=None):
         """Build :class:`~nmrstarlib.nmrstarlib.CIFFile` object.
 
         :param cif_str: NMR-STAR-formatted string.
         :type cif_str: :py:class:`str` or :py:class:`bytes`
+        :param report: Report to record time spent lexing in.
+        :type report: :class:`~nmrstarlib.report.Report`
         :return: instance of :class:`~nmrstarlib.nmrstarlib.CIFFile`.
         :rtype: :class:`~nmrstarlib.nmrstarlib.CIFFile`
         """
         odict = self
         comment_count = 0
         loop_count = 0
-        lexer = bmrblex(cif_str)
+        lexer = self._lexer(cif_str, report)
         token = next(lexer)
 
         while token != u"":
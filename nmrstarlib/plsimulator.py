@@ -114,6 +114,7 @@ class PeakList(list):
         self.spectrum_name = spectrum_name
         self.labels = labels
         self.source = "{}_{}_{}".format(source, spectrum_name, chain_idx)
+        self.starfile_source = source
 
     def _to_sparky(self):
         """Save :class:`~nmrstarlib.plsimulator.PeakList` into Sparky-formatted string.
@@ -164,7 +165,7 @@ class PeakList(list):
                 sparky_str = self._to_sparky()
                 filehandle.write(sparky_str)
             elif fileformat == "autoassign":
-                autoassign_str = self._to_sparky()
+                autoassign_str = self._to_autoassign()
                 filehandle.write(autoassign_str)
             elif fileformat == "json":
                 json_str = self._to_json()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nmrstarlib.report
+~~~~~~~~~~~~~~~~~
+
+This module provides the :class:`~nmrstarlib.report.Report` class
+that records how much data each processed file had and how long each
+stage of its processing took, so the bottleneck stage of conversion
+can be found on a given machine.
+"""
+
+import io
+import json
+import time
+import collections
+
+
+STAGES = ("read", "lex", "build", "serialize", "write")
+
+_timer = getattr(time, "perf_counter", time.time)
+
+
+class _Stage(object):
+    """Context manager that adds time spent in the block to a stage of a file record.
+    Time spent in stages nested in the block is excluded, so stages do not overlap."""
+
+    def __init__(self, report, source, name):
+        """Stage initializer.
+
+        :param report: Report to record time in.
+        :type report: :class:`~nmrstarlib.report.Report`
+        :param str source: Source of processed file.
+        :param str name: Name of stage.
+        """
+        self.report = report
+        self.source = source
+        self.name = name
+        self.nested = 0.0
+        self.iterators = []
+
+    def __enter__(self):
+        self.report._stack.append(self)
+        self.start = _timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = _timer() - self.start
+        self.report._stack.pop()
+        if self.report._stack:
+            self.report._stack[-1].nested += elapsed
+        for iterator in self.iterators:
+            self.nested += iterator.elapsed
+            iterator._record(iterator.elapsed)
+            iterator.elapsed = 0.0
+            iterator.parent = None
+        stages = self.report.record(self.source)["stages"]
+        stages[self.name] = stages.get(self.name, 0.0) + elapsed - self.nested
+        return False
+
+
+class _NoStage(object):
+    """Context manager that does nothing, used when there is no report."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(report, source, name):
+    """Time stage of processing of a file.
+
+    :param report: Report to record time in, nothing is recorded if None.
+    :type report: :class:`~nmrstarlib.report.Report` or :py:obj:`None`
+    :param str source: Source of processed file.
+    :param str name: Name of stage: `read` (open, read and decompress), `lex`, `build`,
+                     `serialize` or `write` (compress and write).
+    :return: Context manager.
+    """
+    if report is None:
+        return _NO_STAGE
+    return _Stage(report, source, name)
+
+
+class _TimedIterator(object):
+    """Iterator that times each item produced by the wrapped iterator, e.g. each token lexed
+    while the builder consumes them, so lexing is timed without lexing the whole file first.
+    Time is accumulated and recorded once the enclosing stage exits, excluded from its time."""
+
+    def __init__(self, report, source, name, iterator):
+        """Timed iterator initializer.
+
+        :param report: Report to record time in.
+        :type report: :class:`~nmrstarlib.report.Report`
+        :param str source: Source of processed file.
+        :param str name: Name of stage.
+        :param iterator: Iterator to time.
+        """
+        self.report = report
+        self.source = source
+        self.name = name
+        self.iterator = iterator
+        self.elapsed = 0.0
+        self.parent = report._stack[-1] if report._stack else None
+        if self.parent is not None:
+            self.parent.iterators.append(self)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = _timer()
+        item = next(self.iterator)
+        if self.parent is None:
+            self._record(_timer() - start)
+        else:
+            self.elapsed += _timer() - start
+        return item
+
+    next = __next__
+
+    def _record(self, elapsed):
+        stages = self.report.record(self.source)["stages"]
+        stages[self.name] = stages.get(self.name, 0.0) + elapsed
+
+
+def timed(report, source, name, iterator):
+    """Time stage of processing of a file that produces items consumed by another stage,
+    e.g. lexing tokens consumed by building.
+
+    :param report: Report to record time in, nothing is recorded if None.
+    :type report: :class:`~nmrstarlib.report.Report` or :py:obj:`None`
+    :param str source: Source of processed file.
+    :param str name: Name of stage, see :func:`~nmrstarlib.report.stage`.
+    :param iterator: Iterator to time.
+    :return: Iterator over the same items.
+    """
+    if report is None:
+        return iterator
+    return _TimedIterator(report, source, name, iterator)
+
+
+class Report(object):
+    """Throughput report of processed files.
+
+    Each file is recorded with the number of input bytes (after decompression), the number
+    of output bytes (before compression) and the time spent in each processing stage.
+    The report file is ``JSON`` with per-file records and aggregate totals: files and megabytes
+    per second of wall-clock time and the stage with the largest total time.
+    """
+
+    def __init__(self, path):
+        """Report initializer, wall-clock time is measured from this point.
+
+        :param str path: Path to report file.
+        """
+        self.path = path
+        self.files = collections.OrderedDict()
+        self._stack = []
+        self._start = _timer()
+
+    def record(self, source):
+        """Record of file, created on first use.
+
+        :param str source: Source of processed file.
+        :return: File record.
+        :rtype: :py:class:`dict`
+        """
+        record = self.files.get(source)
+        if record is None:
+            record = self.files[source] = {"source": source, "bytes_in": 0, "bytes_out": 0, "stages": {}}
+        return record
+
+    def set_input(self, source, size):
+        """Record size of file content, setting it again does not add to it.
+
+        :param str source: Source of processed file.
+        :param int size: Number of input bytes after decompression.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        self.record(source)["bytes_in"] = size
+
+    def add_output(self, source, size):
+        """Add size of output written from file.
+
+        :param str source: Source of processed file.
+        :param int size: Number of output bytes before compression.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        self.record(source)["bytes_out"] += size
+
+    def merge(self, record):
+        """Merge file record made by another report, e.g. in a worker process.
+
+        :param dict record: File record.
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        target = self.record(record["source"])
+        target["bytes_in"] = record["bytes_in"] or target["bytes_in"]
+        target["bytes_out"] += record["bytes_out"]
+        for name, seconds in record["stages"].items():
+            target["stages"][name] = target["stages"].get(name, 0.0) + seconds
+
+    def summary(self):
+        """Aggregate totals of all recorded files.
+
+        :return: Totals.
+        :rtype: :py:class:`dict`
+        """
+        elapsed = _timer() - self._start
+        stages = dict((name, 0.0) for name in STAGES)
+        for record in self.files.values():
+            for name, seconds in record["stages"].items():
+                stages[name] = stages.get(name, 0.0) + seconds
+
+        bytes_in = sum(record["bytes_in"] for record in self.files.values())
+        bytes_out = sum(record["bytes_out"] for record in self.files.values())
+        return {"files": len(self.files),
+                "bytes_in": bytes_in,
+                "bytes_out": bytes_out,
+                "elapsed": elapsed,
+                "stages": stages,
+                "bottleneck": max(stages, key=stages.get) if any(stages.values()) else None,
+                "files_per_second": len(self.files) / elapsed if elapsed else 0.0,
+                "mb_in_per_second": bytes_in / 1024.0**2 / elapsed if elapsed else 0.0,
+                "mb_out_per_second": bytes_out / 1024.0**2 / elapsed if elapsed else 0.0}
+
+    def save(self):
+        """Write report file.
+
+        :return: None
+        :rtype: :py:obj:`None`
+        """
+        with io.open(self.path, "w", encoding="utf-8") as outfile:
+            outfile.write(u"{}".format(json.dumps({"files": list(self.files.values()), "total": self.summary()},
+                                                  indent=4)))
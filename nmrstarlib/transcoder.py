@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+nmrstarlib.transcoder
+~~~~~~~~~~~~~~~~~~~~~
+
+This module provides the :func:`~nmrstarlib.transcoder.nmrstar_to_json` function
+that transcodes tokens produced by :func:`~nmrstarlib.bmrblex.bmrblex` directly into
+JSONized NMR-STAR without building :class:`~nmrstarlib.nmrstarlib.NMRStarFile` first.
+
+The output has the same layout as :meth:`~nmrstarlib.nmrstarlib.StarFile.write`
+with `json` format (:py:func:`json.dump` with indentation of 4 spaces), except for
+files with repeated saveframe names or repeated tags within a saveframe: every
+occurrence is written, and reading such JSON keeps the value of the last occurrence
+at the position of the first one, the same as :class:`~nmrstarlib.nmrstarlib.NMRStarFile` does.
+
+.. note::
+   Loops are written row by row in `rows` layout. In `columns` layout the values
+   of a single loop are kept in memory until the loop is transposed. The input text
+   itself is still loaded into memory by the lexer.
+"""
+
+import sys
+import json
+
+from . import nmrstarlib
+
+
+INDENT = u"    "
+
+if sys.version_info.major == 3:
+    _encode = json.encoder.encode_basestring_ascii
+else:
+    def _encode(value):
+        """Encode string as JSON string literal, text written into text file-like object must be unicode.
+
+        :param value: String to encode.
+        :return: JSON string literal.
+        :rtype: :py:class:`unicode`
+        """
+        return json.encoder.encode_basestring_ascii(value).decode("ascii")
+
+
+def nmrstar_to_json(nmrstar_str, f):
+    """Transcode NMR-STAR formatted string into JSONized NMR-STAR, written into file incrementally.
+    Layout of loops is set by :data:`~nmrstarlib.nmrstarlib.JSON_LAYOUT`.
+
+    :param nmrstar_str: NMR-STAR formatted string.
+    :type nmrstar_str: :py:class:`str` or :py:class:`bytes`
+    :param f: Writable text file-like object.
+    :type f: :py:class:`io.TextIOWrapper`
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    if nmrstarlib.JSON_LAYOUT not in ("rows", "columns"):
+        raise ValueError('Unknown JSON layout: "{}"'.format(nmrstarlib.JSON_LAYOUT))
+
+    lexer = nmrstarlib.bmrblex(nmrstar_str)
+    comment_count = 0
+    first = True
+    token = next(lexer)
+
+    while token != u"":
+        if token[0:5] == u"save_":
+            if not _transcode_saveframe(lexer, f, token, 1, first):
+                token = next(lexer)
+                continue
+
+        elif token[0:5] == u"data_":
+            _write_key(f, u"data", 1, first)
+            f.write(_encode(token[5:]))
+
+        elif token.lstrip().startswith(u"#"):
+            _write_key(f, u"comment_{}".format(comment_count), 1, first)
+            f.write(_encode(token))
+            comment_count += 1
+
+        else:
+            raise nmrstarlib.InvalidToken("{}".format(token))
+
+        first = False
+        token = next(lexer)
+
+    f.write(u"{}" if first else u"\n}")
+
+
+def _write_key(f, key, level, first):
+    """Write dictionary key, opening the dictionary before the first key.
+
+    :param f: Writable text file-like object.
+    :param str key: Dictionary key.
+    :param int level: Indentation level of the key.
+    :param first: Key is the first key in dictionary.
+    :type first: :py:obj:`True` or :py:obj:`False`
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    f.write(u"{}{}{}: ".format(u"{\n" if first else u",\n", INDENT * level, _encode(key)))
+
+
+def _transcode_saveframe(lexer, f, name, level, first):
+    """Transcode saveframe tokens up to the closing `save_` token. The saveframe key is written
+    with the first tag or loop, so empty saveframes are skipped the same way
+    :class:`~nmrstarlib.nmrstarlib.NMRStarFile` skips them.
+
+    :param lexer: instance of the lexical analyzer.
+    :type lexer: :func:`~nmrstarlib.bmrblex.bmrblex`
+    :param f: Writable text file-like object.
+    :param str name: Saveframe name.
+    :param int level: Indentation level of the saveframe key.
+    :param first: Saveframe key is the first key in dictionary.
+    :type first: :py:obj:`True` or :py:obj:`False`
+    :return: True if saveframe was written, False if it is empty.
+    :rtype: :py:obj:`True` or :py:obj:`False`
+    """
+    loop_count = 0
+    opened = False
+    token = next(lexer)
+
+    while token != u"save_":
+        if token[0] == u"_":
+            if not opened:
+                _write_key(f, name, level, first)
+            _write_key(f, token[1:], level + 1, not opened)
+            f.write(_encode(next(lexer)))
+            opened = True
+
+        elif token == u"loop_":
+            if not opened:
+                _write_key(f, name, level, first)
+            _write_key(f, u"loop_{}".format(loop_count), level + 1, not opened)
+            if nmrstarlib.JSON_LAYOUT == "rows":
+                _transcode_loop_rows(lexer, f, level + 1)
+            else:
+                _transcode_loop_columns(lexer, f, level + 1)
+            loop_count += 1
+            opened = True
+
+        elif not token.lstrip().startswith(u"#"):
+            raise nmrstarlib.InvalidToken("{}".format(token))
+
+        token = next(lexer)
+
+    if opened:
+        f.write(u"\n{}}}".format(INDENT * level))
+    return opened
+
+
+def _loop_fields(lexer):
+    """Read loop field names.
+
+    :param lexer: instance of the lexical analyzer.
+    :type lexer: :func:`~nmrstarlib.bmrblex.bmrblex`
+    :return: List of fields, index of the last occurrence of each field and the first value token.
+    :rtype: :py:class:`tuple`
+    """
+    fields = []
+    token = next(lexer)
+    while token[0] == u"_":
+        fields.append(token[1:])
+        token = next(lexer)
+
+    last_index = dict((field, i) for i, field in enumerate(fields))
+    return fields, last_index, token
+
+
+def _write_list(f, items, level):
+    """Write list of strings.
+
+    :param f: Writable text file-like object.
+    :param list items: List of strings.
+    :param int level: Indentation level of the list.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    if not items:
+        f.write(u"[]")
+        return
+
+    separator = u",\n" + INDENT * (level + 1)
+    f.write(u"[\n{}{}\n{}]".format(INDENT * (level + 1), separator.join(_encode(item) for item in items), INDENT * level))
+
+
+def _transcode_loop_rows(lexer, f, level):
+    """Transcode loop into a list of fields and a list of per-row dictionaries, row by row.
+
+    :param lexer: instance of the lexical analyzer.
+    :type lexer: :func:`~nmrstarlib.bmrblex.bmrblex`
+    :param f: Writable text file-like object.
+    :param int level: Indentation level of the loop key.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    fields, last_index, token = _loop_fields(lexer)
+    row_fields = [field for i, field in enumerate(fields) if fields.index(field) == i]
+
+    f.write(u"[\n{}".format(INDENT * (level + 1)))
+    _write_list(f, fields, level + 1)
+    f.write(u",\n{}".format(INDENT * (level + 1)))
+
+    key_indent = u",\n" + INDENT * (level + 3)
+    row_start = u"{}{{\n{}".format(INDENT * (level + 2), INDENT * (level + 3))
+    row_end = u"\n{}}}".format(INDENT * (level + 2))
+
+    row = []
+    rows = 0
+    while token != u"stop_":
+        row.append(token)
+        if len(row) == len(fields):
+            f.write(u"{}{}{}".format(u"[\n" if not rows else u",\n", row_start,
+                                     key_indent.join(u"{}: {}".format(_encode(field), _encode(row[last_index[field]]))
+                                                     for field in row_fields)) + row_end)
+            row = []
+            rows += 1
+        token = next(lexer)
+
+    assert not row, "Error in loop construction: number of fields must be equal to number of values."
+
+    f.write(u"[]" if not rows else u"\n{}]".format(INDENT * (level + 1)))
+    f.write(u"\n{}]".format(INDENT * level))
+
+
+def _transcode_loop_columns(lexer, f, level):
+    """Transcode loop into a dictionary of fields and per-field columns.
+
+    :param lexer: instance of the lexical analyzer.
+    :type lexer: :func:`~nmrstarlib.bmrblex.bmrblex`
+    :param f: Writable text file-like object.
+    :param int level: Indentation level of the loop key.
+    :return: None
+    :rtype: :py:obj:`None`
+    """
+    fields, last_index, token = _loop_fields(lexer)
+
+    values = []
+    while token != u"stop_":
+        values.append(token)
+        token = next(lexer)
+
+    assert float(len(values) / len(fields)).is_integer(), \
+        "Error in loop construction: number of fields must be equal to number of values."
+
+    f.write(u"{{\n{}\"fields\": ".format(INDENT * (level + 1)))
+    _write_list(f, fields, level + 1)
+    f.write(u",\n{}\"columns\": ".format(INDENT * (level + 1)))
+
+    f.write(u"[")
+    for i, field in enumerate(fields):
+        f.write(u"\n{}".format(INDENT * (level + 2)) if i == 0 else u",\n{}".format(INDENT * (level + 2)))
+        _write_list(f, values[last_index[field]::len(fields)], level + 2)
+    f.write(u"\n{}]".format(INDENT * (level + 1)))
+
+    f.write(u"\n{}}}".format(INDENT * level))
@@ -16,6 +16,7 @@ import itertools
 from . import nmrstarlib
 from . import fileio
 from . import plsimulator
+from .report import stage
 
 
 class Translator(object):
@@ -27,14 +28,28 @@ class Translator(object):
         :param str from_path: Path to input file(s).
         :param str to_path: Path to output file(s).
         :param str from_format: Input format.
-        :param str to_format: Output format.
+        :param to_format: Output format, list or comma-separated string of several output formats
+                          to write each file in, e.g. `json,nmrstar`.
+        :type to_format: :py:class:`str` or :py:class:`list`
         """
+        if isinstance(to_format, (list, tuple)):
+            to_formats = list(to_format)
+        elif to_format:
+            to_formats = to_format.split(",")
+        else:
+            to_formats = [to_format]
+
         self.from_path = from_path
         self.to_path = to_path
         self.from_format = from_format
-        self.to_format = to_format
+        self.to_format = to_formats[0]
+        self.to_formats = to_formats
         self.from_path_compression = fileio.GenericFilePath.is_compressed(from_path)
         self.to_path_compression = fileio.GenericFilePath.is_compressed(to_path)
+        self.manifest = None
+        self.skip = None
+        self.report = None
+        self.error_log = None
 
     def __iter__(self):
         """Abstract iterator must be implemented in a subclass."""
@@ -54,7 +69,7 @@ class StarFileToStarFile(Translator):
         :param str from_path: Path to input file(s).
         :param str to_path: Path to output file(s).
         :param str from_format: Input format: `nmrstar`, `cif`, or `json`.
-        :param str to_format: Output format: `nmrstar`, `cif`, or `json`.
+        :param to_format: Output format: `nmrstar`, `cif`, or `json`, or several of them.
         """
         super(StarFileToStarFile, self).__init__(from_path, to_path, from_format, to_format)
 
@@ -64,7 +79,8 @@ class StarFileToStarFile(Translator):
         :return: instance of :class:`~nmrstarlib.nmrstarlib.StarFile` object instance.
         :rtype: :class:`~nmrstarlib.nmrstarlib.StarFile`
         """
-        for starfile in fileio.read_files(self.from_path):
+        for starfile in fileio.read_files(self.from_path, manifest=self.manifest, skip=self.skip, report=self.report,
+                                          error_log=self.error_log):
             yield starfile
 
 
@@ -82,7 +98,7 @@ class StarFileToPeakList(Translator):
         :param str from_path: Path to input file(s).
         :param str to_path: Path to output file(s).
         :param str from_format: Input format: `nmrstar` or `json`.
-        :param str to_format: Output format: `json` or `sparky`.
+        :param to_format: Output format: `json` or `sparky`, or several of them.
         :param str spectrum_name: Name of spectrum from which to simulate peak list.
         :param tuple plsplit: How to split peak list in order to account for multiple sources of variance.
         :param str nmrstar_version: Version of NMR-STAR format to use for look up chemical shifts loop.
@@ -250,13 +266,21 @@ class StarFileToPeakList(Translator):
         :return: instance of :class:`~nmrstarlib.plsimulator.PeakList` object instance.
         :rtype: :class:`~nmrstarlib.plsimulator.PeakList`
         """
-        for starfile in fileio.read_files(self.from_path):
-            chains = starfile.chem_shifts_by_residue(amino_acids_and_atoms=self.spectrum.amino_acids_and_atoms,
-                                                     nmrstar_version=self.nmrstar_version)
-
-            for chain_idx, chain in enumerate(chains):
-                peaklist = self.create_peaklist(self.spectrum, chain, chain_idx, starfile.source)
+        for starfile in fileio.read_files(self.from_path, manifest=self.manifest, skip=self.skip, report=self.report,
+                                          error_log=self.error_log):
+            try:
+                with stage(self.report, starfile.source, "build"):
+                    chains = starfile.chem_shifts_by_residue(amino_acids_and_atoms=self.spectrum.amino_acids_and_atoms,
+                                                             nmrstar_version=self.nmrstar_version)
+                    peaklists = [self.create_peaklist(self.spectrum, chain, chain_idx, starfile.source)
+                                 for chain_idx, chain in enumerate(chains)]
+            except Exception as exc:
+                if self.error_log is None:
+                    raise
+                self.error_log.add(starfile.source, exc)
+                continue
 
+            for peaklist in peaklists:
                 if peaklist:
                     yield peaklist
                 else:
@@ -36,7 +36,8 @@ def find_version():
 
 REQUIRES = [
     'docopt >= 0.6.2',
-    'graphviz >= 0.5.2'
+    'graphviz >= 0.5.2',
+    'scandir >= 1.5; python_version < "3.5"'
 ]
 
 
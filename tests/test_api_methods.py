@@ -1,4 +1,6 @@
+import io
 import json
+import pickle
 import collections
 import pytest
 
@@ -50,3 +52,66 @@ def test_chem_shifts_by_residue_all(test_input, test_output, amino_acids, atoms,
 
     assert repr(test_chem_shifts1) == repr(model_chem_shifts1)
     assert repr(test_chem_shifts2) == repr(model_chem_shifts2)
+
+
+@pytest.mark.parametrize("source", [
+    "tests/example_data/NMRSTAR3/bmr18569.str",
+    "tests/example_data/NMRSTAR2/bmr18569.str"
+])
+def test_keep_raw_saveframes(source):
+    starfile = next(nmrstarlib.read_files(source, keep_raw=True))
+    with open(source, "r") as infile:
+        original_str = infile.read()
+
+    saveframe_names = [key for key in starfile if key.startswith("save_")]
+    modified_saveframe = saveframe_names[0]
+    starfile[modified_saveframe]["Modified_tag"] = "modified"
+    nmrstar_str = starfile.writestr("nmrstar")
+
+    for saveframe in saveframe_names[1:]:
+        raw_saveframe = starfile._raw_saveframe(saveframe)
+        assert raw_saveframe in original_str and raw_saveframe in nmrstar_str
+
+    assert starfile._raw_saveframe(modified_saveframe) is None
+    assert "_Modified_tag" in nmrstar_str
+
+
+@pytest.mark.parametrize("source", [
+    "tests/example_data/NMRSTAR3/bmr18569.str",
+    "tests/example_data/NMRSTAR2/bmr18569.str"
+])
+def test_keep_raw_saveframes_changes(source):
+    starfile = next(nmrstarlib.read_files(source, keep_raw=True))
+    loop_saveframes = [key for key in starfile if key.startswith("save_") and "loop_0" in starfile[key]]
+    row_saveframe, rows_saveframe, fields_saveframe, replaced_saveframe = loop_saveframes[:4]
+
+    starfile = pickle.loads(pickle.dumps(starfile))
+    assert all(starfile._raw_saveframe(key) is not None for key in starfile if key.startswith("save_"))
+
+    fields, values = starfile[row_saveframe]["loop_0"]
+    values[0][fields[0]] = "modified"
+    starfile[rows_saveframe]["loop_0"][1].pop()
+    starfile[fields_saveframe]["loop_0"][0].append("Modified_field")
+    starfile[replaced_saveframe] = collections.OrderedDict(starfile[replaced_saveframe])
+
+    for saveframe in (row_saveframe, rows_saveframe, fields_saveframe, replaced_saveframe):
+        assert starfile._raw_saveframe(saveframe) is None
+    assert starfile._raw_saveframe(loop_saveframes[4]) is not None
+
+
+@pytest.mark.parametrize("source", [
+    "tests/example_data/NMRSTAR3/bmr18569.str",
+    "tests/example_data/NMRSTAR2/bmr18569.str",
+    "tests/example_data/CIF/2rpv.cif"
+])
+def test_json_columns_layout(source):
+    starfile = next(nmrstarlib.read_files(source))
+    nmrstarlib.nmrstarlib.JSON_LAYOUT = "columns"
+    try:
+        json_str = starfile.writestr("json")
+    finally:
+        nmrstarlib.nmrstarlib.JSON_LAYOUT = "rows"
+
+    assert '"columns"' in json_str
+    columns_starfile = nmrstarlib.nmrstarlib.StarFile.read(io.StringIO(json_str), source)
+    assert columns_starfile.writestr("json") == starfile.writestr("json")
@@ -1,9 +1,14 @@
 import os
+import io
+import gzip
+import json
 import shutil
+import tarfile
+import zipfile
 import pytest
 
 import nmrstarlib
-from nmrstarlib.converter import Converter
+from nmrstarlib.converter import Converter, MemberWriter, ParallelGzipWriter, TextWriter
 from nmrstarlib.translator import StarFileToStarFile
 
 
@@ -57,6 +62,14 @@ def teardown_module(module, paths=(
     ("tests/example_data/NMRSTAR2/tmp/json/bmr18569.json.bz2", "tests/example_data/NMRSTAR2/tmp/nmrstar/bz2/bmr18569.str.bz2", "json", "nmrstar"),
     ("tests/example_data/CIF/tmp/json/2rpv.json.bz2",          "tests/example_data/CIF/tmp/cif/bz2/2rpv.cif.bz2",              "json", "cif"),
 
+    ("tests/example_data/NMRSTAR3/bmr18569.str", "tests/example_data/NMRSTAR3/tmp/json/bmr18569.json.xz", "nmrstar", "json"),
+    ("tests/example_data/NMRSTAR2/bmr18569.str", "tests/example_data/NMRSTAR2/tmp/json/bmr18569.json.xz", "nmrstar", "json"),
+    ("tests/example_data/CIF/2rpv.cif",          "tests/example_data/CIF/tmp/json/2rpv.json.xz",          "cif",     "json"),
+
+    ("tests/example_data/NMRSTAR3/tmp/json/bmr18569.json.xz", "tests/example_data/NMRSTAR3/tmp/nmrstar/xz/bmr18569.str", "json", "nmrstar"),
+    ("tests/example_data/NMRSTAR2/tmp/json/bmr18569.json.xz", "tests/example_data/NMRSTAR2/tmp/nmrstar/xz/bmr18569.str", "json", "nmrstar"),
+    ("tests/example_data/CIF/tmp/json/2rpv.json.xz",          "tests/example_data/CIF/tmp/cif/xz/2rpv.cif",              "json", "cif"),
+
     # many-to-many file conversions
     ("tests/example_data/NMRSTAR3/starfiles_directory", "tests/example_data/NMRSTAR3/tmp/json/dir/starfiles_files_json", "nmrstar", "json"),
     ("tests/example_data/NMRSTAR2/starfiles_directory", "tests/example_data/NMRSTAR2/tmp/json/dir/starfiles_files_json", "nmrstar", "json"),
@@ -156,7 +169,15 @@ def teardown_module(module, paths=(
 
     ("tests/example_data/NMRSTAR3/tmp/json/dir/starfiles_files_json.tar.bz2", "tests/example_data/NMRSTAR3/tmp/nmrstar/tarbz2/starfiles_nmrstar.tar.bz2", "json", "nmrstar"),
     ("tests/example_data/NMRSTAR2/tmp/json/dir/starfiles_files_json.tar.bz2", "tests/example_data/NMRSTAR2/tmp/nmrstar/tarbz2/starfiles_nmrstar.tar.bz2", "json", "nmrstar"),
-    ("tests/example_data/CIF/tmp/json/dir/ciffiles_files_json.tar.bz2",       "tests/example_data/CIF/tmp/cif/tarbz2/ciffiles_cif.tar.bz2",               "json", "cif")
+    ("tests/example_data/CIF/tmp/json/dir/ciffiles_files_json.tar.bz2",       "tests/example_data/CIF/tmp/cif/tarbz2/ciffiles_cif.tar.bz2",               "json", "cif"),
+
+    ("tests/example_data/NMRSTAR3/starfiles_directory", "tests/example_data/NMRSTAR3/tmp/json/dir/starfiles_files_json.tar.xz", "nmrstar", "json"),
+    ("tests/example_data/NMRSTAR2/starfiles_directory", "tests/example_data/NMRSTAR2/tmp/json/dir/starfiles_files_json.tar.xz", "nmrstar", "json"),
+    ("tests/example_data/CIF/ciffiles_directory",       "tests/example_data/CIF/tmp/json/dir/ciffiles_files_json.tar.xz",       "cif",     "json"),
+
+    ("tests/example_data/NMRSTAR3/tmp/json/dir/starfiles_files_json.tar.xz", "tests/example_data/NMRSTAR3/tmp/nmrstar/tarxz/starfiles_nmrstar", "json", "nmrstar"),
+    ("tests/example_data/NMRSTAR2/tmp/json/dir/starfiles_files_json.tar.xz", "tests/example_data/NMRSTAR2/tmp/nmrstar/tarxz/starfiles_nmrstar.zip", "json", "nmrstar"),
+    ("tests/example_data/CIF/tmp/json/dir/ciffiles_files_json.tar.xz",       "tests/example_data/CIF/tmp/cif/tarxz/ciffiles_cif.tar.xz",               "json", "cif")
 ])
 def test_converter_module(from_path, to_path, from_format, to_format):
     nmrstar_file_translator = StarFileToStarFile(from_path=from_path,
@@ -170,3 +191,738 @@ def test_converter_module(from_path, to_path, from_format, to_format):
     starfiles_list = list(starfile_generator)
     starfiles_ids_set = set(sf.id for sf in starfiles_list)
     assert starfiles_ids_set.issubset({"15000", "18569", "2RPV", "2FRG"})
+
+
+def test_member_writer():
+    to_path = "tests/example_data/NMRSTAR3/tmp/member_writer/archive.tar"
+    if not os.path.exists(os.path.dirname(to_path)):
+        os.makedirs(os.path.dirname(to_path))
+
+    data = b"data_" * 1000
+    with tarfile.open(to_path, mode="w") as outfile:
+        member = MemberWriter(outfile, "member.txt", max_size=100)
+        for i in range(0, len(data), 64):
+            member.write(data[i:i + 64])
+        member.close()
+
+    with tarfile.open(to_path) as infile:
+        assert infile.extractfile("member.txt").read() == data
+
+
+def test_member_writer_byte_strings(monkeypatch):
+    to_path = "tests/example_data/NMRSTAR3/tmp/member_writer/bytes.tar"
+    if not os.path.exists(os.path.dirname(to_path)):
+        os.makedirs(os.path.dirname(to_path))
+
+    starfile = next(nmrstarlib.read_files("tests/example_data/NMRSTAR3/bmr15000.str"))
+    expected = starfile.writestr("json").encode("utf-8")
+    json_dump = json.dump
+
+    def py2_json_dump(obj, fp, **kwargs):
+        # json.dump on Python 2 writes byte strings
+        fp.write(json.dumps(obj, **kwargs).encode("utf-8"))
+
+    monkeypatch.setattr(nmrstarlib.nmrstarlib.json, "dump", py2_json_dump)
+    with tarfile.open(to_path, mode="w") as outfile:
+        Converter._write_member(starfile, MemberWriter(outfile, "bmr15000.json", max_size=100), "json")
+    monkeypatch.setattr(nmrstarlib.nmrstarlib.json, "dump", json_dump)
+
+    with tarfile.open(to_path) as infile:
+        assert infile.extractfile("bmr15000.json").read() == expected
+
+    outfile = io.BytesIO()
+    writer = TextWriter(nmrstarlib.converter.SharedWriter(outfile))
+    writer.write(b'{"key": ')
+    writer.write(u'"\u00e9"}')
+    writer.flush()
+    assert outfile.getvalue() == u'{"key": "\u00e9"}'.encode("utf-8")
+
+
+def test_incremental_manifest():
+    from_path = "tests/example_data/NMRSTAR3/tmp/manifest/starfiles"
+    to_path = "tests/example_data/NMRSTAR3/tmp/manifest/json"
+    manifest_path = "tests/example_data/NMRSTAR3/tmp/manifest/manifest.json"
+    shutil.copytree("tests/example_data/NMRSTAR3/starfiles_directory", from_path)
+
+    def convert(to_path=to_path):
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator).convert(manifest=manifest_path)
+        return sorted(os.listdir(to_path)) if os.path.exists(to_path) else []
+
+    def converted():
+        names = []
+        for name in sorted(os.listdir(to_path)):
+            with open(os.path.join(to_path, name)) as infile:
+                if infile.read() != "stale":
+                    names.append(name)
+            with open(os.path.join(to_path, name), "w") as outfile:
+                outfile.write("stale")
+        return names
+
+    assert convert() == ["bmr15000.str.json", "bmr18569.str.json"]
+    manifest = nmrstarlib.manifest.Manifest(manifest_path)
+    assert sorted(os.path.basename(path) for path in manifest.inputs) == ["bmr15000.str", "bmr18569.str"]
+    assert all(len(record["outputs"]) == 1 for record in manifest.inputs.values())
+    assert converted() == ["bmr15000.str.json", "bmr18569.str.json"]
+
+    convert()
+    assert converted() == []
+
+    with open(os.path.join(from_path, "bmr15000.str"), "a") as outfile:
+        outfile.write("\n")
+    convert()
+    assert converted() == ["bmr15000.str.json"]
+
+    os.remove(os.path.join(to_path, "bmr18569.str.json"))
+    convert()
+    assert converted() == ["bmr18569.str.json"]
+
+    shutil.rmtree(to_path)
+    assert convert() == ["bmr15000.str.json", "bmr18569.str.json"]
+
+    assert convert(to_path + "_copy") == ["bmr15000.str.json", "bmr18569.str.json"]
+
+    with pytest.raises(ValueError):
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path + ".zip", from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator).convert(manifest=manifest_path)
+
+
+@pytest.mark.parametrize("options", [{"workers": 2}, {"transcode": False}, {"transcode": True}, {"dedup": True}])
+def test_manifest_records_written_files(options, monkeypatch):
+    from_path = "tests/example_data/NMRSTAR3/tmp/manifest_interrupted/starfiles"
+    to_path = "tests/example_data/NMRSTAR3/tmp/manifest_interrupted/json"
+    manifest_path = "tests/example_data/NMRSTAR3/tmp/manifest_interrupted/manifest.json"
+    os.makedirs(from_path)
+    for i in range(1, 7):
+        with open("tests/example_data/NMRSTAR3/bmr15000.str") as infile, \
+                open(os.path.join(from_path, "f{}.str".format(i)), "w") as outfile:
+            outfile.write(infile.read() + "\n" * i)
+
+    add_output = Converter._add_output
+    written = []
+
+    def failing_add_output(self, f, outpath):
+        written.append(outpath)
+        if len(written) == 2:
+            raise RuntimeError("Interrupted conversion")
+        add_output(self, f, outpath)
+
+    def convert():
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator, **options).convert(manifest=manifest_path)
+
+    try:
+        monkeypatch.setattr(Converter, "_add_output", failing_add_output)
+        with pytest.raises(RuntimeError):
+            convert()
+        monkeypatch.setattr(Converter, "_add_output", add_output)
+
+        manifest = nmrstarlib.manifest.Manifest(manifest_path)
+        assert len(manifest.inputs) == 1
+        assert all(os.path.isfile(output) for record in manifest.inputs.values() for output in record["outputs"])
+
+        convert()
+        assert sorted(os.listdir(to_path)) == ["f{}.str.json".format(i) for i in range(1, 7)]
+        assert len(nmrstarlib.manifest.Manifest(manifest_path).inputs) == 6
+    finally:
+        shutil.rmtree("tests/example_data/NMRSTAR3/tmp/manifest_interrupted")
+
+
+def test_read_files_manifest_records_consumed_files():
+    from_path = "tests/example_data/NMRSTAR3/tmp/manifest_prefetch/starfiles"
+    manifest_path = "tests/example_data/NMRSTAR3/tmp/manifest_prefetch/manifest.json"
+    shutil.copytree("tests/example_data/NMRSTAR3/starfiles_directory", from_path)
+    try:
+        starfiles = nmrstarlib.read_files(from_path, prefetch=2, manifest=manifest_path)
+        next(starfiles)
+        starfiles.close()
+        assert list(nmrstarlib.manifest.Manifest(manifest_path).inputs) == []
+
+        assert [sf.id for sf in nmrstarlib.read_files(from_path, prefetch=2, manifest=manifest_path)] != []
+        assert len(nmrstarlib.manifest.Manifest(manifest_path).inputs) == 2
+        assert list(nmrstarlib.read_files(from_path, prefetch=2, manifest=manifest_path)) == []
+    finally:
+        shutil.rmtree("tests/example_data/NMRSTAR3/tmp/manifest_prefetch")
+
+
+def test_manifest_hashes_content_while_reading(monkeypatch):
+    from_path = "tests/example_data/NMRSTAR3/tmp/manifest_hash/inputs"
+    manifest_path = "tests/example_data/NMRSTAR3/tmp/manifest_hash/manifest.json"
+    os.makedirs(from_path)
+    for fname in ("bmr15000.str", "starfiles_archive.tar.gz", "starfiles_archive.tar.bz2", "starfiles_archive.zip"):
+        shutil.copy(os.path.join("tests/example_data/NMRSTAR3", fname), from_path)
+    with open("tests/example_data/NMRSTAR3/bmr18569.str", "rb") as infile, \
+            gzip.open(os.path.join(from_path, "bmr18569.str.gz"), "wb") as outfile:
+        shutil.copyfileobj(infile, outfile)
+
+    content_hash = nmrstarlib.manifest.Manifest.content_hash
+    hashed = []
+
+    def recording_content_hash(path):
+        hashed.append(os.path.basename(path))
+        return content_hash(path)
+
+    monkeypatch.setattr(nmrstarlib.manifest.Manifest, "content_hash", staticmethod(recording_content_hash))
+    try:
+        sources = [os.path.join(from_path, fname) for fname in sorted(os.listdir(from_path))]
+        assert len(list(nmrstarlib.read_files(*sources, manifest=manifest_path))) == 8
+        assert hashed == ["starfiles_archive.zip"]
+
+        inputs = nmrstarlib.manifest.Manifest(manifest_path).inputs
+        assert len(inputs) == 5
+        assert all(record["sha1"] == content_hash(path) for path, record in inputs.items())
+    finally:
+        shutil.rmtree("tests/example_data/NMRSTAR3/tmp/manifest_hash")
+
+
+@pytest.mark.parametrize("to_path", [
+    "tests/example_data/NMRSTAR3/tmp/xz_preset/bmr18569.json.xz",
+    "tests/example_data/NMRSTAR3/tmp/xz_preset/starfiles_json.tar.xz"
+])
+def test_xz_preset(to_path):
+    from_path = "tests/example_data/NMRSTAR3/bmr18569.str" if to_path.endswith(".json.xz") \
+        else "tests/example_data/NMRSTAR3/starfiles_directory"
+
+    sizes = []
+    for preset in (0, 9):
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator, xz_preset=preset).convert()
+        sizes.append(os.path.getsize(to_path))
+        assert set(sf.id for sf in nmrstarlib.read_files(to_path)).issubset({"15000", "18569"})
+
+    assert sizes[1] < sizes[0]
+
+
+def test_parallel_gzip_writer():
+    to_path = "tests/example_data/NMRSTAR3/tmp/parallel_gzip/data.gz"
+    if not os.path.exists(os.path.dirname(to_path)):
+        os.makedirs(os.path.dirname(to_path))
+
+    data = b"".join(b"loop_ %d\n" % i for i in range(50000))
+    with ParallelGzipWriter(io.open(to_path, "wb"), threads=3, block_size=4096) as outfile:
+        for i in range(0, len(data), 1000):
+            outfile.write(data[i:i + 1000])
+
+    with gzip.open(to_path, "rb") as infile:
+        assert infile.read() == data
+
+    with ParallelGzipWriter(io.open(to_path, "wb"), threads=2) as outfile:
+        pass
+    with gzip.open(to_path, "rb") as infile:
+        assert infile.read() == b""
+
+
+@pytest.mark.parametrize("from_path,to_path", [
+    ("tests/example_data/NMRSTAR3/bmr18569.str", "tests/example_data/NMRSTAR3/tmp/parallel_gzip/bmr18569.json.gz"),
+    ("tests/example_data/NMRSTAR3/starfiles_directory", "tests/example_data/NMRSTAR3/tmp/parallel_gzip/starfiles_json.tar.gz")
+])
+def test_threaded_gzip_conversion(from_path, to_path):
+    contents = []
+    for threads in (None, 4):
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator, threads=threads).convert()
+
+        if to_path.endswith(".tar.gz"):
+            with tarfile.open(to_path) as infile:
+                contents.append(sorted((member.name, infile.extractfile(member).read()) for member in infile))
+        else:
+            with gzip.open(to_path, "rb") as infile:
+                contents.append(infile.read())
+
+    assert contents[0] == contents[1]
+
+
+@pytest.mark.parametrize("from_path,to_path", [
+    ("tests/example_data/NMRSTAR3/starfiles_directory", "tests/example_data/NMRSTAR3/tmp/jobs/starfiles_json"),
+    ("tests/example_data/NMRSTAR2/starfiles_archive.tar.gz", "tests/example_data/NMRSTAR2/tmp/jobs/starfiles_json.zip"),
+    ("tests/example_data/CIF/ciffiles_archive.zip", "tests/example_data/CIF/tmp/jobs/ciffiles_json.tar")
+])
+def test_parallel_conversion(from_path, to_path):
+    contents = []
+    for workers in (None, 2):
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator, workers=workers).convert()
+
+        if to_path.endswith(".zip"):
+            with zipfile.ZipFile(to_path) as infile:
+                contents.append([(name, infile.read(name)) for name in infile.namelist()])
+        elif to_path.endswith(".tar"):
+            with tarfile.open(to_path) as infile:
+                contents.append([(member.name, infile.extractfile(member).read()) for member in infile])
+        else:
+            files = []
+            for fname in sorted(os.listdir(to_path)):
+                with open(os.path.join(to_path, fname), "rb") as infile:
+                    files.append((fname, infile.read()))
+            contents.append(files)
+            shutil.rmtree(to_path)
+
+    assert contents[0] == contents[1]
+
+
+class InterruptedTranslator(StarFileToStarFile):
+
+    def __iter__(self):
+        for starfile in super(InterruptedTranslator, self).__iter__():
+            yield starfile
+            raise RuntimeError("Interrupted")
+
+
+@pytest.mark.parametrize("to_path", [
+    "tests/example_data/NMRSTAR3/tmp/checkpoint/starfiles_json",
+    "tests/example_data/NMRSTAR3/tmp/checkpoint/starfiles_json.zip",
+    "tests/example_data/NMRSTAR3/tmp/checkpoint/starfiles_json.tar"
+])
+def test_checkpoint_resume(to_path, monkeypatch):
+    from_path = "tests/example_data/NMRSTAR3/starfiles_archive.tar.gz"
+    checkpoint_path = "tests/example_data/NMRSTAR3/tmp/checkpoint/checkpoint.jsonl"
+    monkeypatch.setattr(nmrstarlib.converter, "CHECKPOINT_INTERVAL", 1)
+
+    def read_output():
+        if to_path.endswith(".zip"):
+            with zipfile.ZipFile(to_path) as infile:
+                return sorted((name, infile.read(name)) for name in infile.namelist())
+        elif to_path.endswith(".tar"):
+            with tarfile.open(to_path) as infile:
+                return sorted((member.name, infile.extractfile(member).read()) for member in infile)
+        files = []
+        for dirpath, _, fnames in os.walk(to_path):
+            for fname in fnames:
+                with open(os.path.join(dirpath, fname), "rb") as infile:
+                    files.append((fname, infile.read()))
+        return sorted(files)
+
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    Converter(file_generator=translator).convert()
+    expected = read_output()
+    if os.path.isdir(to_path):
+        shutil.rmtree(to_path)
+    else:
+        os.remove(to_path)
+
+    translator = InterruptedTranslator(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    with pytest.raises(RuntimeError):
+        Converter(file_generator=translator).convert(checkpoint=checkpoint_path)
+    assert len(nmrstarlib.checkpoint.Checkpoint(checkpoint_path).completed) == 1
+
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    Converter(file_generator=translator).convert(checkpoint=checkpoint_path)
+    assert read_output() == expected
+    assert not os.path.exists(checkpoint_path)
+
+    with pytest.raises(ValueError):
+        translator = StarFileToStarFile(from_path=from_path, to_path="tests/example_data/NMRSTAR3/tmp/checkpoint/starfiles_json.tar.gz",
+                                        from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator).convert(checkpoint=checkpoint_path)
+
+
+@pytest.mark.parametrize("to_path,max_opens", [
+    ("tests/example_data/NMRSTAR3/tmp/checkpoint_opens/starfiles_json.tar", 1),
+    ("tests/example_data/NMRSTAR3/tmp/checkpoint_opens/starfiles_json.zip", 20)
+])
+def test_checkpoint_archive_reopens(to_path, max_opens, monkeypatch):
+    from_path = "tests/example_data/NMRSTAR3/tmp/checkpoint_opens/starfiles"
+    checkpoint_path = "tests/example_data/NMRSTAR3/tmp/checkpoint_opens/checkpoint.jsonl"
+    os.makedirs(from_path)
+    for i in range(40):
+        with open(os.path.join(from_path, "entry{}.str".format(i)), "w") as outfile:
+            outfile.write("data_{}\n\nsave_entry\n   _Entry.ID   {}\nsave_\n".format(i, i))
+    monkeypatch.setattr(nmrstarlib.converter, "CHECKPOINT_INTERVAL", 1)
+
+    opens = []
+    tarfile_open = tarfile.open
+
+    def counting_tarfile_open(*args, **kwargs):
+        opens.append(kwargs.get("mode"))
+        return tarfile_open(*args, **kwargs)
+
+    class CountingZipFile(zipfile.ZipFile):
+        def __init__(self, *args, **kwargs):
+            opens.append(kwargs.get("mode"))
+            super(CountingZipFile, self).__init__(*args, **kwargs)
+
+    monkeypatch.setattr(nmrstarlib.converter.tarfile, "open", counting_tarfile_open)
+    monkeypatch.setattr(nmrstarlib.converter.zipfile, "ZipFile", CountingZipFile)
+    try:
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator).convert(checkpoint=checkpoint_path)
+        assert 1 <= len(opens) <= max_opens
+        monkeypatch.undo()
+        assert len(_read_output(to_path)) == 40
+    finally:
+        shutil.rmtree("tests/example_data/NMRSTAR3/tmp/checkpoint_opens")
+
+
+@pytest.mark.parametrize("zip_method,compress_type", [
+    ("stored", zipfile.ZIP_STORED),
+    ("deflated", zipfile.ZIP_DEFLATED),
+    ("bzip2", zipfile.ZIP_BZIP2),
+    ("lzma", zipfile.ZIP_LZMA)
+])
+def test_zip_method(zip_method, compress_type):
+    to_path = "tests/example_data/NMRSTAR3/tmp/zip_method/starfiles_json_{}.zip".format(zip_method)
+    translator = StarFileToStarFile(from_path="tests/example_data/NMRSTAR3/starfiles_directory", to_path=to_path,
+                                    from_format="nmrstar", to_format="json")
+    Converter(file_generator=translator, zip_method=zip_method, compression_level=1).convert()
+
+    with zipfile.ZipFile(to_path) as infile:
+        assert all(info.compress_type == compress_type for info in infile.infolist())
+    assert set(sf.id for sf in nmrstarlib.read_files(to_path)) == {"15000", "18569"}
+
+
+@pytest.mark.parametrize("to_path", [
+    "tests/example_data/NMRSTAR3/tmp/compression_level/bmr18569.json.gz",
+    "tests/example_data/NMRSTAR3/tmp/compression_level/bmr18569.json.bz2",
+    "tests/example_data/NMRSTAR3/tmp/compression_level/starfiles_json.tar.gz",
+    "tests/example_data/NMRSTAR3/tmp/compression_level/starfiles_json.zip"
+])
+def test_compression_level(to_path):
+    from_path = "tests/example_data/NMRSTAR3/bmr18569.str" if ".json." in to_path \
+        else "tests/example_data/NMRSTAR3/starfiles_directory"
+
+    sizes = []
+    for level in (1, 9):
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator, compression_level=level).convert()
+        sizes.append(os.path.getsize(to_path))
+        assert set(sf.id for sf in nmrstarlib.read_files(to_path)).issubset({"15000", "18569"})
+
+    assert sizes[1] <= sizes[0]
+
+    with pytest.raises(ValueError):
+        Converter(file_generator=translator, zip_method="zstd")
+
+
+def test_zip_compression_level_requires_python37(monkeypatch):
+    to_path = "tests/example_data/NMRSTAR3/tmp/compression_level_py36/starfiles_json.zip"
+    translator = StarFileToStarFile(from_path="tests/example_data/NMRSTAR3/starfiles_directory", to_path=to_path,
+                                    from_format="nmrstar", to_format="json")
+    monkeypatch.setattr(nmrstarlib.converter.sys, "version_info", (3, 6, 0))
+    with pytest.raises(ValueError):
+        Converter(file_generator=translator, compression_level=9).convert()
+    assert not os.path.exists(to_path)
+
+
+@pytest.mark.parametrize("to_path,options", [
+    ("tests/example_data/NMRSTAR3/tmp/shards/starfiles_json.tar.gz", {"shard_members": 1}),
+    ("tests/example_data/NMRSTAR3/tmp/shards/starfiles_json.zip", {"shard_size": "1K"}),
+    ("tests/example_data/NMRSTAR3/tmp/shards/starfiles_json.tar", {"shard_members": 2})
+])
+def test_sharded_output(to_path, options):
+    from_path = "tests/example_data/NMRSTAR3/starfiles_directory"
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    Converter(file_generator=translator, **options).convert()
+
+    shards_dir = os.path.dirname(to_path)
+    basename = os.path.basename(to_path).split(".")[0]
+    with open(os.path.join(shards_dir, basename + ".catalog.json")) as infile:
+        catalog = json.load(infile)
+
+    expected_shards = 1 if options.get("shard_members") == 2 else 2
+    assert [shard["path"] for shard in catalog["shards"]] == \
+           [to_path.replace(basename, "{}-{:04d}".format(basename, i)).split("/")[-1] for i in range(1, expected_shards + 1)]
+
+    sources = []
+    for shard in catalog["shards"]:
+        starfiles = list(nmrstarlib.read_files(os.path.join(shards_dir, shard["path"])))
+        assert [sf.source.split("/")[-1] for sf in starfiles] == [member["name"] for member in shard["members"]]
+        sources.extend(member["source"] for member in shard["members"])
+    assert sorted(os.path.basename(source) for source in sources) == ["bmr15000.str", "bmr18569.str"]
+    shutil.rmtree(shards_dir)
+
+
+@pytest.mark.parametrize("to_path,options", [
+    ("tests/example_data/NMRSTAR3/tmp/shards/starfiles_json.tar.gz", {}),
+    ("tests/example_data/NMRSTAR3/tmp/shards/starfiles_json.tar.gz", {"threads": 4}),
+    ("tests/example_data/NMRSTAR3/tmp/shards/starfiles_json.tar.bz2", {})
+])
+def test_sharded_compressed_tar_size(to_path, options):
+    from_path = "tests/example_data/NMRSTAR3/starfiles_directory"
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    Converter(file_generator=translator, shard_size="1K", **options).convert()
+
+    shards_dir = os.path.dirname(to_path)
+    with open(os.path.join(shards_dir, "starfiles_json.catalog.json")) as infile:
+        catalog = json.load(infile)
+
+    assert [len(shard["members"]) for shard in catalog["shards"]] == [1, 1]
+    for shard in catalog["shards"]:
+        with tarfile.open(os.path.join(shards_dir, shard["path"])) as archive:
+            member_size = sum(member.size for member in archive.getmembers())
+        assert os.path.getsize(os.path.join(shards_dir, shard["path"])) < 1024 + member_size
+    shutil.rmtree(shards_dir)
+
+
+@pytest.mark.parametrize("json_layout", ["rows", "columns"])
+@pytest.mark.parametrize("from_path,to_path", [
+    ("tests/example_data/NMRSTAR3/starfiles_directory", "tests/example_data/NMRSTAR3/tmp/transcode/starfiles_json.zip"),
+    ("tests/example_data/NMRSTAR2/bmr15000.str", "tests/example_data/NMRSTAR2/tmp/transcode/bmr15000.json.gz")
+])
+def test_transcoded_conversion(from_path, to_path, json_layout, monkeypatch):
+    monkeypatch.setattr(nmrstarlib.nmrstarlib, "JSON_LAYOUT", json_layout)
+
+    contents = []
+    for transcode in (False, True):
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator, transcode=transcode).convert()
+
+        if to_path.endswith(".zip"):
+            with zipfile.ZipFile(to_path) as infile:
+                contents.append([(name, infile.read(name)) for name in infile.namelist()])
+        else:
+            with gzip.open(to_path, "rb") as infile:
+                contents.append(infile.read())
+
+    assert contents[0] == contents[1]
+
+
+def test_transcoder_repeated_keys():
+    nmrstar_str = u"""data_1
+
+save_entry
+   _Tag   first
+   _Other value
+   _Tag   second
+
+   loop_
+      _A
+      _B
+      _A
+
+      1 2 3
+      4 5 6
+
+   stop_
+save_
+"""
+    starfile = nmrstarlib.nmrstarlib.StarFile.read(io.StringIO(nmrstar_str), "repeated")
+    outfile = io.StringIO()
+    nmrstarlib.transcoder.nmrstar_to_json(nmrstar_str, outfile)
+    transcoded = nmrstarlib.nmrstarlib.StarFile.read(io.StringIO(outfile.getvalue()), "repeated")
+    assert json.dumps(transcoded) == json.dumps(starfile)
+
+
+@pytest.mark.parametrize("json_layout", ["rows", "columns"])
+def test_transcoder_empty_saveframe(json_layout, monkeypatch):
+    monkeypatch.setattr(nmrstarlib.nmrstarlib, "JSON_LAYOUT", json_layout)
+    nmrstar_str = u"""data_1
+
+save_empty
+save_
+
+save_comment_only
+   # comment
+save_
+
+save_entry
+   _Tag   value
+save_
+"""
+    starfile = nmrstarlib.nmrstarlib.StarFile.read(io.StringIO(nmrstar_str), "empty")
+    outfile = io.StringIO()
+    nmrstarlib.transcoder.nmrstar_to_json(nmrstar_str, outfile)
+    assert outfile.getvalue() == starfile.writestr("json")
+
+
+def _read_output(to_path):
+    if to_path.endswith(".zip"):
+        with zipfile.ZipFile(to_path) as infile:
+            return dict((name, infile.read(name)) for name in infile.namelist())
+    elif to_path.endswith(".tar"):
+        with tarfile.open(to_path) as infile:
+            return dict((member.name, infile.extractfile(member).read()) for member in infile)
+    else:
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(to_path):
+            for fname in filenames:
+                with open(os.path.join(dirpath, fname), "rb") as infile:
+                    files[fname] = infile.read()
+        shutil.rmtree(to_path)
+        return files
+
+
+@pytest.mark.parametrize("to_path,workers", [
+    ("tests/example_data/NMRSTAR3/tmp/multiformat/starfiles", None),
+    ("tests/example_data/NMRSTAR3/tmp/multiformat/starfiles.zip", None),
+    ("tests/example_data/NMRSTAR3/tmp/multiformat/starfiles.tar", 2)
+])
+def test_multiformat_conversion(to_path, workers):
+    from_path = "tests/example_data/NMRSTAR3/starfiles_archive.tar.gz"
+
+    expected = {}
+    for to_format in ("json", "nmrstar"):
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format=to_format)
+        Converter(file_generator=translator).convert()
+        expected.update(_read_output(to_path))
+
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json,nmrstar")
+    Converter(file_generator=translator, workers=workers).convert()
+
+    assert _read_output(to_path) == expected
+
+
+def test_multiformat_single_compressed_file():
+    translator = StarFileToStarFile(from_path="tests/example_data/NMRSTAR3/bmr18569.str",
+                                    to_path="tests/example_data/NMRSTAR3/tmp/multiformat/bmr18569.json.gz",
+                                    from_format="nmrstar", to_format=["json", "nmrstar"])
+    with pytest.raises(ValueError):
+        Converter(file_generator=translator).convert()
+
+
+@pytest.mark.parametrize("to_path,workers", [
+    ("tests/example_data/NMRSTAR3/tmp/dedup/starfiles_json", None),
+    ("tests/example_data/NMRSTAR3/tmp/dedup/starfiles_json.tar", None),
+    ("tests/example_data/NMRSTAR3/tmp/dedup/starfiles_json.zip", 2)
+])
+def test_deduplicated_conversion(to_path, workers):
+    from_path = "tests/example_data/NMRSTAR3/tmp/dedup/starfiles"
+    if not os.path.exists(from_path):
+        shutil.copytree("tests/example_data/NMRSTAR3/starfiles_directory", from_path)
+        shutil.copyfile("tests/example_data/NMRSTAR3/bmr15000.str", os.path.join(from_path, "bmr15000_copy.str"))
+
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    Converter(file_generator=translator, workers=workers, dedup=True).convert()
+
+    pair = {"bmr15000.str.json", "bmr15000_copy.str.json"}
+    if to_path.endswith(".zip"):
+        with open("tests/example_data/NMRSTAR3/tmp/dedup/starfiles_json.catalog.json") as infile:
+            duplicates = json.load(infile)["duplicates"]
+        assert len(duplicates) == 1 and {duplicates[0]["name"], duplicates[0]["duplicate_of"]} == pair
+        with zipfile.ZipFile(to_path) as infile:
+            assert sorted(infile.namelist()) == sorted([duplicates[0]["duplicate_of"], "bmr18569.str.json"])
+    elif to_path.endswith(".tar"):
+        with tarfile.open(to_path) as infile:
+            links = [member for member in infile if member.islnk()]
+            assert len(links) == 1 and {links[0].name, links[0].linkname} == pair
+            assert infile.extractfile(links[0]).read() == infile.extractfile(links[0].linkname).read()
+    else:
+        assert os.path.samefile(os.path.join(to_path, "bmr15000_copy.str.json"), os.path.join(to_path, "bmr15000.str.json"))
+        assert not os.path.samefile(os.path.join(to_path, "bmr18569.str.json"), os.path.join(to_path, "bmr15000.str.json"))
+
+
+@pytest.mark.parametrize("to_path,options", [
+    ("tests/example_data/NMRSTAR3/tmp/report/starfiles_json", {"transcode": False}),
+    ("tests/example_data/NMRSTAR3/tmp/report/starfiles_json.tar.gz", {}),
+    ("tests/example_data/NMRSTAR3/tmp/report/starfiles_json.zip", {"workers": 2, "transcode": False})
+])
+def test_conversion_report(to_path, options):
+    from_path = "tests/example_data/NMRSTAR3/starfiles_directory"
+    report_path = "tests/example_data/NMRSTAR3/tmp/report/report.json"
+
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    Converter(file_generator=translator, **options).convert(report=report_path)
+
+    with open(report_path) as infile:
+        report = json.load(infile)
+
+    assert sorted(os.path.basename(record["source"]) for record in report["files"]) == ["bmr15000.str", "bmr18569.str"]
+    for record in report["files"]:
+        assert record["bytes_in"] == os.path.getsize(record["source"])
+        assert record["bytes_out"] > record["bytes_in"]
+        assert set(record["stages"]) <= {"read", "lex", "build", "serialize", "write"}
+        assert {"read", "serialize", "write"} <= set(record["stages"])
+        if not options.get("transcode", True):
+            assert {"lex", "build"} <= set(record["stages"])
+
+    total = report["total"]
+    assert total["files"] == 2
+    assert total["bytes_in"] == sum(record["bytes_in"] for record in report["files"])
+    assert total["bottleneck"] in total["stages"]
+    assert total["files_per_second"] > 0 and total["mb_in_per_second"] > 0
+
+
+@pytest.mark.parametrize("source", [
+    "tests/example_data/NMRSTAR3/bmr18569.str",
+    "tests/example_data/CIF/2rpv.cif"
+])
+def test_report_times_lexing_incrementally(source, monkeypatch):
+    bmrblex = nmrstarlib.nmrstarlib.bmrblex
+    lexed = []
+
+    def counting_bmrblex(text):
+        for token in bmrblex(text):
+            lexed.append(token)
+            yield token
+
+    monkeypatch.setattr(nmrstarlib.nmrstarlib, "bmrblex", counting_bmrblex)
+    report = nmrstarlib.report.Report("tests/example_data/NMRSTAR3/tmp/report.json")
+    with open(source, "r") as infile:
+        text = infile.read()
+
+    starfile = nmrstarlib.nmrstarlib.StarFile.read(io.StringIO(text), source, report=report)
+    stages = report.record(source)["stages"]
+    assert stages["lex"] > 0 and stages["build"] > 0
+
+    del lexed[:]
+    with nmrstarlib.report.stage(report, source, "build"):
+        next(starfile._lexer(text, report))
+    assert len(lexed) == 1
+
+
+@pytest.mark.parametrize("to_path,options", [
+    ("tests/example_data/NMRSTAR3/tmp/errors/starfiles_json", {}),
+    ("tests/example_data/NMRSTAR3/tmp/errors/starfiles_json.zip", {"transcode": False, "dedup": True}),
+    ("tests/example_data/NMRSTAR3/tmp/errors/starfiles_json.tar", {"workers": 2})
+])
+def test_skip_errors(to_path, options):
+    from_path = "tests/example_data/NMRSTAR3/tmp/errors/starfiles"
+    error_log_path = "tests/example_data/NMRSTAR3/tmp/errors/errors.jsonl"
+    if not os.path.exists(from_path):
+        shutil.copytree("tests/example_data/NMRSTAR3/starfiles_directory", from_path)
+        with open(os.path.join(from_path, "invalid_token.str"), "w") as outfile:
+            outfile.write("data_bad\n\nsave_entry\n   _Tag value\nsave_\n\nstray_token\n")
+        shutil.copyfile(os.path.join(from_path, "invalid_token.str"), os.path.join(from_path, "invalid_token_copy.str"))
+        with open(os.path.join(from_path, "unknown_format.str"), "w") as outfile:
+            outfile.write("not a star file\n")
+    if os.path.exists(error_log_path):
+        os.remove(error_log_path)
+
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    with pytest.raises(Exception):
+        Converter(file_generator=translator, **options).convert()
+    if os.path.isdir(to_path):
+        shutil.rmtree(to_path)
+
+    translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+    Converter(file_generator=translator, **options).convert(error_log=error_log_path)
+
+    if to_path.endswith(".zip"):
+        with zipfile.ZipFile(to_path) as infile:
+            names = infile.namelist()
+    elif to_path.endswith(".tar"):
+        with tarfile.open(to_path) as infile:
+            names = infile.getnames()
+    else:
+        names = os.listdir(to_path)
+        shutil.rmtree(to_path)
+    assert sorted(names) == ["bmr15000.str.json", "bmr18569.str.json"]
+
+    with open(error_log_path) as infile:
+        records = dict((os.path.basename(record["source"]), record) for record in map(json.loads, infile))
+    assert sorted(records) == ["invalid_token.str", "invalid_token_copy.str", "unknown_format.str"]
+    assert records["invalid_token.str"]["exception"] == "InvalidToken"
+    assert records["invalid_token.str"]["token"] == "stray_token"
+    assert records["invalid_token.str"]["token_index"] == 5
+    assert records["unknown_format.str"]["exception"] == "TypeError"
+    assert records["unknown_format.str"]["token"] is None
+
+
+@pytest.mark.parametrize("transcode", [False, True])
+def test_skip_errors_corrupt_archive(transcode):
+    from_path = "tests/example_data/NMRSTAR3/tmp/errors_corrupt/corrupt.zip"
+    to_path = "tests/example_data/NMRSTAR3/tmp/errors_corrupt/json"
+    error_log_path = "tests/example_data/NMRSTAR3/tmp/errors_corrupt/errors.jsonl"
+    os.makedirs(os.path.dirname(from_path))
+    with open(from_path, "wb") as outfile:
+        outfile.write(b"PK\x03\x04 not a zip archive")
+
+    try:
+        translator = StarFileToStarFile(from_path=from_path, to_path=to_path, from_format="nmrstar", to_format="json")
+        Converter(file_generator=translator, transcode=transcode).convert(error_log=error_log_path)
+
+        with open(error_log_path) as infile:
+            records = [json.loads(line) for line in infile]
+        assert [record["source"] for record in records] == [from_path]
+        assert records[0]["exception"] in ("BadZipFile", "BadZipfile")
+    finally:
+        shutil.rmtree(os.path.dirname(from_path))
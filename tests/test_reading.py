@@ -1,3 +1,13 @@
+import os
+import sys
+import shutil
+import gzip
+import bz2
+import lzma
+import tarfile
+import threading
+import json
+
 import pytest
 import nmrstarlib
 
@@ -56,3 +66,491 @@ def test_reading(source):
     starfiles_list = list(starfile_generator)
     starfiles_ids_set = set(sf.id for sf in starfiles_list)
     assert starfiles_ids_set.issubset({"15000", "18569", "2RPV", "2FRG"})
+
+
+@pytest.mark.parametrize("source", [
+    "tests/example_data/NMRSTAR3/starfiles_directory",
+    "tests/example_data/CIF/ciffiles_archive.zip",
+    "tests/example_data/NMRSTAR2/starfiles_archive.tar.gz"
+])
+def test_parallel_reading(source):
+    sequential_sources = [sf.source for sf in nmrstarlib.read_files(source)]
+    ordered_sources = [sf.source for sf in nmrstarlib.read_files(source, workers=2, ordered=True, max_inflight=1)]
+    unordered_starfiles = list(nmrstarlib.read_files(source, workers=2))
+
+    assert ordered_sources == sequential_sources
+    assert sorted(sf.source for sf in unordered_starfiles) == sorted(sequential_sources)
+    assert set(sf.id for sf in unordered_starfiles).issubset({"15000", "18569", "2RPV", "2FRG"})
+
+
+@pytest.mark.parametrize("options", [
+    {"workers": 0},
+    {"workers": -1},
+    {"workers": 2, "max_inflight": 0}
+])
+def test_parallel_reading_invalid_options(options):
+    with pytest.raises(ValueError):
+        next(nmrstarlib.read_files("tests/example_data/NMRSTAR3/starfiles_directory", **options))
+
+
+@pytest.mark.parametrize("source,workers", [
+    ("tests/example_data/NMRSTAR3/starfiles_archive.tar.bz2", None),
+    ("tests/example_data/NMRSTAR2/starfiles_archive.zip", None),
+    ("tests/example_data/CIF/ciffiles_archive.tar.gz", 2)
+])
+def test_prefetch_reading(source, workers):
+    sequential_sources = [sf.source for sf in nmrstarlib.read_files(source)]
+    prefetched_sources = [sf.source for sf in nmrstarlib.read_files(source, prefetch=1, workers=workers, ordered=True)]
+    assert prefetched_sources == sequential_sources
+
+
+@pytest.mark.parametrize("source,workers", [
+    ("tests/example_data/NMRSTAR3/starfiles_archive.tar.bz2", None),
+    ("tests/example_data/CIF/ciffiles_archive.tar.gz", 2)
+])
+def test_memory_budget(source, workers):
+    sequential_sources = [sf.source for sf in nmrstarlib.read_files(source)]
+    starfiles = list(nmrstarlib.read_files(source, prefetch=4, workers=workers, ordered=True, max_memory="1K"))
+    assert [sf.source for sf in starfiles] == sequential_sources
+
+    budget = nmrstarlib.fileio._MemoryBudget("1K")
+    budget.reserve(600)
+    reserved = threading.Event()
+    thread = threading.Thread(target=lambda: budget.reserve(600) and reserved.set())
+    thread.start()
+    assert not reserved.wait(0.3)
+
+    starfile = starfiles.pop()
+    del starfiles[:]
+    budget.delivered(starfile, 600)
+    assert reserved.wait(5)
+    thread.join()
+    assert budget.is_exceeded(0)
+
+    del starfile
+    assert not budget.is_exceeded(0)
+
+
+@pytest.fixture
+def rest_server():
+    http_server = pytest.importorskip("http.server")
+    requests = []
+
+    class Handler(http_server.BaseHTTPRequestHandler):
+        routes = {"/bmrb/": "tests/example_data/NMRSTAR3/bmr{}.str",
+                  "/pdb/": "tests/example_data/CIF/{}",
+                  "/files/": "tests/example_data/{}"}
+
+        def do_HEAD(self):
+            if self.server.head_status is not None:
+                requests.append((self.command, self.path, None))
+                self.send_error(self.server.head_status)
+                return
+            self.do_GET()
+
+        def do_GET(self):
+            requests.append((self.command, self.path, self.headers.get("If-None-Match")))
+            if self.server.get_status is not None:
+                self.send_error(self.server.get_status)
+                return
+            for prefix, path in self.routes.items():
+                if self.path.startswith(prefix):
+                    path = path.format(self.path[len(prefix):])
+                    if os.path.isfile(path):
+                        etag = '"{}"'.format(int(os.path.getmtime(path)))
+                        if self.headers.get("If-None-Match") == etag:
+                            self.send_response(304)
+                            self.end_headers()
+                            return
+                        with open(path, "rb") as infile:
+                            content = infile.read()
+                        self.send_response(200)
+                        self.send_header("Content-Length", str(len(content)))
+                        self.send_header("ETag", etag)
+                        self.end_headers()
+                        if self.command == "GET":
+                            self.wfile.write(content)
+                        return
+            self.send_error(404)
+
+        def log_message(self, *args):
+            pass
+
+    server = http_server.HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    url = "http://127.0.0.1:{}".format(server.server_port)
+    server.requests = requests
+    server.url = url
+    server.head_status = None
+    server.get_status = None
+    bmrb_rest, pdb_rest = nmrstarlib.nmrstarlib.BMRB_REST, nmrstarlib.nmrstarlib.PDB_REST
+    nmrstarlib.nmrstarlib.BMRB_REST, nmrstarlib.nmrstarlib.PDB_REST = url + "/bmrb/", url + "/pdb/"
+    yield server
+    nmrstarlib.nmrstarlib.BMRB_REST, nmrstarlib.nmrstarlib.PDB_REST = bmrb_rest, pdb_rest
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.skipif(sys.version_info < (3, 6), reason="requires asynchronous generators")
+def test_async_reading(rest_server):
+    asyncio = pytest.importorskip("asyncio")
+    from nmrstarlib import aiofileio
+
+    sources = ["15000", "18569", "2rpv",
+               rest_server.url + "/files/NMRSTAR3/starfiles_archive.zip",
+               "tests/example_data/NMRSTAR2/bmr18569.str"]
+
+    loop = asyncio.new_event_loop()
+    starfile_generator = aiofileio.read_files(*sources, concurrency=2)
+    starfiles = []
+    while True:
+        try:
+            starfiles.append(loop.run_until_complete(starfile_generator.__anext__()))
+        except StopAsyncIteration:
+            break
+    loop.close()
+
+    assert len(starfiles) == 6
+    assert set(sf.id for sf in starfiles) == {"15000", "18569", "2RPV"}
+
+
+@pytest.mark.skipif(sys.version_info < (3, 6), reason="requires asynchronous generators")
+def test_async_reading_bounded(rest_server, monkeypatch):
+    asyncio = pytest.importorskip("asyncio")
+    from nmrstarlib import aiofileio
+
+    started = []
+    read_source = aiofileio._read_source
+
+    async def counting_read_source(source, executor, kwds):
+        started.append(source)
+        return await read_source(source, executor, kwds)
+
+    monkeypatch.setattr(aiofileio, "_read_source", counting_read_source)
+    loop = asyncio.new_event_loop()
+    starfile_generator = aiofileio.read_files(*(["tests/example_data/NMRSTAR2/bmr18569.str"] * 20), concurrency=2)
+    loop.run_until_complete(starfile_generator.__anext__())
+    assert len(started) <= 6
+    loop.run_until_complete(starfile_generator.aclose())
+
+    with pytest.raises(ValueError):
+        loop.run_until_complete(aiofileio.read_files("15000", concurrency=0).__anext__())
+    loop.close()
+
+
+@pytest.mark.skipif(sys.version_info < (3, 6), reason="requires asynchronous generators")
+def test_async_resolved_ids(rest_server):
+    asyncio = pytest.importorskip("asyncio")
+    from nmrstarlib import aiofileio
+
+    loop = asyncio.new_event_loop()
+    rest_server.get_status = 503
+    with pytest.raises(aiofileio.HTTPError):
+        loop.run_until_complete(aiofileio.read_files("18569").__anext__())
+    assert [request[:2] for request in rest_server.requests] == [("GET", "/bmrb/18569")]
+
+    rest_server.get_status = None
+    assert loop.run_until_complete(aiofileio.read_files("18569").__anext__()).id == "18569"
+    assert [sf.id for sf in nmrstarlib.read_files("18569")] == ["18569"]
+    assert [request[:2] for request in rest_server.requests[1:]] == [("GET", "/bmrb/18569"), ("GET", "/bmrb/18569")]
+    loop.close()
+
+
+def test_download_cache(rest_server):
+    cache_dir = "tests/example_data/NMRSTAR3/tmp/cache"
+    nmrstarlib.nmrstarlib.CACHE_DIR = cache_dir
+    try:
+        first_run = [sf.id for sf in nmrstarlib.read_files("15000", "18569")]
+        downloads = len(rest_server.requests)
+        second_run = [sf.id for sf in nmrstarlib.read_files("15000", "18569")]
+        assert first_run == second_run == ["15000", "18569"]
+        assert len(rest_server.requests) == downloads
+
+        nmrstarlib.nmrstarlib.CACHE_MAX_AGE = 0
+        assert [sf.id for sf in nmrstarlib.read_files("15000")] == ["15000"]
+        assert all(etag is not None for _, _, etag in rest_server.requests[downloads:])
+
+        shutil.rmtree(cache_dir)
+        nmrstarlib.nmrstarlib.CACHE_MAX_SIZE = "100K"
+        nmrstarlib.nmrstarlib.CACHE_MAX_AGE = None
+        assert [sf.id for sf in nmrstarlib.read_files("18569", "15000")] == ["18569", "15000"]
+        cached_files = [fname for fname in os.listdir(cache_dir) if not fname.endswith(".json")]
+        assert len(cached_files) == 1
+    finally:
+        nmrstarlib.nmrstarlib.CACHE_DIR = None
+        nmrstarlib.nmrstarlib.CACHE_MAX_SIZE = None
+        nmrstarlib.nmrstarlib.CACHE_MAX_AGE = None
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def test_download_cache_scanned_once(rest_server, monkeypatch):
+    cache_dir = "tests/example_data/NMRSTAR3/tmp/cache_scan"
+    listdir = os.listdir
+    scans = []
+
+    def counting_listdir(path):
+        scans.append(path)
+        return listdir(path)
+
+    monkeypatch.setattr(nmrstarlib.cache.os, "listdir", counting_listdir)
+    download_cache = nmrstarlib.cache.DownloadCache(cache_dir, max_size="10M")
+    try:
+        for entry_id in ("15000", "18569"):
+            download_cache.open(rest_server.url + "/bmrb/" + entry_id).close()
+        assert len(scans) == 1
+
+        download_cache.max_size = 1024
+        download_cache.open(rest_server.url + "/pdb/2rpv.cif").close()
+        assert len(scans) == 2
+        assert len([fname for fname in listdir(cache_dir) if not fname.endswith(".json")]) == 1
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def test_single_transfer_per_id(rest_server):
+    assert [sf.id for sf in nmrstarlib.read_files("15000", "15000")] == ["15000", "15000"]
+    assert [request[:2] for request in rest_server.requests] == [("HEAD", "/bmrb/15000"),
+                                                                 ("GET", "/bmrb/15000"),
+                                                                 ("GET", "/bmrb/15000")]
+
+
+def test_head_not_allowed(rest_server):
+    rest_server.head_status = 405
+    assert [sf.id for sf in nmrstarlib.read_files("15000")] == ["15000"]
+    assert [request[:2] for request in rest_server.requests] == [("HEAD", "/bmrb/15000"),
+                                                                 ("GET", "/bmrb/15000")]
+    assert not nmrstarlib.fileio._probe_responses
+
+
+def test_head_not_allowed_cached(rest_server):
+    cache_dir = "tests/example_data/NMRSTAR3/tmp/cache_probe"
+    rest_server.head_status = 501
+    nmrstarlib.nmrstarlib.CACHE_DIR = cache_dir
+    try:
+        assert [sf.id for sf in nmrstarlib.read_files("18569")] == ["18569"]
+        assert [sf.id for sf in nmrstarlib.read_files("18569")] == ["18569"]
+        assert [request[:2] for request in rest_server.requests] == [("HEAD", "/bmrb/18569"),
+                                                                     ("GET", "/bmrb/18569")]
+        assert nmrstarlib.cache.DownloadCache(cache_dir).is_cached(rest_server.url + "/bmrb/18569")
+    finally:
+        nmrstarlib.nmrstarlib.CACHE_DIR = None
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def test_server_error_not_remembered(rest_server):
+    rest_server.head_status = 503
+    with pytest.raises(nmrstarlib.fileio.HTTPError):
+        list(nmrstarlib.read_files("18569"))
+
+    rest_server.head_status = None
+    assert [sf.id for sf in nmrstarlib.read_files("18569")] == ["18569"]
+
+
+def test_bmrb_mirror(rest_server):
+    mirror_dir = "tests/example_data/NMRSTAR3/tmp/mirror"
+    entry_dir = os.path.join(mirror_dir, "entry_directories", "bmr15000")
+    os.makedirs(entry_dir)
+    shutil.copy("tests/example_data/NMRSTAR3/bmr15000.str", os.path.join(entry_dir, "bmr15000_3.str"))
+    shutil.copy("tests/example_data/NMRSTAR2/bmr15000.str", os.path.join(entry_dir, "bmr15000_21.str"))
+    with open("tests/example_data/NMRSTAR3/bmr18569.str", "rb") as infile, \
+            gzip.open(os.path.join(mirror_dir, "bmr18569_3.str.gz"), "wb") as outfile:
+        shutil.copyfileobj(infile, outfile)
+
+    nmrstarlib.nmrstarlib.BMRB_MIRROR = mirror_dir
+    try:
+        starfiles = list(nmrstarlib.read_files("15000", "18569", "2rpv"))
+        assert [sf.id for sf in starfiles] == ["15000", "18569", "2RPV"]
+        assert starfiles[0].source.endswith("bmr15000_3.str")
+        assert os.path.isfile(os.path.join(mirror_dir, ".nmrstarlib-index.json"))
+        assert [request[:2] for request in rest_server.requests] == [("GET", "/pdb/2rpv.cif")]
+
+        nmrstarlib.nmrstarlib.NMRSTAR_VERSION = "2"
+        assert next(nmrstarlib.read_files("15000")).source.endswith("bmr15000_21.str")
+    finally:
+        nmrstarlib.nmrstarlib.BMRB_MIRROR = None
+        nmrstarlib.nmrstarlib.NMRSTAR_VERSION = "3"
+        nmrstarlib.fileio._mirror_indexes.clear()
+        shutil.rmtree(mirror_dir, ignore_errors=True)
+
+
+def test_bmrb_mirror_new_entries():
+    mirror_dir = "tests/example_data/NMRSTAR3/tmp/mirror_update"
+    entries_dir = os.path.join(mirror_dir, "entry_directories")
+    os.makedirs(os.path.join(entries_dir, "bmr15000"))
+    shutil.copy("tests/example_data/NMRSTAR3/bmr15000.str", os.path.join(entries_dir, "bmr15000", "bmr15000_3.str"))
+    try:
+        index = nmrstarlib.mirror.MirrorIndex(mirror_dir)
+        assert index.path("18569") is None
+        assert not index.is_outdated()
+
+        os.makedirs(os.path.join(entries_dir, "bmr18569"))
+        shutil.copy("tests/example_data/NMRSTAR3/bmr18569.str", os.path.join(entries_dir, "bmr18569", "bmr18569_3.str"))
+        os.utime(entries_dir, (index.built + 10, index.built + 10))
+        assert nmrstarlib.mirror.MirrorIndex(mirror_dir).is_outdated()
+        assert index.path("18569").endswith("bmr18569_3.str")
+        assert nmrstarlib.mirror.MirrorIndex(mirror_dir).path("18569").endswith("bmr18569_3.str")
+    finally:
+        shutil.rmtree(mirror_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize("archive", [
+    "NMRSTAR3/starfiles_archive.tar.gz",
+    "NMRSTAR3/starfiles_archive.tar.bz2",
+    "NMRSTAR3/starfiles_archive.zip",
+    "NMRSTAR3/tmp/remote/bmr18569.str.gz",
+    "NMRSTAR3/tmp/remote/bmr18569.str.bz2",
+    "NMRSTAR3/tmp/remote/bmr18569.str.xz"
+])
+def test_streaming_remote_archive(rest_server, archive):
+    tmp_dir = "tests/example_data/NMRSTAR3/tmp/remote"
+    if not os.path.exists(tmp_dir):
+        os.makedirs(tmp_dir)
+
+    with open("tests/example_data/NMRSTAR3/bmr18569.str", "rb") as infile:
+        content = infile.read()
+    half = len(content) // 2
+    with open(os.path.join(tmp_dir, "bmr18569.str.gz"), "wb") as outfile:
+        outfile.write(gzip.compress(content[:half]) + gzip.compress(content[half:]))
+    with open(os.path.join(tmp_dir, "bmr18569.str.bz2"), "wb") as outfile:
+        outfile.write(bz2.compress(content))
+    with open(os.path.join(tmp_dir, "bmr18569.str.xz"), "wb") as outfile:
+        outfile.write(lzma.compress(content[:half]) + lzma.compress(content[half:]))
+
+    try:
+        remote_starfiles = list(nmrstarlib.read_files(rest_server.url + "/files/" + archive))
+        local_starfiles = list(nmrstarlib.read_files("tests/example_data/" + archive))
+        assert [sf.id for sf in remote_starfiles] == [sf.id for sf in local_starfiles]
+        assert remote_starfiles == local_starfiles
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize("kwds,expected_ids", [
+    ({"exclude": ["*.txt"]}, ["15000", "18569", "2RPV"]),
+    ({"extensions": [".str"]}, ["15000", "18569"]),
+    ({"include": ["*.cif"]}, ["2RPV"]),
+    ({"include": ["bmr*"], "exclude": ["*15000*"]}, ["18569"]),
+    ({"exclude": ["subdir/*", "*.txt"]}, ["15000", "18569"]),
+    ({"extensions": [".str", ".cif"], "largest_first": True}, ["2RPV", "18569", "15000"])
+])
+def test_directory_filters(kwds, expected_ids):
+    tmp_dir = "tests/example_data/NMRSTAR3/tmp/scan"
+    if not os.path.exists(os.path.join(tmp_dir, "subdir")):
+        os.makedirs(os.path.join(tmp_dir, "subdir"))
+
+    shutil.copy("tests/example_data/NMRSTAR3/bmr15000.str", tmp_dir)
+    shutil.copy("tests/example_data/NMRSTAR3/bmr18569.str", tmp_dir)
+    shutil.copy("tests/example_data/CIF/2rpv.cif", os.path.join(tmp_dir, "subdir"))
+    shutil.copy("tests/example_data/NMRSTAR3/starfiles_archive.zip", tmp_dir)
+    with open(os.path.join(tmp_dir, "README.txt"), "w") as outfile:
+        outfile.write("not a STAR file")
+
+    try:
+        starfile_ids = [sf.id for sf in nmrstarlib.read_files(tmp_dir, **kwds)]
+        if kwds.get("largest_first"):
+            assert starfile_ids == expected_ids
+        else:
+            assert sorted(starfile_ids) == expected_ids
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@pytest.mark.skipif(not hasattr(os, "symlink"), reason="symbolic links are not supported")
+def test_directory_symlinks():
+    tmp_dir = "tests/example_data/NMRSTAR3/tmp/symlinks"
+    if not os.path.exists(os.path.join(tmp_dir, "subdir")):
+        os.makedirs(os.path.join(tmp_dir, "subdir"))
+
+    shutil.copy("tests/example_data/NMRSTAR3/bmr15000.str", tmp_dir)
+    shutil.copy("tests/example_data/NMRSTAR3/bmr18569.str", os.path.join(tmp_dir, "subdir"))
+    os.symlink(os.path.abspath(tmp_dir), os.path.join(tmp_dir, "subdir", "parent"))
+
+    try:
+        assert sorted(sf.id for sf in nmrstarlib.read_files(tmp_dir)) == ["15000", "18569"]
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize("archive", [
+    "tests/example_data/NMRSTAR3/starfiles_archive.zip",
+    "tests/example_data/NMRSTAR3/starfiles_archive.tar.gz",
+    "tests/example_data/CIF/ciffiles_archive.tar.bz2",
+    "tests/example_data/NMRSTAR3/tmp/index/starfiles_archive.tar"
+])
+def test_read_entry(archive):
+    tmp_dir = "tests/example_data/NMRSTAR3/tmp/index"
+    if not os.path.exists(tmp_dir):
+        os.makedirs(tmp_dir)
+
+    with tarfile.open(os.path.join(tmp_dir, "starfiles_archive.tar"), "w") as tararchive:
+        tararchive.add("tests/example_data/NMRSTAR3/starfiles_directory", arcname="starfiles_directory")
+
+    index_path = os.path.join(tmp_dir, "archive.index.json")
+    try:
+        for starfile in nmrstarlib.read_files(archive):
+            entry = nmrstarlib.read_entry(archive, starfile.id, index_path=index_path)
+            assert entry.source == starfile.source
+            assert entry == starfile
+        assert os.path.isfile(index_path)
+
+        with pytest.raises(KeyError):
+            nmrstarlib.read_entry(archive, "00000", index_path=index_path)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_read_files_error_log(workers):
+    tmp_dir = "tests/example_data/NMRSTAR3/tmp/errorlog"
+    if not os.path.exists(tmp_dir):
+        os.makedirs(tmp_dir)
+
+    bad_path = os.path.join(tmp_dir, "invalid_token.str")
+    with open(bad_path, "w") as outfile:
+        outfile.write("data_invalid\n\nsave_entry\n   _Entry.ID   00000\nsave_\n\nstray_token\n")
+
+    log_path = os.path.join(tmp_dir, "errors.jsonl")
+    try:
+        starfiles = list(nmrstarlib.read_files("tests/example_data/NMRSTAR3/bmr18569.str", bad_path,
+                                               workers=workers, error_log=log_path))
+        assert [sf.id for sf in starfiles] == ["18569"]
+
+        with open(log_path) as infile:
+            records = [json.loads(line) for line in infile]
+        assert len(records) == 1
+        assert records[0]["source"] == bad_path
+        assert records[0]["exception"] == "InvalidToken"
+        assert records[0]["token"] == "stray_token"
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+@pytest.mark.parametrize("bad_name,bad_content,kwds", [
+    ("corrupt.zip", b"PK\x03\x04 not a zip archive", {}),
+    ("corrupt.tar.gz", b"not a tar archive", {"workers": 2}),
+    ("corrupt.str.gz", b"not a gzip file", {"prefetch": 2}),
+    ("corrupt.str.gz", b"not a gzip file", {"prefetch": 2, "max_memory": "1G"})
+])
+def test_read_files_error_log_corrupt_input(bad_name, bad_content, kwds):
+    tmp_dir = "tests/example_data/NMRSTAR3/tmp/errorlog_corrupt"
+    if not os.path.exists(tmp_dir):
+        os.makedirs(tmp_dir)
+
+    bad_path = os.path.join(tmp_dir, bad_name)
+    with open(bad_path, "wb") as outfile:
+        outfile.write(bad_content)
+
+    log_path = os.path.join(tmp_dir, "errors.jsonl")
+    try:
+        starfiles = list(nmrstarlib.read_files(bad_path, "tests/example_data/NMRSTAR3/bmr15000.str",
+                                               error_log=log_path, **kwds))
+        assert [sf.id for sf in starfiles] == ["15000"]
+
+        with open(log_path) as infile:
+            records = [json.loads(line) for line in infile]
+        assert [record["source"] for record in records] == [bad_path]
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)